@@ -0,0 +1,56 @@
+-- Upgrades a database created before buildings were added (a single
+-- building, no building_id columns) to schema.sql. Existing zones, doors,
+-- devices and door connections are backfilled into building 1, the default
+-- building (DEFAULT_BUILDING_ID in server/building_graph.py). Safe to run
+-- more than once.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS buildings (
+  id SERIAL PRIMARY KEY,
+  name TEXT NOT NULL,
+  description TEXT -- Prompt text; the layout is described from door_connections if empty
+);
+INSERT INTO buildings (id, name) VALUES (1, 'EastField Mall')
+  ON CONFLICT (id) DO NOTHING;
+-- The explicit id above does not advance the sequence
+SELECT setval(pg_get_serial_sequence('buildings', 'id'), (SELECT MAX(id) FROM buildings));
+
+-- Tables and columns the server used before schema.sql described them
+ALTER TABLE zones ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'ok';
+CREATE TABLE IF NOT EXISTS doors (
+  id INTEGER PRIMARY KEY,
+  open BOOLEAN NOT NULL DEFAULT TRUE
+);
+CREATE TABLE IF NOT EXISTS door_connections (
+  door_id INTEGER PRIMARY KEY,
+  zone_id INTEGER NOT NULL REFERENCES zones(id) ON DELETE CASCADE,
+  to_zone_id INTEGER REFERENCES zones(id) ON DELETE CASCADE
+);
+
+-- building_id, filled with 1 for existing rows; the default is only there
+-- for the backfill, so it is dropped again
+ALTER TABLE zones
+  ADD COLUMN IF NOT EXISTS building_id INTEGER NOT NULL DEFAULT 1
+  REFERENCES buildings(id) ON DELETE CASCADE;
+ALTER TABLE zones ALTER COLUMN building_id DROP DEFAULT;
+
+ALTER TABLE doors
+  ADD COLUMN IF NOT EXISTS building_id INTEGER NOT NULL DEFAULT 1
+  REFERENCES buildings(id) ON DELETE CASCADE;
+ALTER TABLE doors ALTER COLUMN building_id DROP DEFAULT;
+
+ALTER TABLE devices
+  ADD COLUMN IF NOT EXISTS building_id INTEGER NOT NULL DEFAULT 1
+  REFERENCES buildings(id) ON DELETE CASCADE;
+ALTER TABLE devices ALTER COLUMN building_id DROP DEFAULT;
+
+ALTER TABLE door_connections
+  ADD COLUMN IF NOT EXISTS building_id INTEGER NOT NULL DEFAULT 1
+  REFERENCES buildings(id) ON DELETE CASCADE;
+ALTER TABLE door_connections ALTER COLUMN building_id DROP DEFAULT;
+
+CREATE INDEX IF NOT EXISTS zones_building_id ON zones (building_id);
+CREATE INDEX IF NOT EXISTS doors_building_id ON doors (building_id);
+CREATE INDEX IF NOT EXISTS door_connections_building_id ON door_connections (building_id);
+
+COMMIT;
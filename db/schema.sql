@@ -1,19 +1,54 @@
+-- Buildings served by the system. zones, doors, devices and door_connections
+-- carry a building_id; incidents and actions belong to a building through
+-- their zone, device or incident, and users are shared by all buildings.
+-- Zone, door and device ids are global, not per building: door ids in
+-- particular are chosen by whoever lays out a building and must not repeat
+-- across buildings. A database created before buildings were added is
+-- upgraded with migrate_buildings.sql, which puts its rows in building 1.
+CREATE TABLE buildings (
+  id SERIAL PRIMARY KEY,
+  name TEXT NOT NULL,
+  description TEXT -- Prompt text; the layout is described from door_connections if empty
+);
+
 -- Zones in the building
 CREATE TABLE zones (
   id SERIAL PRIMARY KEY,
+  building_id INTEGER NOT NULL REFERENCES buildings(id) ON DELETE CASCADE,
   name TEXT NOT NULL,
-  description TEXT
+  description TEXT,
+  status TEXT NOT NULL DEFAULT 'ok' -- 'ok' or 'danger'
 );
+CREATE INDEX zones_building_id ON zones (building_id);
+
+-- Doors and whether they are open; ids are unique across all buildings
+CREATE TABLE doors (
+  id INTEGER PRIMARY KEY,
+  building_id INTEGER NOT NULL REFERENCES buildings(id) ON DELETE CASCADE,
+  open BOOLEAN NOT NULL DEFAULT TRUE
+);
+CREATE INDEX doors_building_id ON doors (building_id);
 
 -- Devices (microphones, speakers, doors, signage, etc.)
 CREATE TABLE devices (
   id SERIAL PRIMARY KEY,
+  building_id INTEGER NOT NULL REFERENCES buildings(id) ON DELETE CASCADE,
   zone_id INTEGER REFERENCES zones(id) ON DELETE SET NULL,
   type TEXT NOT NULL,
   identifier TEXT UNIQUE NOT NULL,
   status TEXT DEFAULT 'active'
 );
 
+-- Building topology: the two zones each door joins (door_id is doors.id);
+-- exits lead outside and have no to_zone_id
+CREATE TABLE door_connections (
+  door_id INTEGER PRIMARY KEY,
+  building_id INTEGER NOT NULL REFERENCES buildings(id) ON DELETE CASCADE,
+  zone_id INTEGER NOT NULL REFERENCES zones(id) ON DELETE CASCADE,
+  to_zone_id INTEGER REFERENCES zones(id) ON DELETE CASCADE
+);
+CREATE INDEX door_connections_building_id ON door_connections (building_id);
+
 -- Detected incidents (panic, gunshot, fire, etc.)
 CREATE TABLE incidents (
   id SERIAL PRIMARY KEY,
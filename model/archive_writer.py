@@ -0,0 +1,221 @@
+# archive_writer.py
+
+import gzip
+import os
+import queue
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+
+# --- Constants ---
+ARCHIVE_DIR = "recordings"
+SEGMENT_SECONDS = 300  # Start a new file after this much audio
+MAX_SEGMENT_BYTES = 50 * 1024 * 1024  # ...or once a file reaches this size
+MAX_TOTAL_BYTES = 1024 * 1024 * 1024  # Oldest segments are deleted past this
+KEEP_SECONDS = 10  # Audio kept before and after a detection in "detections" mode
+QUEUE_SIZE = 256  # Pending audio blocks before new ones are dropped
+
+FORMATS = ("wav", "pcm", "pcm.gz")
+MODES = ("all", "detections")
+
+
+class _Segment:
+    """One archive file of 16-bit mono PCM in the chosen container."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.samples = 0
+        if fmt == "wav":
+            self._file = wave.open(path, "wb")
+            self._file.setnchannels(1)
+            self._file.setsampwidth(2)  # 2 bytes for int16
+            self._file.setframerate(SAMPLE_RATE)
+            self._write = self._file.writeframes
+        elif fmt == "pcm.gz":
+            self._file = gzip.open(path, "wb", compresslevel=3)
+            self._write = self._file.write
+        else:
+            self._file = open(path, "wb")
+            self._write = self._file.write
+
+    def write(self, samples):
+        # Convert float32 to int16 (standard format)
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+        self._write(pcm.tobytes())
+        self.samples += samples.size
+
+    def size(self):
+        # Uncompressed size is what bounds a segment; on-disk size bounds the total
+        return self.samples * 2
+
+    def close(self):
+        self._file.close()
+
+
+class ArchiveWriter(threading.Thread):
+    """
+    Writes captured audio to disk on a background thread.
+
+    The detection loop only hands blocks to a bounded queue, so disk speed
+    never shows up in inference latency. If the disk falls far enough behind
+    to fill the queue, blocks are dropped and counted instead of stalling
+    capture.
+
+    Segments rotate by duration and size, and the oldest segments in the
+    archive directory are deleted once the total exceeds `max_total_bytes`.
+    In "detections" mode only `keep_seconds` of audio around each positive
+    detection are written.
+    """
+
+    def __init__(
+        self,
+        directory=ARCHIVE_DIR,
+        fmt="wav",
+        mode="all",
+        segment_seconds=SEGMENT_SECONDS,
+        max_segment_bytes=MAX_SEGMENT_BYTES,
+        max_total_bytes=MAX_TOTAL_BYTES,
+        keep_seconds=KEEP_SECONDS,
+        queue_size=QUEUE_SIZE,
+        prefix="recording",
+    ):
+        super().__init__(name="archive-writer", daemon=True)
+        if fmt not in FORMATS:
+            raise ValueError(
+                f"Unknown archive format {fmt!r}, expected one of {FORMATS}"
+            )
+        if mode not in MODES:
+            raise ValueError(f"Unknown archive mode {mode!r}, expected one of {MODES}")
+        self.directory = directory
+        self.fmt = fmt
+        self.mode = mode
+        self.segment_samples = int(segment_seconds * SAMPLE_RATE)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_total_bytes = max_total_bytes
+        self.keep_samples = int(keep_seconds * SAMPLE_RATE)
+        self.prefix = prefix
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._segment = None
+        self._index = 0
+
+        # Sample clock of the archived stream
+        self._position = 0  # Samples received so far
+        self._keep_until = -1  # "detections" mode: write until this sample
+        self._preroll = deque()  # "detections" mode: recent blocks not yet written
+        self._preroll_samples = 0
+
+        # Counters
+        self.dropped_blocks = 0
+        self.segments_written = 0
+        self.segments_deleted = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Producer side (called from the detection loop) ---
+    def write(self, samples):
+        """Queues a block of float32 samples without blocking."""
+        self._put(("audio", np.array(samples, dtype=np.float32).reshape(-1)))
+
+    def mark_detection(self):
+        """Keeps the audio around the most recently written block."""
+        self._put(("detection", None))
+
+    def close(self):
+        """Flushes queued audio, closes the open segment and stops the thread."""
+        self._queue.put(("stop", None))
+        if self.is_alive():
+            self.join()
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped_blocks += 1
+
+    # --- Writer thread ---
+    def run(self):
+        while True:
+            kind, payload = self._queue.get()
+            try:
+                if kind == "audio":
+                    self._on_audio(payload)
+                elif kind == "detection":
+                    self._on_detection()
+                else:
+                    break
+            except OSError as e:
+                print(f"Archive write error: {e}")
+                self._close_segment()
+        self._close_segment()
+
+    def _on_audio(self, samples):
+        self._position += samples.size
+        if self.mode == "all" or self._position - samples.size < self._keep_until:
+            self._append(samples)
+            return
+
+        self._close_segment()
+        self._preroll.append(samples)
+        self._preroll_samples += samples.size
+        while (
+            self._preroll
+            and self._preroll_samples - self._preroll[0].size >= self.keep_samples
+        ):
+            self._preroll_samples -= self._preroll.popleft().size
+
+    def _on_detection(self):
+        if self.mode != "detections":
+            return
+        self._keep_until = self._position + self.keep_samples
+        while self._preroll:
+            block = self._preroll.popleft()
+            self._append(block)
+        self._preroll_samples = 0
+
+    def _append(self, samples):
+        if self._segment is None:
+            self._open_segment()
+        self._segment.write(samples)
+        if (
+            self._segment.samples >= self.segment_samples
+            or self._segment.size() >= self.max_segment_bytes
+        ):
+            self._close_segment()
+
+    def _open_segment(self):
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(
+            self.directory, f"{self.prefix}_{timestamp}_{self._index}.{self.fmt}"
+        )
+        self._index += 1
+        self._segment = _Segment(path, self.fmt)
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        segment, self._segment = self._segment, None
+        segment.close()
+        self.segments_written += 1
+        print(f"Saved recording to {segment.path}")
+        self._enforce_quota()
+
+    def _enforce_quota(self):
+        suffixes = tuple(f".{fmt}" for fmt in FORMATS)
+        paths = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.startswith(self.prefix) and name.endswith(suffixes)
+        ]
+        files = sorted((os.path.getmtime(p), os.path.getsize(p), p) for p in paths)
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_total_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self.segments_deleted += 1
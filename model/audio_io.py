@@ -0,0 +1,124 @@
+# audio_io.py
+
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000  # Sample rate expected by YAMNet
+
+
+def resample(waveform, orig_rate, target_rate=SAMPLE_RATE):
+    """Linear-interpolation resample of a 1D float32 waveform."""
+    if orig_rate == target_rate or waveform.size == 0:
+        return waveform.astype(np.float32, copy=False)
+    duration = waveform.size / orig_rate
+    target_size = int(round(duration * target_rate))
+    src_times = np.arange(waveform.size) / orig_rate
+    dst_times = np.arange(target_size) / target_rate
+    return np.interp(dst_times, src_times, waveform).astype(np.float32)
+
+
+def pcm_to_float32(frames, sample_width, channels):
+    """Converts raw little-endian PCM bytes to a mono float32 array in [-1, 1]."""
+    if sample_width == 2:
+        data = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 4:
+        data = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    elif sample_width == 1:
+        data = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width} bytes")
+    if channels > 1:
+        data = data.reshape(-1, channels).mean(axis=1)
+    return data
+
+
+def read_wav(path, target_rate=SAMPLE_RATE):
+    """Reads a PCM WAV file as a mono float32 array at `target_rate`."""
+    with wave.open(str(path), "rb") as wf:
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        rate = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+    return resample(pcm_to_float32(frames, sample_width, channels), rate, target_rate)
+
+
+def _wav_layout(path):
+    """Finds the format and the byte range of the sample data in a RIFF/WAVE file."""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"{path} is not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            chunk_id, size = chunk[:4], int.from_bytes(chunk[4:], "little")
+            if chunk_id == b"fmt ":
+                body = f.read(size + size % 2)
+                fmt = {
+                    "format": int.from_bytes(body[0:2], "little"),
+                    "channels": int.from_bytes(body[2:4], "little"),
+                    "rate": int.from_bytes(body[4:8], "little"),
+                    "sample_width": int.from_bytes(body[14:16], "little") // 8,
+                }
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"{path} has data before its fmt chunk")
+                return fmt, f.tell(), size
+            else:
+                f.seek(size + size % 2, 1)
+
+
+def open_wav_memmap(path):
+    """
+    Memory-maps the samples of a PCM WAV file without reading it.
+
+    Returns:
+        tuple: (np.memmap of shape (frames, channels), sample rate)
+    """
+    fmt, offset, size = _wav_layout(path)
+    dtypes = {1: np.uint8, 2: "<i2", 4: "<i4"}
+    if fmt["format"] == 3 and fmt["sample_width"] == 4:
+        dtype = "<f4"
+    elif fmt["format"] in (1, 0xFFFE) and fmt["sample_width"] in dtypes:
+        dtype = dtypes[fmt["sample_width"]]
+    else:
+        raise ValueError(f"Unsupported WAV encoding in {path}")
+    frames = size // (fmt["sample_width"] * fmt["channels"])
+    data = np.memmap(
+        path, dtype=dtype, mode="r", offset=offset, shape=(frames, fmt["channels"])
+    )
+    return data, fmt["rate"]
+
+
+def _to_float32(block):
+    if block.dtype == np.uint8:
+        block = (block.astype(np.float32) - 128) / 128.0
+    elif block.dtype.kind == "i":
+        block = block.astype(np.float32) / float(np.iinfo(block.dtype).max + 1)
+    return block.astype(np.float32, copy=False).mean(axis=1)
+
+
+def iter_wav_blocks(path, block_seconds=1.0, target_rate=SAMPLE_RATE):
+    """
+    Yields a WAV file as consecutive mono float32 blocks at `target_rate`.
+
+    Only the source samples needed for each block are touched, so arbitrarily
+    long files stream in constant memory. Resampling is linear interpolation
+    on the absolute sample clock, so block boundaries are seamless.
+    """
+    data, rate = open_wav_memmap(path)
+    total = int(data.shape[0] * target_rate / rate)
+    block = max(1, int(block_seconds * target_rate))
+    for start in range(0, total, block):
+        stop = min(total, start + block)
+        if rate == target_rate:
+            yield _to_float32(np.asarray(data[start:stop]))
+            continue
+        src_times = np.arange(start, stop) * (rate / target_rate)
+        lo = int(src_times[0])
+        hi = min(data.shape[0], int(src_times[-1]) + 2)
+        source = _to_float32(np.asarray(data[lo:hi]))
+        yield np.interp(src_times, np.arange(lo, hi), source).astype(np.float32)
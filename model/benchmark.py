@@ -0,0 +1,333 @@
+# benchmark.py
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE, iter_wav_blocks, open_wav_memmap
+from classifier import BACKENDS as CLASSIFIER_BACKENDS
+from embedding_cache import IncrementalEmbedder, frames_for_window
+from energy_gate import EnergyGate
+from inference_service import BatchedInferenceService
+from live_scream_detector import (
+    HOP_DURATION,
+    WINDOW_DURATION,
+    classify_embeddings,
+    load_models,
+)
+from ring_buffer import AudioRingBuffer
+
+# --- Constants ---
+THRESHOLDS = (0.3, 0.5, 0.7, 0.9)
+MODES = ("single", "batched", "streaming")
+BLOCK_SECONDS = 1.0  # Memory-mapped read size
+PERCENTILES = (50, 90, 99)
+
+
+class LatencyRecorder:
+    """Wall-clock samples per named pipeline stage, plus free-form counters."""
+
+    def __init__(self):
+        self.samples = {}
+        self.counters = {}
+
+    def time(self, stage):
+        return _Timed(self, stage)
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        result = {}
+        for stage, values in self.samples.items():
+            values = np.asarray(values) * 1000.0
+            result[stage] = {
+                "count": int(values.size),
+                **{f"p{p}_ms": float(np.percentile(values, p)) for p in PERCENTILES},
+                "max_ms": float(values.max()),
+            }
+        return result
+
+
+class _Timed:
+    def __init__(self, recorder, stage):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.add(self.stage, time.perf_counter() - self._start)
+        return False
+
+
+def load_labels(directory, labels_path=None):
+    """
+    Ground truth per WAV file: 1 = scream, 0 = no scream.
+
+    Read from a "filename,label" CSV when given; otherwise files with
+    "scream" in their name are positives and everything else is negative.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.wav")))
+    if labels_path:
+        with open(labels_path, newline="") as f:
+            given = {row[0]: int(row[1]) for row in csv.reader(f) if row}
+        return {
+            p: given[os.path.basename(p)] for p in paths if os.path.basename(p) in given
+        }
+    return {p: int("scream" in os.path.basename(p).lower()) for p in paths}
+
+
+def timed_blocks(path, block_seconds, recorder):
+    """Memory-mapped blocks of a file, timing the read + resample of each."""
+    blocks = iter_wav_blocks(path, block_seconds)
+    while True:
+        with recorder.time("resample"):
+            block = next(blocks, None)
+        if block is None:
+            return
+        yield block
+
+
+def read_resampled(path, recorder):
+    blocks = list(timed_blocks(path, BLOCK_SECONDS, recorder))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+# --- Modes ---
+def run_single(yamnet_model, classifier_model, labels, recorder, args):
+    """Whole file in one predict_scream-style pass: YAMNet, mean pool, classify."""
+    scores = {}
+    for path in labels:
+        waveform = read_resampled(path, recorder)
+        with recorder.time("yamnet"):
+            _, embeddings, _ = yamnet_model(waveform)
+            embeddings = embeddings.numpy()
+        with recorder.time("aggregate"):
+            clip_embedding = embeddings.mean(axis=0, keepdims=True)
+        with recorder.time("classifier"):
+            scores[path] = float(
+                classify_embeddings(classifier_model, clip_embedding)[0]
+            )
+    return scores
+
+
+def run_batched(yamnet_model, classifier_model, labels, recorder, args):
+    """All windows of all files through the batched service; file score = max window."""
+    service = BatchedInferenceService(
+        yamnet_model,
+        classifier_model,
+        max_batch_size=args.max_batch,
+        use_gate=args.gate,
+    ).start()
+    window = int(args.window * SAMPLE_RATE)
+    hop = int(args.hop * SAMPLE_RATE)
+    pending = []
+    try:
+        for path in labels:
+            waveform = read_resampled(path, recorder)
+            for start in range(0, max(1, waveform.size - window + 1), hop):
+                submitted = time.perf_counter()
+                future = service.submit(path, waveform[start : start + window])
+                pending.append((path, submitted, future))
+
+        scores = {path: 0.0 for path in labels}
+        for path, submitted, future in pending:
+            _, probability = future.result()
+            recorder.add("clip_latency", time.perf_counter() - submitted)
+            scores[path] = max(scores[path], probability)
+    finally:
+        service.stop()
+    recorder.counters["mean_batch_size"] = service.clips / max(1, service.batches)
+    recorder.counters["gated_clips"] = service.gated
+    return scores
+
+
+def run_streaming(yamnet_model, classifier_model, labels, recorder, args):
+    """Replays each file hop by hop through the incremental embedder; file score = max hop."""
+    window = int(args.window * SAMPLE_RATE)
+    hop = int(args.hop * SAMPLE_RATE)
+    scores = {}
+    for path in labels:
+        ring = AudioRingBuffer(SAMPLE_RATE * 30)
+        embedder = IncrementalEmbedder(
+            yamnet_model,
+            frames_for_window(window),
+            gate=EnergyGate() if args.gate else None,
+        )
+        best = 0.0
+        # Hop-sized memory-mapped blocks, so long files never sit in memory
+        for block in timed_blocks(path, hop / SAMPLE_RATE, recorder):
+            ring.write(block)
+            with recorder.time("yamnet"):
+                new_frames = embedder.update(
+                    ring.read, ring.write_pos, oldest_sample=ring.oldest_available()
+                )
+            if not new_frames:
+                continue
+            with recorder.time("aggregate"):
+                clip_embedding = embedder.clip_embedding()[None, :]
+            with recorder.time("classifier"):
+                probability = float(
+                    classify_embeddings(classifier_model, clip_embedding)[0]
+                )
+            best = max(best, probability)
+        scores[path] = best
+        if embedder.gate is not None:
+            recorder.counters["gated_frames"] = (
+                recorder.counters.get("gated_frames", 0) + embedder.frames_gated
+            )
+    return scores
+
+
+RUNNERS = {"single": run_single, "batched": run_batched, "streaming": run_streaming}
+
+
+# --- Reporting ---
+def precision_recall(scores, labels, thresholds):
+    rows = []
+    for threshold in thresholds:
+        tp = sum(1 for p, s in scores.items() if s >= threshold and labels[p])
+        fp = sum(1 for p, s in scores.items() if s >= threshold and not labels[p])
+        fn = sum(1 for p, s in scores.items() if s < threshold and labels[p])
+        rows.append(
+            {
+                "threshold": threshold,
+                "precision": tp / (tp + fp) if tp + fp else 0.0,
+                "recall": tp / (tp + fn) if tp + fn else 0.0,
+            }
+        )
+    return rows
+
+
+def audio_seconds(paths):
+    total = 0.0
+    for path in paths:
+        data, rate = open_wav_memmap(path)
+        total += data.shape[0] / rate
+    return total
+
+
+def print_report(report):
+    for mode, result in report["modes"].items():
+        print(f"\n=== {mode} ===")
+        print(
+            f"wall {result['wall_seconds']:.2f} s for {report['audio_seconds']:.1f} s of audio, "
+            f"realtime factor {result['realtime_factor']:.4f} ({1 / max(result['realtime_factor'], 1e-9):.1f}x realtime)"
+        )
+        for stage, stats in result["latency"].items():
+            percentiles = "  ".join(
+                f"p{p} {stats[f'p{p}_ms']:8.2f} ms" for p in PERCENTILES
+            )
+            print(
+                f"  {stage:<13} n={stats['count']:<6} {percentiles}  max {stats['max_ms']:8.2f} ms"
+            )
+        for name, value in result["counters"].items():
+            print(f"  {name}: {value:g}")
+        for row in result["precision_recall"]:
+            print(
+                f"  threshold {row['threshold']:.2f}: precision {row['precision']:.3f}  recall {row['recall']:.3f}"
+            )
+
+
+def find_regressions(report, baseline, tolerance):
+    """Modes whose realtime factor grew by more than `tolerance` over the baseline."""
+    regressions = []
+    for mode, result in report["modes"].items():
+        old = baseline.get("modes", {}).get(mode)
+        if old and result["realtime_factor"] > old["realtime_factor"] * (1 + tolerance):
+            regressions.append(
+                f"{mode}: realtime factor {old['realtime_factor']:.4f} -> {result['realtime_factor']:.4f}"
+            )
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Scream model evaluation and throughput benchmark"
+    )
+    parser.add_argument(
+        "directory", nargs="?", default=".", help="Directory of WAV files"
+    )
+    parser.add_argument(
+        "--labels", default=None, help="CSV of filename,label (1 = scream)"
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--thresholds", nargs="+", type=float, default=list(THRESHOLDS))
+    parser.add_argument("--window", type=float, default=WINDOW_DURATION)
+    parser.add_argument("--hop", type=float, default=HOP_DURATION)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--gate", action="store_true", help="Enable the energy gate")
+    parser.add_argument(
+        "--classifier-backend", choices=CLASSIFIER_BACKENDS, default="tf"
+    )
+    parser.add_argument("--offline", action="store_true", help="Never download models")
+    parser.add_argument("--json", default=None, help="Write the report to this file")
+    parser.add_argument(
+        "--baseline", default=None, help="Earlier --json report to compare against"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative realtime-factor slowdown against the baseline",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    labels = load_labels(args.directory, args.labels)
+    if not labels:
+        print(f"No labelled WAV files found in {args.directory}.")
+        sys.exit(1)
+
+    yamnet_model, classifier_model = load_models(
+        classifier_backend=args.classifier_backend, offline=args.offline
+    )
+    if yamnet_model is None or classifier_model is None:
+        print("Failed to load one or both models. Exiting.")
+        sys.exit(1)
+
+    report = {
+        "files": len(labels),
+        "positives": sum(labels.values()),
+        "audio_seconds": audio_seconds(labels),
+        "modes": {},
+    }
+    for mode in args.modes:
+        recorder = LatencyRecorder()
+        start = time.perf_counter()
+        scores = RUNNERS[mode](yamnet_model, classifier_model, labels, recorder, args)
+        wall = time.perf_counter() - start
+        report["modes"][mode] = {
+            "wall_seconds": wall,
+            "realtime_factor": wall / report["audio_seconds"],
+            "latency": recorder.summary(),
+            "counters": recorder.counters,
+            "precision_recall": precision_recall(scores, labels, args.thresholds),
+            "scores": {os.path.basename(p): s for p, s in scores.items()},
+        }
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nPerformance regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(2)
+        print("\nNo performance regressions against the baseline.")
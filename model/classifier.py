@@ -0,0 +1,161 @@
+# classifier.py
+
+import os
+
+import numpy as np
+
+EMBEDDING_SIZE = 1024
+PREFERRED_OUTPUT_KEY = "dense_2"  # Output key found during debugging
+BACKENDS = ("tf", "tflite", "onnx")
+
+
+class ScreamClassifier:
+    """
+    Scream classifier as a plain callable: (N, 1024) float32 embeddings in,
+    (N,) probabilities out.
+
+    Every backend resolves its input/output names once at load time, so a
+    call is just the model itself, without Keras `predict()` machinery or
+    output-key probing.
+    """
+
+    def __init__(self, run, backend):
+        self._run = run
+        self.backend = backend
+
+    def __call__(self, embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(
+            -1, EMBEDDING_SIZE
+        )
+        return np.asarray(self._run(embeddings)).reshape(-1)
+
+    def warm_up(self, batch_sizes=(1,), repeats=3):
+        """Runs dummy batches so tracing and allocation happen at startup."""
+        for batch_size in batch_sizes:
+            dummy = np.zeros((batch_size, EMBEDDING_SIZE), dtype=np.float32)
+            for _ in range(repeats):
+                self(dummy)
+        return self
+
+
+def _resolve_output_key(keys):
+    keys = list(keys)
+    if PREFERRED_OUTPUT_KEY in keys:
+        return PREFERRED_OUTPUT_KEY
+    if len(keys) != 1:
+        raise ValueError(f"Cannot choose a classifier output among {keys}")
+    print(f"Warning: Output key '{PREFERRED_OUTPUT_KEY}' not found. Using '{keys[0]}'.")
+    return keys[0]
+
+
+def _load_tf(saved_model_path):
+    import tensorflow as tf
+
+    loaded = tf.saved_model.load(saved_model_path)
+    serving_fn = loaded.signatures["serving_default"]
+    input_key = list(serving_fn.structured_input_signature[1].keys())[0]
+    output_key = _resolve_output_key(serving_fn.structured_outputs.keys())
+
+    @tf.function(input_signature=[tf.TensorSpec([None, EMBEDDING_SIZE], tf.float32)])
+    def compiled(embeddings):
+        return serving_fn(**{input_key: embeddings})[output_key][:, 0]
+
+    def run(embeddings):
+        return compiled(tf.constant(embeddings)).numpy()
+
+    run.loaded = loaded  # Keep the SavedModel alive alongside the function
+    return run
+
+
+def _tflite_interpreter(model_path):
+    try:
+        from tflite_runtime.interpreter import Interpreter  # Edge nodes
+    except ImportError:
+        import tensorflow as tf
+
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path)
+
+
+def _load_tflite(saved_model_path):
+    tflite_path = saved_model_path.rstrip("/\\") + ".tflite"
+    stale = not os.path.exists(tflite_path) or (
+        os.path.getmtime(tflite_path) < os.path.getmtime(saved_model_path)
+    )
+    if stale:
+        import tensorflow as tf
+
+        print(f"Exporting classifier to {tflite_path}...")
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_path)
+        with open(tflite_path, "wb") as f:
+            f.write(converter.convert())
+
+    interpreter = _tflite_interpreter(tflite_path)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]["index"]
+    output_index = interpreter.get_output_details()[0]["index"]
+    batch_size = [interpreter.get_input_details()[0]["shape"][0]]
+
+    def run(embeddings):
+        if embeddings.shape[0] != batch_size[0]:
+            interpreter.resize_tensor_input(input_index, embeddings.shape)
+            interpreter.allocate_tensors()
+            batch_size[0] = embeddings.shape[0]
+        interpreter.set_tensor(input_index, embeddings)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)[:, 0]
+
+    return run
+
+
+def _load_onnx(saved_model_path):
+    onnx_path = saved_model_path.rstrip("/\\") + ".onnx"
+    if not os.path.exists(onnx_path):
+        raise FileNotFoundError(
+            f"{onnx_path} not found. Export it with: python -m tf2onnx.convert "
+            f"--saved-model {saved_model_path} --output {onnx_path}"
+        )
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("The onnx backend needs the onnxruntime package") from e
+
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    outputs = [output.name for output in session.get_outputs()]
+    output_name = outputs[0]
+    for name in outputs:
+        if PREFERRED_OUTPUT_KEY in name:
+            output_name = name
+
+    def run(embeddings):
+        return session.run([output_name], {input_name: embeddings})[0][:, 0]
+
+    return run
+
+
+def load_classifier(saved_model_path, backend="tf", warm_up=True):
+    """
+    Loads the scream detector SavedModel as a ScreamClassifier.
+
+    Args:
+        saved_model_path (str): Path to the SavedModel directory.
+        backend (str): "tf" for a tf.function with a fixed input signature,
+            "tflite" for a TFLite export (created next to the SavedModel on
+            first use), or "onnx" for an existing ONNX export run with
+            onnxruntime.
+        warm_up (bool): Run dummy inputs before returning.
+    """
+    if backend == "tf":
+        run = _load_tf(saved_model_path)
+    elif backend == "tflite":
+        run = _load_tflite(saved_model_path)
+    elif backend == "onnx":
+        run = _load_onnx(saved_model_path)
+    else:
+        raise ValueError(f"Unknown classifier backend {backend!r}, expected {BACKENDS}")
+
+    classifier = ScreamClassifier(run, backend)
+    if warm_up:
+        classifier.warm_up()
+    return classifier
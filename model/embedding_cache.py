@@ -0,0 +1,219 @@
+# embedding_cache.py
+
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+
+# YAMNet framing at 16 kHz: 0.96 s patches every 0.48 s. A patch needs an
+# extra 0.015 s of audio for the STFT window overhang, so one patch spans
+# 15600 samples and n patches span FRAME_SAMPLES + (n - 1) * FRAME_HOP_SAMPLES.
+FRAME_HOP_SAMPLES = 7680
+FRAME_SAMPLES = 15600
+EMBEDDING_SIZE = 1024
+
+
+def frames_in(num_samples):
+    """Number of complete YAMNet frames in `num_samples` samples."""
+    if num_samples < FRAME_SAMPLES:
+        return 0
+    return 1 + (num_samples - FRAME_SAMPLES) // FRAME_HOP_SAMPLES
+
+
+def frames_for_window(window_samples):
+    """YAMNet frames used to summarise a window (YAMNet pads short windows to one)."""
+    return max(1, frames_in(window_samples))
+
+
+def yamnet_frame_count(num_samples):
+    """Number of frames YAMNet returns for a clip (it pads clips up to whole frames)."""
+    extra = max(0, num_samples - FRAME_SAMPLES)
+    return 1 + -(-extra // FRAME_HOP_SAMPLES)
+
+
+def pack_clips(waveforms):
+    """
+    Lays several clips end to end in one waveform so a single YAMNet call
+    embeds all of them.
+
+    Every clip starts on a frame boundary and is followed by enough silence
+    that none of its own frames overlap the next clip. Frames that straddle
+    two slots are simply ignored.
+
+    Returns:
+        tuple: (packed float32 waveform, list of (first_frame, num_frames) per clip)
+    """
+    spans = []
+    slots = []
+    frame = 0
+    for waveform in waveforms:
+        num_frames = yamnet_frame_count(waveform.size)
+        # n frames need FRAME_SAMPLES + (n - 1) hops = (n + 1) hops + 240
+        # samples, so n + 2 hops always leaves the next slot untouched.
+        slot = np.zeros((num_frames + 2) * FRAME_HOP_SAMPLES, dtype=np.float32)
+        slot[: waveform.size] = waveform
+        slots.append(slot)
+        spans.append((frame, num_frames))
+        frame += num_frames + 2
+    return np.concatenate(slots), spans
+
+
+def embed_frames(yamnet_model, waveform, num_frames):
+    """
+    Runs YAMNet on a frame-aligned segment and returns its first `num_frames`
+    embeddings as a (num_frames, 1024) float32 array.
+    """
+    _, embeddings, _ = yamnet_model(np.asarray(waveform, dtype=np.float32))
+    return embeddings.numpy()[:num_frames]
+
+
+class IncrementalEmbedder:
+    """
+    Rolling cache of per-frame YAMNet embeddings for a continuous stream.
+
+    Frames are keyed by their absolute index (frame k starts at sample
+    k * FRAME_HOP_SAMPLES). Each update embeds only the frames that became
+    complete since the previous call, in a single YAMNet call, and keeps a
+    running sum so the clip embedding of the last `window_frames` frames is
+    available without touching the rest of the window again.
+
+    With an EnergyGate, frames the gate rejects are not sent to YAMNet at
+    all; they take a cached embedding of silence instead, so the window
+    mean keeps its meaning while quiet audio costs almost nothing. The gate
+    is shown each sample once, in stream order: a frame's check covers only
+    the audio it adds to the previous frame (its last FRAME_HOP_SAMPLES),
+    and the gate's hangover keeps the frame after an active one open, since
+    that frame also holds the active audio.
+    """
+
+    # Rebuild the running sum from scratch this often to stop float drift
+    RESUM_INTERVAL = 1000
+
+    def __init__(self, yamnet_model, window_frames, gate=None):
+        if window_frames <= 0:
+            raise ValueError("window_frames must be positive")
+        self.yamnet_model = yamnet_model
+        self.window_frames = int(window_frames)
+        self.gate = gate
+        self._silence = None  # Embedding of an all-zero frame, computed on demand
+        # frame index -> (1024,) float32 embedding, oldest first
+        self._embeddings = OrderedDict()
+        self._sum = np.zeros(EMBEDDING_SIZE, dtype=np.float64)
+        self._updates = 0
+        self.next_frame = 0  # First frame index not embedded yet
+        self._gated_until = 0  # Absolute index one past the last gated sample
+        self.frames_embedded = 0
+        self.frames_skipped = 0
+        self.frames_gated = 0
+
+    def update(self, read, available_samples, oldest_sample=0):
+        """
+        Embeds every frame that is complete within `available_samples`.
+
+        Args:
+            read: Callable (start, n) -> np.ndarray or None returning absolute
+                samples [start, start + n), e.g. AudioRingBuffer.read.
+            available_samples (int): Absolute index one past the newest sample.
+            oldest_sample (int): Absolute index of the oldest readable sample.
+
+        Returns:
+            int: Number of newly embedded frames.
+        """
+        last_frame = frames_in(available_samples) - 1
+        # Frames that would be evicted straight away, or whose audio is
+        # already gone, are never worth embedding.
+        first_frame = max(
+            self.next_frame,
+            last_frame - self.window_frames + 1,
+            -(-oldest_sample // FRAME_HOP_SAMPLES),
+        )
+        if first_frame > self.next_frame:
+            self.frames_skipped += first_frame - self.next_frame
+        num_frames = last_frame - first_frame + 1
+        if num_frames <= 0:
+            return 0
+
+        start = first_frame * FRAME_HOP_SAMPLES
+        length = FRAME_SAMPLES + (num_frames - 1) * FRAME_HOP_SAMPLES
+        waveform = read(start, length)
+        if waveform is None:
+            return 0
+
+        embeddings = self._embed(waveform, start, num_frames)
+        for offset, embedding in enumerate(embeddings):
+            self._add(first_frame + offset, embedding)
+        self.next_frame = first_frame + len(embeddings)
+        self.frames_embedded += len(embeddings)
+        self._evict(self.next_frame - self.window_frames)
+        return len(embeddings)
+
+    def _embed(self, waveform, start, num_frames):
+        if self.gate is None:
+            return embed_frames(self.yamnet_model, waveform, num_frames)
+
+        active = []
+        for i in range(num_frames):
+            # Only audio the gate has not seen yet: the frame's last hop, or
+            # all of it after a gap (the first frame, or skipped frames)
+            frame_end = i * FRAME_HOP_SAMPLES + FRAME_SAMPLES
+            new_start = max(i * FRAME_HOP_SAMPLES, self._gated_until - start)
+            active.append(self.gate.is_active(waveform[new_start:frame_end]))
+            self._gated_until = start + frame_end
+        embeddings = np.empty((num_frames, EMBEDDING_SIZE), dtype=np.float32)
+        if not all(active):
+            embeddings[:] = self.silence_embedding()
+            self.frames_gated += num_frames - sum(active)
+        if any(active):
+            # One YAMNet call over the span from the first to the last active frame
+            first = active.index(True)
+            last = num_frames - 1 - active[::-1].index(True)
+            start = first * FRAME_HOP_SAMPLES
+            end = last * FRAME_HOP_SAMPLES + FRAME_SAMPLES
+            embeddings[first : last + 1] = embed_frames(
+                self.yamnet_model, waveform[start:end], last - first + 1
+            )
+        return embeddings
+
+    def silence_embedding(self):
+        if self._silence is None:
+            silence = np.zeros(FRAME_SAMPLES, dtype=np.float32)
+            self._silence = embed_frames(self.yamnet_model, silence, 1)[0]
+        return self._silence
+
+    def _add(self, index, embedding):
+        self._embeddings[index] = embedding
+        self._sum += embedding
+
+    def _evict(self, first_kept):
+        while self._embeddings and next(iter(self._embeddings)) < first_kept:
+            _, embedding = self._embeddings.popitem(last=False)
+            self._sum -= embedding
+
+        self._updates += 1
+        if self._updates % self.RESUM_INTERVAL == 0:
+            self._sum = np.zeros(EMBEDDING_SIZE, dtype=np.float64)
+            for embedding in self._embeddings.values():
+                self._sum += embedding
+
+    def __len__(self):
+        return len(self._embeddings)
+
+    def recent_frames(self, count):
+        """The newest `count` cached frame embeddings as a (count, 1024) array."""
+        count = min(count, len(self._embeddings))
+        if count == 0:
+            return np.zeros((0, EMBEDDING_SIZE), dtype=np.float32)
+        newest = islice(reversed(self._embeddings.values()), count)
+        return np.stack(list(newest)[::-1])
+
+    def frame_embeddings(self):
+        """Cached embeddings in frame order as a (n, 1024) array."""
+        if not self._embeddings:
+            return np.zeros((0, EMBEDDING_SIZE), dtype=np.float32)
+        return np.stack(list(self._embeddings.values()))
+
+    def clip_embedding(self):
+        """Mean embedding over the cached window, or None if it is empty."""
+        if not self._embeddings:
+            return None
+        return (self._sum / len(self._embeddings)).astype(np.float32)
@@ -0,0 +1,131 @@
+# energy_gate.py
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+
+# --- Constants ---
+FRAME_DURATION = 0.032  # Seconds per analysis frame (512 samples at 16 kHz)
+MARGIN_DB = 6.0  # Level above the noise floor that opens the gate
+FLUX_THRESHOLD = 2.0  # Spectral flux (relative to the running mean) that opens the gate
+ALWAYS_PASS_DB = -30.0  # Anything this loud is always passed, whatever the floor
+MIN_LEVEL_DB = -65.0  # Anything quieter than this is never passed
+FLOOR_RISE = 0.02  # Per-frame adaptation rate while the floor is rising
+FLOOR_FALL = 0.3  # Per-frame adaptation rate while the floor is falling
+HANGOVER_CHECKS = 2  # Checks kept open after the last active one
+
+
+class EnergyGate:
+    """
+    Cheap pre-filter that decides whether audio could plausibly hold a scream.
+
+    Each check splits the audio into short frames and computes, vectorised:
+      * RMS level in dBFS, compared against an adaptive noise floor,
+      * spectral flux, which catches sudden onsets even in steady hum.
+    The noise floor follows quiet frames quickly downward and slowly upward,
+    so a long scream cannot drag the floor up to its own level. Loud audio is
+    always passed and the gate stays open for a few checks after activity to
+    protect recall on scream tails.
+    """
+
+    def __init__(
+        self,
+        sample_rate=SAMPLE_RATE,
+        frame_duration=FRAME_DURATION,
+        margin_db=MARGIN_DB,
+        flux_threshold=FLUX_THRESHOLD,
+        always_pass_db=ALWAYS_PASS_DB,
+        min_level_db=MIN_LEVEL_DB,
+        hangover_checks=HANGOVER_CHECKS,
+    ):
+        self.frame_size = int(frame_duration * sample_rate)
+        self.margin_db = margin_db
+        self.flux_threshold = flux_threshold
+        self.always_pass_db = always_pass_db
+        self.min_level_db = min_level_db
+        self.hangover_checks = hangover_checks
+        self._window = np.hanning(self.frame_size).astype(np.float32)
+
+        self.noise_floor_db = None
+        self._mean_flux = None
+        self._last_spectrum = None
+        self._hangover = 0
+
+        # Counters
+        self.checks = 0
+        self.gated = 0
+
+    def _frames(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        count = samples.size // self.frame_size
+        if count == 0:
+            padded = np.zeros(self.frame_size, dtype=np.float32)
+            padded[: samples.size] = samples
+            return padded[None, :]
+        return samples[: count * self.frame_size].reshape(count, self.frame_size)
+
+    def _update_floor(self, levels_db):
+        # Track the quiet part of the block, one update per block scaled to
+        # the number of frames it holds
+        quiet = float(np.percentile(levels_db, 20))
+        if self.noise_floor_db is None:
+            self.noise_floor_db = quiet
+            return
+        rate = FLOOR_RISE if quiet > self.noise_floor_db else FLOOR_FALL
+        rate = 1.0 - (1.0 - rate) ** len(levels_db)
+        self.noise_floor_db += rate * (quiet - self.noise_floor_db)
+
+    def _flux(self, frames):
+        spectra = np.abs(np.fft.rfft(frames * self._window, axis=1))
+        if self._last_spectrum is not None:
+            spectra_with_prev = np.vstack([self._last_spectrum[None, :], spectra])
+        else:
+            spectra_with_prev = np.vstack([spectra[:1], spectra])
+        self._last_spectrum = spectra[-1]
+        # Half-wave rectified frame-to-frame increase, normalised per frame
+        diff = np.maximum(np.diff(spectra_with_prev, axis=0), 0.0).sum(axis=1)
+        flux = diff / (spectra.sum(axis=1) + 1e-9)
+        if self._mean_flux is None:
+            self._mean_flux = float(flux.mean()) + 1e-6
+        relative = flux / self._mean_flux
+        self._mean_flux += FLOOR_RISE * (float(flux.mean()) - self._mean_flux)
+        return relative
+
+    def is_active(self, samples):
+        """
+        Returns True if `samples` should go through YAMNet.
+
+        Updates the noise floor and the gated counter as a side effect, so
+        call it once per block of new audio, in stream order.
+        """
+        frames = self._frames(samples)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        levels_db = 20.0 * np.log10(rms + 1e-10)
+        flux = self._flux(frames)
+
+        floor = self.noise_floor_db if self.noise_floor_db is not None else -120.0
+        loud_enough = levels_db > self.min_level_db
+        active = np.any(
+            (levels_db >= self.always_pass_db)
+            | (loud_enough & (levels_db > floor + self.margin_db))
+            | (loud_enough & (flux > self.flux_threshold))
+        )
+        self._update_floor(levels_db)
+
+        self.checks += 1
+        if active:
+            self._hangover = self.hangover_checks
+            return True
+        if self._hangover > 0:
+            self._hangover -= 1
+            return True
+        self.gated += 1
+        return False
+
+    def stats(self):
+        return {
+            "checks": self.checks,
+            "gated": self.gated,
+            "gated_fraction": self.gated / self.checks if self.checks else 0.0,
+            "noise_floor_db": self.noise_floor_db,
+        }
@@ -0,0 +1,162 @@
+# event_detector.py
+
+from collections import deque
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+from embedding_cache import FRAME_HOP_SAMPLES, FRAME_SAMPLES
+
+# --- Constants ---
+ON_THRESHOLD = 0.6  # Smoothed score that opens an event
+OFF_THRESHOLD = 0.4  # Smoothed score that closes it again
+SMOOTHING_FRAMES = 2  # Moving-average length over per-frame scores (0.48 s hops)
+MIN_EVENT_FRAMES = 1  # Shorter events are dropped
+
+FRAME_HOP_SECONDS = FRAME_HOP_SAMPLES / SAMPLE_RATE
+FRAME_SECONDS = FRAME_SAMPLES / SAMPLE_RATE
+
+
+class ScreamEvent:
+    """One detected scream: onset/offset in stream seconds and its peak score."""
+
+    def __init__(self, onset, peak_score, peak_time):
+        self.onset = onset
+        self.offset = None
+        self.peak_score = peak_score
+        self.peak_time = peak_time
+
+    @property
+    def duration(self):
+        return None if self.offset is None else self.offset - self.onset
+
+    def as_dict(self):
+        return {
+            "onset": self.onset,
+            "offset": self.offset,
+            "peak_score": self.peak_score,
+            "peak_time": self.peak_time,
+        }
+
+    def __repr__(self):
+        offset = "open" if self.offset is None else f"{self.offset:.2f}s"
+        return f"ScreamEvent(onset={self.onset:.2f}s, offset={offset}, peak={self.peak_score:.3f})"
+
+
+class HysteresisTracker:
+    """
+    Turns a stream of per-frame scores into scream events.
+
+    Scores are smoothed with a short moving average. An event opens when the
+    smoothed score reaches `on_threshold` and closes once it falls below
+    `off_threshold`, so a score hovering around one threshold does not
+    produce a burst of events. Because smoothing delays the crossing, the
+    onset is backdated to the first frame in the smoothing window that was
+    already above `off_threshold`. Frame k covers stream time
+    [k * 0.48 s, k * 0.48 s + 0.975 s).
+    """
+
+    def __init__(
+        self,
+        on_threshold=ON_THRESHOLD,
+        off_threshold=OFF_THRESHOLD,
+        smoothing_frames=SMOOTHING_FRAMES,
+        min_event_frames=MIN_EVENT_FRAMES,
+    ):
+        if off_threshold > on_threshold:
+            raise ValueError("off_threshold must not exceed on_threshold")
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.min_event_frames = min_event_frames
+        self._recent = deque(maxlen=max(1, smoothing_frames))
+        self._event = None
+        self._event_frames = 0
+        self._last_frame = -1
+
+    @property
+    def active(self):
+        return self._event is not None
+
+    def update(self, frame_index, score):
+        """
+        Feeds the score of one frame (frames must arrive in order).
+
+        Returns:
+            tuple: (ScreamEvent that just started or None,
+                    ScreamEvent that just ended or None)
+        """
+        if frame_index > self._last_frame + 1:
+            # Skipped frames (e.g. the stream fell behind) break the smoothing
+            self._recent.clear()
+        self._last_frame = frame_index
+        self._recent.append((frame_index, float(score)))
+        smoothed = sum(s for _, s in self._recent) / len(self._recent)
+        frame_time = frame_index * FRAME_HOP_SECONDS
+
+        if self._event is None:
+            if smoothed >= self.on_threshold:
+                onset_frame = next(
+                    i for i, s in self._recent if s >= self.off_threshold
+                )
+                peak_frame, peak = max(self._recent, key=lambda item: item[1])
+                self._event = ScreamEvent(
+                    onset_frame * FRAME_HOP_SECONDS,
+                    peak,
+                    peak_frame * FRAME_HOP_SECONDS,
+                )
+                self._event_frames = frame_index - onset_frame + 1
+                return self._event, None
+            return None, None
+
+        self._event_frames += 1
+        if score > self._event.peak_score:
+            self._event.peak_score = float(score)
+            self._event.peak_time = frame_time
+        if smoothed < self.off_threshold:
+            return None, self._close(frame_time)
+        return None, None
+
+    def flush(self):
+        """Closes an event that is still open at the end of the stream."""
+        if self._event is None:
+            return None
+        return self._close(self._last_frame * FRAME_HOP_SECONDS + FRAME_SECONDS)
+
+    def _close(self, offset):
+        event, self._event = self._event, None
+        event.offset = offset
+        if self._event_frames < self.min_event_frames:
+            return None
+        return event
+
+
+def score_frames(classifier_model, frame_embeddings):
+    """Per-frame scream probabilities for (n, 1024) embeddings, in one classifier call."""
+    if len(frame_embeddings) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.asarray(classifier_model(frame_embeddings)).reshape(-1)
+
+
+def detect_events(yamnet_model, classifier_model, waveform, tracker=None):
+    """
+    Finds scream events in a whole clip.
+
+    Runs YAMNet once, scores every embedding frame in one classifier call
+    and applies smoothing and hysteresis.
+
+    Returns:
+        list: ScreamEvent objects with onset/offset in seconds from the clip start.
+    """
+    tracker = tracker or HysteresisTracker()
+    _, embeddings, _ = yamnet_model(np.asarray(waveform, dtype=np.float32))
+    scores = score_frames(classifier_model, embeddings.numpy())
+
+    events = []
+    for index, score in enumerate(scores):
+        _, ended = tracker.update(index, score)
+        if ended is not None:
+            events.append(ended)
+    ended = tracker.flush()
+    if ended is not None:
+        events.append(ended)
+    return events
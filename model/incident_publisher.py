@@ -0,0 +1,212 @@
+# incident_publisher.py
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+# --- Constants ---
+INCIDENT_TYPE = "scream"  # incidents.type (see db/schema.sql)
+DEDUPE_SECONDS = 30.0  # Repeat detections from one device within this are dropped
+FLUSH_INTERVAL = 1.0  # Seconds between batched inserts
+MAX_BATCH_ROWS = 100  # Rows per insert
+BACKOFF_INITIAL = 0.5  # Seconds before the first retry
+BACKOFF_MAX = 30.0  # Longest wait between retries
+SPOOL_PATH = "incident_spool.jsonl"
+MAX_SPOOL_ROWS = 10000  # Oldest spooled rows are dropped past this
+QUEUE_SIZE = 1000
+
+
+def severity_for(score):
+    """Maps a detection score to the incidents.severity column."""
+    if score >= 0.9:
+        return "high"
+    if score >= 0.75:
+        return "medium"
+    return "low"
+
+
+def create_supabase_client():
+    """Synchronous Supabase client from SUPABASE_URL / SUPABASE_KEY."""
+    try:
+        from supabase import create_client
+    except ImportError as e:
+        raise ImportError("Publishing incidents needs the supabase package") from e
+    return create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+
+
+class IncidentPublisher(threading.Thread):
+    """
+    Turns positive detections into rows of the `incidents` table.
+
+    Detections are queued without blocking the detector. A background thread
+    drops repeats from the same device within `dedupe_seconds`, and inserts
+    the rest in batches at most once per `flush_interval`, so a burst from
+    many microphones becomes a handful of multi-row inserts.
+
+    If the database is unreachable, batches go to a local JSONL spool file
+    and are retried with exponential backoff. The spool survives restarts
+    and is drained in order once inserts succeed again.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        dedupe_seconds=DEDUPE_SECONDS,
+        flush_interval=FLUSH_INTERVAL,
+        max_batch_rows=MAX_BATCH_ROWS,
+        spool_path=SPOOL_PATH,
+        max_spool_rows=MAX_SPOOL_ROWS,
+    ):
+        super().__init__(name="incident-publisher", daemon=True)
+        self._client = client
+        self.dedupe_seconds = dedupe_seconds
+        self.flush_interval = flush_interval
+        self.max_batch_rows = max_batch_rows
+        self.spool_path = spool_path
+        self.max_spool_rows = max_spool_rows
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._closing = threading.Event()
+        self._last_seen = {}  # device_id -> monotonic time of last published detection
+        self._spool = self._load_spool()
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+
+        # Counters
+        self.published = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.failed_attempts = 0
+
+    # --- Producer side ---
+    def publish(self, device_id, zone_id, score, detected_at=None):
+        """Queues a positive detection. Never blocks."""
+        row = {
+            "device_id": device_id,
+            "zone_id": zone_id,
+            "type": INCIDENT_TYPE,
+            "severity": severity_for(score),
+            "detected_at": (detected_at or datetime.now(timezone.utc)).isoformat(),
+        }
+        try:
+            self._queue.put_nowait((time.monotonic(), row))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        """Stops the thread after one last flush attempt."""
+        self._closing.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    @property
+    def spooled(self):
+        """Rows waiting in the spool for the database to come back."""
+        return len(self._spool)
+
+    # --- Publisher thread ---
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = create_supabase_client()
+        return self._client
+
+    def run(self):
+        pending = []
+        while not self._closing.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            while time.monotonic() < deadline:
+                try:
+                    seen_at, row = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if self._is_duplicate(seen_at, row):
+                    self.deduplicated += 1
+                else:
+                    pending.append(row)
+            self._flush(pending)
+            pending = []
+
+        # Final attempt on shutdown; anything still unsent stays in the spool
+        while not self._queue.empty():
+            seen_at, row = self._queue.get_nowait()
+            if not self._is_duplicate(seen_at, row):
+                pending.append(row)
+        self._next_attempt = 0.0
+        self._flush(pending)
+
+    def _is_duplicate(self, seen_at, row):
+        last = self._last_seen.get(row["device_id"])
+        if last is not None and seen_at - last < self.dedupe_seconds:
+            return True
+        self._last_seen[row["device_id"]] = seen_at
+        return False
+
+    def _flush(self, pending):
+        """Inserts spooled rows first, then new ones; unsent rows stay spooled."""
+        if not pending and not self._spool:
+            return
+        if time.monotonic() < self._next_attempt:
+            if pending:
+                self._spool_rows(pending)
+            return
+
+        rows = self._spool + pending
+        sent = 0
+        try:
+            while sent < len(rows):
+                batch = rows[sent : sent + self.max_batch_rows]
+                self.client.table("incidents").insert(batch).execute()
+                sent += len(batch)
+                self.published += len(batch)
+        except Exception as e:
+            self.failed_attempts += 1
+            self._backoff = min(BACKOFF_MAX, max(BACKOFF_INITIAL, self._backoff * 2))
+            self._next_attempt = time.monotonic() + self._backoff * random.uniform(
+                0.8, 1.2
+            )
+            print(
+                f"Incident insert failed ({e}); {len(rows) - sent} rows spooled, retrying in {self._backoff:.1f} s."
+            )
+        else:
+            self._backoff = 0.0
+
+        self._spool = []
+        self._spool_rows(rows[sent:], rewrite=True)
+
+    # --- Spool file ---
+    def _load_spool(self):
+        if not os.path.exists(self.spool_path):
+            return []
+        with open(self.spool_path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        if rows:
+            print(f"Loaded {len(rows)} unsent incidents from {self.spool_path}.")
+        return rows
+
+    def _spool_rows(self, rows, rewrite=False):
+        self._spool.extend(rows)
+        overflow = len(self._spool) - self.max_spool_rows
+        if overflow > 0:
+            self.dropped += overflow
+            self._spool = self._spool[overflow:]
+            rewrite = True
+        if not rewrite:
+            with open(self.spool_path, "a") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+            return
+        if not self._spool:
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+            return
+        tmp_path = self.spool_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for row in self._spool:
+                f.write(json.dumps(row) + "\n")
+        os.replace(tmp_path, self.spool_path)
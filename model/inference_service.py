@@ -0,0 +1,429 @@
+# inference_service.py
+
+import argparse
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE, read_wav
+from embedding_cache import embed_frames, pack_clips
+from energy_gate import EnergyGate
+from classifier import BACKENDS as CLASSIFIER_BACKENDS
+from live_scream_detector import classify_embeddings, load_models
+from ring_buffer import AudioRingBuffer
+
+# --- Constants ---
+CLIP_DURATION = 0.96  # Seconds of audio per clip submitted by each source
+HOP_DURATION = 0.48  # Seconds between clips from the same source
+MAX_BATCH_SIZE = 32  # Clips per YAMNet/classifier call
+MAX_LATENCY = 0.05  # Seconds the oldest clip may wait for a batch to fill
+QUEUE_SIZE = 1024  # Pending clips before new ones are rejected
+
+
+class ClipRequest:
+    def __init__(self, source_id, waveform):
+        self.source_id = source_id
+        self.waveform = waveform
+        self.submitted_at = time.monotonic()
+        self.future = Future()
+
+
+class BatchedInferenceService:
+    """
+    One YAMNet + classifier instance shared by any number of audio sources.
+
+    Sources submit clips from any thread. A single worker thread groups them
+    into micro-batches (up to `max_batch_size` clips, or whatever arrived
+    within `max_latency` seconds of the oldest one), packs the batch into one
+    waveform for a single YAMNet call and classifies all clip embeddings in a
+    single classifier call.
+
+    With `use_gate`, each source gets its own EnergyGate and clips it rejects
+    are answered immediately as Non-Scream without entering a batch.
+    """
+
+    def __init__(
+        self,
+        yamnet_model,
+        classifier_model,
+        threshold=0.5,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_latency=MAX_LATENCY,
+        queue_size=QUEUE_SIZE,
+        use_gate=True,
+    ):
+        self.yamnet_model = yamnet_model
+        self.classifier_model = classifier_model
+        self.threshold = threshold
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._worker = None
+        self.use_gate = use_gate
+        self._gates = {}  # source_id -> EnergyGate
+
+        # Counters
+        self.batches = 0
+        self.clips = 0
+        self.rejected = 0
+        self.gated = 0
+
+    def start(self):
+        self._stop.clear()
+        self._worker = threading.Thread(
+            target=self._run, name="batched-inference", daemon=True
+        )
+        self._worker.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def submit(self, source_id, waveform):
+        """
+        Queues a clip for classification.
+
+        Returns:
+            Future: Resolves to (str: prediction_label, float: probability).
+        """
+        request = ClipRequest(source_id, np.asarray(waveform, dtype=np.float32).ravel())
+        if request.waveform.size == 0:
+            request.future.set_result(("Error: Empty Waveform Data", 0.0))
+            return request.future
+        if self.use_gate:
+            gate = self._gates.setdefault(source_id, EnergyGate())
+            if not gate.is_active(request.waveform):
+                self.gated += 1
+                request.future.set_result(("Non-Scream", 0.0))
+                return request.future
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            self.rejected += 1
+            request.future.set_result(("Error: Service Overloaded", 0.0))
+        return request.future
+
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.submitted_at + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch):
+        packed, spans = pack_clips([request.waveform for request in batch])
+        try:
+            last_frame = spans[-1][0] + spans[-1][1]
+            frames = embed_frames(self.yamnet_model, packed, last_frame)
+            clip_embeddings = np.stack(
+                [frames[first : first + count].mean(axis=0) for first, count in spans]
+            )
+            probabilities = classify_embeddings(self.classifier_model, clip_embeddings)
+        except Exception as e:
+            print(f"Error during batched inference: {e}")
+            for request in batch:
+                request.future.set_result(("Error: Batch Failed", 0.0))
+            return
+
+        self.batches += 1
+        self.clips += len(batch)
+        for request, probability in zip(batch, probabilities):
+            if np.isnan(probability):
+                result = ("Non-Scream", 0.0)
+            else:
+                label = "Scream" if probability >= self.threshold else "Non-Scream"
+                result = (label, float(probability))
+            request.future.set_result(result)
+
+
+# --- Sources ---
+def print_result(source_id, label, probability, latency):
+    print(
+        f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {source_id}: {label} (Probability: {probability:.4f}, latency {latency * 1000:.0f} ms)"
+    )
+
+
+def _submit_with_callback(service, source_id, waveform, on_result):
+    submitted_at = time.monotonic()
+    future = service.submit(source_id, waveform)
+    future.add_done_callback(
+        lambda f: on_result(source_id, *f.result(), time.monotonic() - submitted_at)
+    )
+
+
+class WavFileSource(threading.Thread):
+    """Feeds a WAV file to the service clip by clip, optionally paced in real time."""
+
+    def __init__(
+        self,
+        service,
+        path,
+        source_id=None,
+        clip_duration=CLIP_DURATION,
+        hop_duration=HOP_DURATION,
+        realtime=False,
+        on_result=print_result,
+    ):
+        super().__init__(name=f"wav-source-{path}", daemon=True)
+        self.service = service
+        self.path = path
+        self.source_id = source_id or str(path)
+        self.clip = int(clip_duration * SAMPLE_RATE)
+        self.hop = int(hop_duration * SAMPLE_RATE)
+        self.realtime = realtime
+        self.on_result = on_result
+
+    def run(self):
+        waveform = read_wav(self.path)
+        start_time = time.monotonic()
+        for start in range(0, max(1, waveform.size - self.clip + 1), self.hop):
+            if self.realtime:
+                due = start_time + (start + self.clip) / SAMPLE_RATE
+                time.sleep(max(0.0, due - time.monotonic()))
+            _submit_with_callback(
+                self.service,
+                self.source_id,
+                waveform[start : start + self.clip],
+                self.on_result,
+            )
+
+
+class DeviceSource(threading.Thread):
+    """Captures a local input device into a ring buffer and submits every hop."""
+
+    BLOCK_SIZE = 1024
+
+    def __init__(
+        self,
+        service,
+        device=None,
+        source_id=None,
+        clip_duration=CLIP_DURATION,
+        hop_duration=HOP_DURATION,
+        on_result=print_result,
+    ):
+        super().__init__(name=f"device-source-{device}", daemon=True)
+        self.service = service
+        self.device = device
+        self.source_id = (
+            source_id or f"device:{device if device is not None else 'default'}"
+        )
+        self.clip = int(clip_duration * SAMPLE_RATE)
+        self.hop = int(hop_duration * SAMPLE_RATE)
+        self.on_result = on_result
+        self.ring = AudioRingBuffer(
+            max(10 * SAMPLE_RATE, 4 * (self.clip + self.BLOCK_SIZE)),
+            guard=self.BLOCK_SIZE,
+        )
+
+    def run(self):
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            self.ring.write(indata[:, 0])
+
+        with sd.InputStream(
+            samplerate=SAMPLE_RATE,
+            channels=1,
+            dtype="float32",
+            blocksize=self.BLOCK_SIZE,
+            device=self.device,
+            callback=callback,
+        ):
+            clip_end = self.clip
+            while True:
+                missing = clip_end - self.ring.write_pos
+                if missing > 0:
+                    time.sleep(missing / SAMPLE_RATE)
+                    continue
+                if clip_end - self.clip < self.ring.oldest_available():
+                    clip_end = self.ring.write_pos
+                waveform = self.ring.read(clip_end - self.clip, self.clip)
+                if waveform is not None:
+                    _submit_with_callback(
+                        self.service, self.source_id, waveform, self.on_result
+                    )
+                clip_end += self.hop
+
+
+class SocketSource(threading.Thread):
+    """
+    TCP feed for remote microphones.
+
+    Each connection sends its source id as one UTF-8 line, followed by raw
+    little-endian float32 mono PCM at 16 kHz for as long as it stays open.
+    """
+
+    def __init__(
+        self,
+        service,
+        host="0.0.0.0",
+        port=9000,
+        clip_duration=CLIP_DURATION,
+        hop_duration=HOP_DURATION,
+        on_result=print_result,
+    ):
+        super().__init__(name=f"socket-source-{port}", daemon=True)
+        self.service = service
+        self.address = (host, port)
+        self.clip = int(clip_duration * SAMPLE_RATE)
+        self.hop = int(hop_duration * SAMPLE_RATE)
+        self.on_result = on_result
+
+    def run(self):
+        with socket.create_server(self.address) as server:
+            print(f"Listening for audio feeds on {self.address[0]}:{self.address[1]}")
+            while True:
+                conn, peer = server.accept()
+                threading.Thread(
+                    target=self._handle, args=(conn, peer), daemon=True
+                ).start()
+
+    def _handle(self, conn, peer):
+        with conn, conn.makefile("rb") as stream:
+            source_id = (
+                stream.readline().decode("utf-8").strip() or f"{peer[0]}:{peer[1]}"
+            )
+            print(f"Audio feed connected: {source_id}")
+            pending = np.zeros(0, dtype=np.float32)
+            hop_bytes = self.hop * 4
+            while True:
+                data = stream.read(hop_bytes)
+                if not data:
+                    break
+                usable = len(data) - len(data) % 4
+                pending = np.concatenate(
+                    [pending, np.frombuffer(data[:usable], dtype="<f4")]
+                )
+                while pending.size >= self.clip:
+                    _submit_with_callback(
+                        self.service, source_id, pending[: self.clip], self.on_result
+                    )
+                    pending = pending[self.hop :]
+            print(f"Audio feed disconnected: {source_id}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Shared scream detection service for many microphones"
+    )
+    parser.add_argument("--wav", nargs="*", default=[], help="WAV files to replay")
+    parser.add_argument(
+        "--realtime", action="store_true", help="Replay WAV files at real-time speed"
+    )
+    parser.add_argument(
+        "--device", action="append", default=[], help="Local input device (repeatable)"
+    )
+    parser.add_argument(
+        "--listen", default=None, help="host:port to accept raw PCM socket feeds on"
+    )
+    parser.add_argument("--clip", type=float, default=CLIP_DURATION)
+    parser.add_argument("--hop", type=float, default=HOP_DURATION)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-latency", type=float, default=MAX_LATENCY)
+    parser.add_argument(
+        "--no-gate", action="store_true", help="Send silent clips to YAMNet too"
+    )
+    parser.add_argument(
+        "--classifier-backend", choices=CLASSIFIER_BACKENDS, default="tf"
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Never download models; fail if the local model cache is empty",
+    )
+    return parser.parse_args()
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    args = parse_args()
+    print("--- Batched Scream Inference Service ---")
+
+    yamnet_model, classifier_model = load_models(
+        classifier_backend=args.classifier_backend, offline=args.offline
+    )
+    if yamnet_model is None or classifier_model is None:
+        print("\nFailed to load one or both models. Exiting.")
+        exit()
+
+    service = BatchedInferenceService(
+        yamnet_model,
+        classifier_model,
+        max_batch_size=args.max_batch,
+        max_latency=args.max_latency,
+        use_gate=not args.no_gate,
+    ).start()
+
+    sources = [
+        WavFileSource(
+            service,
+            path,
+            clip_duration=args.clip,
+            hop_duration=args.hop,
+            realtime=args.realtime,
+        )
+        for path in args.wav
+    ]
+    sources += [
+        DeviceSource(
+            service,
+            device=int(device) if device.isdigit() else device,
+            clip_duration=args.clip,
+            hop_duration=args.hop,
+        )
+        for device in args.device
+    ]
+    if args.listen:
+        host, port = args.listen.rsplit(":", 1)
+        sources.append(
+            SocketSource(
+                service, host, int(port), clip_duration=args.clip, hop_duration=args.hop
+            )
+        )
+    if not sources:
+        print("No sources given. Use --wav, --device or --listen.")
+        exit()
+
+    for source in sources:
+        source.start()
+
+    print("Press Ctrl+C to stop.")
+    try:
+        while any(source.is_alive() for source in sources):
+            time.sleep(1)
+        # Let in-flight batches finish for file-only runs
+        time.sleep(args.max_latency + 1)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user. Stopping.")
+    finally:
+        service.stop()
+        print(
+            f"Processed {service.clips} clips in {service.batches} batches ({service.gated} gated as silent, {service.rejected} rejected)."
+        )
+        print("--- Service finished ---")
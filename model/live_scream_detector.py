@@ -1,11 +1,31 @@
 # live_scream_detector.py
 
+import argparse
 import sounddevice as sd
 import numpy as np
 import time
-import tensorflow as tf
-import tensorflow_hub as hub
-import os
+
+from archive_writer import (
+    ARCHIVE_DIR,
+    FORMATS as ARCHIVE_FORMATS,
+    KEEP_SECONDS,
+    MAX_TOTAL_BYTES,
+    SEGMENT_SECONDS,
+    ArchiveWriter,
+)
+from classifier import BACKENDS as CLASSIFIER_BACKENDS, load_classifier
+from embedding_cache import (
+    FRAME_HOP_SAMPLES,
+    FRAME_SAMPLES,
+    IncrementalEmbedder,
+    frames_for_window,
+    yamnet_frame_count,
+)
+from energy_gate import MARGIN_DB as GATE_MARGIN_DB, EnergyGate
+from event_detector import HysteresisTracker, score_frames
+from incident_publisher import DEDUPE_SECONDS, SPOOL_PATH, IncidentPublisher
+from model_bundle import StartupTimer, ensure_bundle
+from ring_buffer import AudioRingBuffer
 
 # --- Constants ---
 SAMPLE_RATE = 16000  # Sample rate expected by YAMNet
@@ -13,59 +33,114 @@ CHUNK_DURATION = 10  # Duration of each audio chunk in seconds
 CHANNELS = 1  # Mono audio
 MODEL_DIR = "human_scream_detector"  # Path to your saved model directory
 
+# Streaming mode
+WINDOW_DURATION = FRAME_SAMPLES / SAMPLE_RATE  # Seconds per inference (one frame)
+HOP_DURATION = 0.48  # Seconds between the starts of consecutive windows
+BLOCK_SIZE = 1024  # Samples per sounddevice callback
+RING_SECONDS = 30  # Audio history kept in the ring buffer
+
 
 # --- Model Loading ---
-def load_models(saved_model_path=MODEL_DIR):
-    """Loads YAMNet and the custom scream detector model."""
+def load_models(saved_model_path=MODEL_DIR, classifier_backend="tf", offline=False):
+    """
+    Loads YAMNet and the custom scream detector model.
+
+    Both models are loaded from checksummed bundles in the local model cache
+    (see model_bundle.py). YAMNet is only downloaded from TensorFlow Hub if it
+    has never been cached and `offline` is False, so restarts work without a
+    network; the download must match the SHA-256 pinned for it. TensorFlow itself is imported here rather than at module import.
+
+    The classifier comes back as a warmed-up ScreamClassifier callable (see
+    classifier.py); `classifier_backend` picks "tf", "tflite" or "onnx".
+    """
+    timer = StartupTimer()
     yamnet_model_inf = None
     scream_detector_model = None
-    yamnet_handle = "https://tfhub.dev/google/yamnet/1"
 
-    print("Loading YAMNet model from TensorFlow Hub...")
+    with timer.phase("import tensorflow"):
+        import tensorflow as tf
+
+    print("Loading YAMNet model from the local model cache...")
     try:
-        yamnet_model_inf = hub.load(yamnet_handle)
-        print("YAMNet model loaded successfully.")
+        with timer.phase("yamnet bundle"):
+            yamnet_path = ensure_bundle("yamnet", offline=offline)
+        with timer.phase("load yamnet"):
+            yamnet_model_inf = tf.saved_model.load(yamnet_path)
+        with timer.phase("warm up yamnet"):
+            yamnet_model_inf(tf.zeros([FRAME_SAMPLES], dtype=tf.float32))
+        print(f"YAMNet model loaded successfully from {yamnet_path}.")
     except Exception as e:
         print(f"Error loading YAMNet model: {e}")
+        timer.report()
         return None, None  # Return None if loading fails
 
     print(
-        f"\nLoading custom scream detector model from: {saved_model_path} (using TFSMLayer for Keras 3)"
+        f"\nLoading custom scream detector model from: {saved_model_path} (backend: {classifier_backend})"
     )
-    if os.path.exists(saved_model_path):
-        try:
-            scream_detector_layer = tf.keras.layers.TFSMLayer(
-                saved_model_path, call_endpoint="serving_default"
+    try:
+        with timer.phase("classifier bundle"):
+            classifier_path = ensure_bundle(
+                "human_scream_detector", offline=offline, source_dir=saved_model_path
             )
-            scream_detector_model = tf.keras.Sequential(
-                [
-                    tf.keras.layers.Input(
-                        shape=(1024,), dtype=tf.float32, name="yamnet_embedding_input"
-                    ),
-                    scream_detector_layer,
-                ]
+        with timer.phase("load classifier"):
+            scream_detector_model = load_classifier(
+                classifier_path, backend=classifier_backend, warm_up=False
             )
-            print("Custom scream detector model loaded successfully.")
-        except Exception as e:
-            print(f"Error loading custom model from {saved_model_path}: {e}")
-            return yamnet_model_inf, None  # Return YAMNet but None for custom model
-    else:
-        print(f"ERROR: Saved model directory not found at '{saved_model_path}'.")
+        with timer.phase("warm up classifier"):
+            scream_detector_model.warm_up()
+        print("Custom scream detector model loaded and warmed up.")
+    except Exception as e:
+        print(f"Error loading custom model from {saved_model_path}: {e}")
+        timer.report()
         return yamnet_model_inf, None  # Return YAMNet but None for custom model
 
+    timer.report()
     return yamnet_model_inf, scream_detector_model
 
 
+# --- Classifier ---
+def classify_embeddings(classifier_model, embeddings):
+    """
+    Runs the scream classifier on a batch of 1024-d YAMNet embeddings.
+
+    Args:
+        classifier_model: ScreamClassifier returned by load_models.
+        embeddings: (N, 1024) float32 array or tensor.
+
+    Returns:
+        np.ndarray: (N,) scream probabilities.
+    """
+    return classifier_model(embeddings)
+
+
+def classify_clip(classifier_model, clip_embedding, threshold=0.5):
+    """Labels a single (1024,) clip embedding. Returns (label, probability)."""
+    if np.isnan(clip_embedding).any():
+        print("Warning: NaNs detected in clip embedding. Treating as Non-Scream.")
+        return "Non-Scream", 0.0
+    try:
+        probability = classify_embeddings(classifier_model, clip_embedding[None, :])[0]
+    except Exception as e:
+        print(f"Error during classifier prediction: {e}")
+        return "Error: Classifier Failed", 0.0
+    label = "Scream" if probability >= threshold else "Non-Scream"
+    return label, float(probability)
+
+
 # --- Inference Function (Modified for Direct Audio Input) ---
-def predict_scream(yamnet_model, classifier_model, threshold=0.5, waveform_data=None):
+def predict_scream(
+    yamnet_model, classifier_model, threshold=0.5, waveform_data=None, gate=None
+):
     """
     Analyzes a waveform NumPy array to predict if it contains a human scream.
 
     Args:
         yamnet_model: The loaded YAMNet model instance.
-        classifier_model: Your loaded custom Keras classifier model.
+        classifier_model: ScreamClassifier returned by load_models.
         threshold (float): The probability threshold for 'Scream'.
         waveform_data (np.ndarray): 1D NumPy array of float32 audio data at 16kHz.
+        gate (EnergyGate): Optional pre-filter; clips it rejects skip YAMNet
+            and are reported as Non-Scream.
 
     Returns:
         tuple: (str: prediction_label, float: probability)
@@ -88,71 +163,328 @@ def predict_scream(yamnet_model, classifier_model, threshold=0.5, waveform_data=
     if waveform_data.dtype != np.float32:
         waveform_data = waveform_data.astype(np.float32)
 
-    # Convert NumPy array to TensorFlow tensor
-    waveform = tf.constant(waveform_data, dtype=tf.float32)
+    # 1. Skip YAMNet for audio that cannot plausibly contain a scream
+    if gate is not None and not gate.is_active(waveform_data):
+        return "Non-Scream", 0.0
 
-    # 2. Extract YAMNet embeddings
+    # 2. Extract YAMNet embeddings (the model converts the array to a tensor)
     try:
-        _, embeddings, _ = yamnet_model(waveform)
+        _, embeddings, _ = yamnet_model(waveform_data)
+        embeddings = embeddings.numpy()
     except Exception as e:
         print(f"Error during YAMNet embedding extraction: {e}")
         # Check if waveform is too short which can cause errors
-        if waveform.shape[0] < 1024:  # Arbitrary small number, YAMNet needs some length
+        if (
+            waveform_data.size < 1024
+        ):  # Arbitrary small number, YAMNet needs some length
             print("Waveform may be too short for YAMNet.")
             return "Error: Short Audio for YAMNet", 0.0
         return "Error: YAMNet Failed", 0.0
 
-    if tf.size(embeddings) == 0:
+    if embeddings.size == 0:
         # This might happen for very short or silent audio clips
         return "Non-Scream", 0.0  # Assume non-scream if no embeddings
 
-    # 3. Aggregate embeddings
-    clip_embedding = tf.reduce_mean(embeddings, axis=0)
-    if tf.reduce_any(tf.math.is_nan(clip_embedding)):
-        print("Warning: NaNs detected in clip embedding. Treating as Non-Scream.")
-        return "Non-Scream", 0.0  # Or return an error
+    # 3. Aggregate embeddings and classify
+    clip_embedding = embeddings.mean(axis=0)
+    return classify_clip(classifier_model, clip_embedding, threshold=threshold)
+
+
+# --- Streaming Detection ---
+def run_streaming(
+    yamnet_model,
+    classifier_model,
+    window_duration=WINDOW_DURATION,
+    hop_duration=HOP_DURATION,
+    device=None,
+    archive=None,
+    gate=None,
+    output="events",
+    on_detection=None,
+):
+    """
+    Runs detection on overlapping windows of a continuous input stream.
 
-    # 4. Prepare for classifier
-    model_input = tf.expand_dims(clip_embedding, axis=0)
+    Capture happens in the sounddevice callback, which only copies samples
+    into a ring buffer, so recording never pauses while inference runs. A
+    scream is seen at most about one hop after it starts.
 
-    # 5. Make prediction
-    try:
-        # Use the dictionary key found during debugging
-        raw_output = classifier_model.predict(model_input, verbose=0)
-        probability = raw_output["dense_2"][0, 0]
-    except KeyError:
-        # Fallback in case the key is different (shouldn't happen if model is consistent)
+    Embeddings are cached per YAMNet frame (0.48 s hop), so each hop only
+    embeds the frames that are new since the previous one. The first window
+    ends on the sample that completes its last frame, so with the default
+    hop every update runs as soon as a frame completes; hops that are not a
+    multiple of 0.48 s simply wait for the next complete frame.
+
+    If an ArchiveWriter is given, each hop's new audio is handed to it after
+    inference and positive windows are marked as detections. If an
+    EnergyGate is given, frames it rejects skip YAMNet.
+
+    With output="events" every new frame is scored on its own (one batched
+    classifier call per hop) and a HysteresisTracker reports one onset and
+    one completed event per scream. With output="labels" the mean embedding
+    of the window is classified and a label is printed every hop.
+
+    `on_detection(score)` is called once per event onset (or per positive
+    hop with output="labels"), e.g. to publish an incident.
+    """
+    window = int(window_duration * SAMPLE_RATE)
+    hop = int(hop_duration * SAMPLE_RATE)
+    if window <= 0 or hop <= 0:
+        raise ValueError("window and hop durations must be positive")
+
+    ring = AudioRingBuffer(
+        max(RING_SECONDS * SAMPLE_RATE, 4 * (window + BLOCK_SIZE)), guard=BLOCK_SIZE
+    )
+    embedder = IncrementalEmbedder(yamnet_model, frames_for_window(window), gate=gate)
+    tracker = HysteresisTracker()
+    status_errors = 0
+
+    def callback(indata, frames, time_info, status):
+        nonlocal status_errors
+        if status:
+            status_errors += 1
+        ring.write(indata[:, 0])
+
+    print(
+        f"Processing {window_duration:.2f} s windows every {hop_duration:.2f} s (streaming)."
+    )
+    with sd.InputStream(
+        samplerate=SAMPLE_RATE,
+        channels=CHANNELS,
+        dtype="float32",
+        blocksize=BLOCK_SIZE,
+        device=device,
+        callback=callback,
+    ):
+        window_end = (
+            FRAME_SAMPLES + (yamnet_frame_count(window) - 1) * FRAME_HOP_SAMPLES
+        )
+        archived = 0  # Absolute index of the first sample not yet archived
+        while True:
+            missing = window_end - ring.write_pos
+            if missing > 0:
+                time.sleep(missing / SAMPLE_RATE)
+                continue
+
+            # If inference fell so far behind that the window was overwritten,
+            # jump to the newest complete window instead of chasing old audio.
+            if window_end - window < ring.oldest_available():
+                behind = (ring.write_pos - window_end) // hop + 1
+                window_end += behind * hop
+                print(f"Warning: inference is falling behind, skipped {behind} hops.")
+                continue
+
+            try:
+                new_frames = embedder.update(
+                    ring.read, window_end, oldest_sample=ring.oldest_available()
+                )
+            except Exception as e:
+                print(f"Error during YAMNet embedding extraction: {e}")
+                new_frames = 0
+            if new_frames == 0:
+                window_end += hop
+                continue
+
+            now = time.strftime("%Y-%m-%d %H:%M:%S")
+            if output == "events":
+                scores = score_frames(
+                    classifier_model, embedder.recent_frames(new_frames)
+                )
+                first_frame = embedder.next_frame - len(scores)
+                detected = False
+                for offset, score in enumerate(scores):
+                    started, ended = tracker.update(first_frame + offset, score)
+                    if started is not None:
+                        print(
+                            f"[{now}] Scream onset at t={started.onset:.2f}s (score {started.peak_score:.4f})"
+                        )
+                        if on_detection is not None:
+                            on_detection(started.peak_score)
+                    if ended is not None:
+                        print(f"[{now}] Scream event: {ended}")
+                    detected = detected or tracker.active or ended is not None
+            else:
+                label, probability = classify_clip(
+                    classifier_model, embedder.clip_embedding()
+                )
+                detected = label == "Scream"
+                window_time = (window_end - window) / SAMPLE_RATE
+                print(
+                    f"[{now}] t={window_time:8.2f}s Prediction: {label} (Probability: {probability:.4f})"
+                )
+                if detected and on_detection is not None:
+                    on_detection(probability)
+
+            if archive is not None:
+                archived = max(archived, ring.oldest_available())
+                new_audio = ring.read(archived, window_end - archived)
+                if new_audio is not None:
+                    archive.write(new_audio)
+                    archived = window_end
+                if detected:
+                    archive.mark_detection()
+            if status_errors:
+                print(f"Warning: {status_errors} audio input status flags so far.")
+                status_errors = 0
+            window_end += hop
+
+
+def run_chunked(
+    yamnet_model, classifier_model, archive=None, gate=None, on_detection=None
+):
+    """Records and classifies back-to-back blocking chunks of CHUNK_DURATION."""
+    print(f"Processing audio in {CHUNK_DURATION}-second chunks.")
+    while True:
         print(
-            "Warning: Output key 'dense_2' not found. Attempting to access first output."
+            f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Recording {CHUNK_DURATION} seconds..."
         )
-        try:
-            # Assuming the output dict has only one key or getting the first value
-            first_key = list(raw_output.keys())[0]
-            probability = raw_output[first_key][0, 0]
-            print(f"Used alternative key: '{first_key}'")
-        except Exception as e_fallback:
-            print(f"Error during classifier prediction fallback: {e_fallback}")
-            return "Error: Classifier Failed", 0.0
-    except Exception as e:
-        print(f"Error during classifier prediction: {e}")
-        return "Error: Classifier Failed", 0.0
+        # Record audio chunk directly as float32 NumPy array
+        recording_data = sd.rec(
+            int(CHUNK_DURATION * SAMPLE_RATE),
+            samplerate=SAMPLE_RATE,
+            channels=CHANNELS,
+            dtype="float32",
+            blocking=True,
+        )  # Use blocking=True for simplicity
+
+        print("Recording finished. Processing...")
+
+        # Ensure recording is a flat array (sd.rec might return (N, 1))
+        recording_flat = recording_data.flatten()
+
+        # Perform inference
+        label, probability = predict_scream(
+            yamnet_model=yamnet_model,
+            classifier_model=classifier_model,
+            waveform_data=recording_flat,
+            gate=gate,
+        )
+
+        # Display result
+        print(
+            f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Prediction: {label} (Probability: {probability:.4f})"
+        )
+
+        if label == "Scream" and on_detection is not None:
+            on_detection(probability)
+
+        # Archive off the hot path
+        if archive is not None:
+            archive.write(recording_flat)
+            if label == "Scream":
+                archive.mark_detection()
 
-    # 6. Determine label
-    prediction_label = "Scream" if probability >= threshold else "Non-Scream"
-    return prediction_label, float(probability)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Live scream detector")
+    parser.add_argument(
+        "--mode",
+        choices=["stream", "chunk"],
+        default="stream",
+        help="stream: overlapping windows from a callback stream; chunk: blocking 10 s recordings",
+    )
+    parser.add_argument(
+        "--output",
+        choices=["events", "labels"],
+        default="events",
+        help="events: one onset/offset event per scream; labels: a label every hop (stream mode)",
+    )
+    parser.add_argument(
+        "--window", type=float, default=WINDOW_DURATION, help="Window length in seconds"
+    )
+    parser.add_argument(
+        "--hop", type=float, default=HOP_DURATION, help="Hop between windows in seconds"
+    )
+    parser.add_argument("--device", default=None, help="sounddevice input device")
+    parser.add_argument(
+        "--classifier-backend",
+        choices=CLASSIFIER_BACKENDS,
+        default="tf",
+        help="tf: compiled tf.function; tflite/onnx: exported models for CPU-only edge nodes",
+    )
+    parser.add_argument(
+        "--archive",
+        choices=["off", "all", "detections"],
+        default="all",
+        help="all: keep every recording; detections: keep only audio around screams",
+    )
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument(
+        "--archive-format",
+        choices=ARCHIVE_FORMATS,
+        default="wav",
+        help="wav, raw 16-bit PCM, or gzip-compressed PCM segments",
+    )
+    parser.add_argument(
+        "--keep-seconds",
+        type=float,
+        default=KEEP_SECONDS,
+        help="Seconds kept on each side of a detection in detections mode",
+    )
+    parser.add_argument(
+        "--segment-seconds",
+        type=float,
+        default=SEGMENT_SECONDS,
+        help="Rotate to a new archive file after this many seconds",
+    )
+    parser.add_argument(
+        "--max-archive-mb",
+        type=float,
+        default=MAX_TOTAL_BYTES / (1024 * 1024),
+        help="Delete the oldest archive files beyond this total size",
+    )
+    parser.add_argument(
+        "--no-gate",
+        action="store_true",
+        help="Send all audio through YAMNet, even silence",
+    )
+    parser.add_argument(
+        "--gate-margin-db",
+        type=float,
+        default=GATE_MARGIN_DB,
+        help="Level above the adaptive noise floor that counts as activity",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Never download models; fail if the local model cache is empty",
+    )
+    parser.add_argument(
+        "--device-id",
+        type=int,
+        default=None,
+        help="Publish detections as incidents from this device (needs SUPABASE_URL/KEY)",
+    )
+    parser.add_argument(
+        "--zone-id", type=int, default=None, help="Zone the device is installed in"
+    )
+    parser.add_argument(
+        "--dedupe-seconds",
+        type=float,
+        default=DEDUPE_SECONDS,
+        help="Drop repeat incidents from this device within this many seconds",
+    )
+    parser.add_argument(
+        "--incident-spool",
+        default=SPOOL_PATH,
+        help="File that holds incidents while the database is unreachable",
+    )
+    return parser.parse_args()
 
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    args = parse_args()
     print("--- Live Scream Detector ---")
 
     # List available audio devices (optional, for debugging)
     # print("\nAvailable audio input devices:")
     # print(sd.query_devices())
-    # TODO: Add mechanism to select input device if needed, default is usually fine
 
     # Load models first
-    yamnet_model, classifier_model = load_models()
+    yamnet_model, classifier_model = load_models(
+        classifier_backend=args.classifier_backend, offline=args.offline
+    )
 
     if yamnet_model is None or classifier_model is None:
         print(
@@ -161,62 +493,56 @@ if __name__ == "__main__":
         print("Exiting.")
         exit()
 
+    archive = None
+    if args.archive != "off":
+        archive = ArchiveWriter(
+            directory=args.archive_dir,
+            fmt=args.archive_format,
+            mode=args.archive,
+            segment_seconds=args.segment_seconds,
+            max_total_bytes=int(args.max_archive_mb * 1024 * 1024),
+            keep_seconds=args.keep_seconds,
+        )
+        archive.start()
+
+    gate = None if args.no_gate else EnergyGate(margin_db=args.gate_margin_db)
+
+    publisher = None
+    on_detection = None
+    if args.device_id is not None:
+        publisher = IncidentPublisher(
+            dedupe_seconds=args.dedupe_seconds, spool_path=args.incident_spool
+        )
+        publisher.start()
+
+        def on_detection(score):
+            publisher.publish(args.device_id, args.zone_id, score)
+
     print(f"\nModels loaded. Starting continuous recording...")
-    print(f"Processing audio in {CHUNK_DURATION}-second chunks.")
     print("Press Ctrl+C to stop.")
-    index = 0
     try:
         while True:
-            print(
-                f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Recording {CHUNK_DURATION} seconds..."
-            )
             try:
-                # Record audio chunk directly as float32 NumPy array
-                recording_data = sd.rec(
-                    int(CHUNK_DURATION * SAMPLE_RATE),
-                    samplerate=SAMPLE_RATE,
-                    channels=CHANNELS,
-                    dtype="float32",
-                    blocking=True,
-                )  # Use blocking=True for simplicity
-
-                # sd.wait() # Not needed if blocking=True
-                # Save the recording as a WAV file
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                filename = f"recording_{timestamp}_{index}.wav"
-
-                # Convert float32 to int16 for WAV file (standard format)
-                recording_int16 = (recording_data * 32767).astype(np.int16)
-
-                # Write the WAV file
-                import wave
-
-                with wave.open(filename, "wb") as wf:
-                    wf.setnchannels(CHANNELS)
-                    wf.setsampwidth(2)  # 2 bytes for int16
-                    wf.setframerate(SAMPLE_RATE)
-                    wf.writeframes(recording_int16.tobytes())
-
-                print(f"Saved recording to {filename}")
-                index += 1
-
-                print("Recording finished. Processing...")
-
-                # Ensure recording is a flat array (sd.rec might return (N, 1))
-                recording_flat = recording_data.flatten()
-
-                # Perform inference
-                label, probability = predict_scream(
-                    yamnet_model=yamnet_model,
-                    classifier_model=classifier_model,
-                    waveform_data=recording_flat,
-                )
-
-                # Display result
-                print(
-                    f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Prediction: {label} (Probability: {probability:.4f})"
-                )
-
+                if args.mode == "stream":
+                    run_streaming(
+                        yamnet_model,
+                        classifier_model,
+                        window_duration=args.window,
+                        hop_duration=args.hop,
+                        device=args.device,
+                        archive=archive,
+                        gate=gate,
+                        output=args.output,
+                        on_detection=on_detection,
+                    )
+                else:
+                    run_chunked(
+                        yamnet_model,
+                        classifier_model,
+                        archive=archive,
+                        gate=gate,
+                        on_detection=on_detection,
+                    )
             except sd.PortAudioError as e:
                 print(f"Audio Recording Error: {e}")
                 print("Is the microphone connected and working?")
@@ -232,4 +558,20 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\nInterrupted by user. Stopping.")
     finally:
+        if archive is not None:
+            archive.close()
+            if archive.dropped_blocks:
+                print(
+                    f"Archive dropped {archive.dropped_blocks} blocks (disk too slow)."
+                )
+        if publisher is not None:
+            publisher.close()
+            print(
+                f"Published {publisher.published} incidents ({publisher.deduplicated} duplicates dropped, {publisher.spooled} left in {args.incident_spool})."
+            )
+        if gate is not None:
+            stats = gate.stats()
+            print(
+                f"Energy gate skipped YAMNet for {stats['gated']} of {stats['checks']} checks ({stats['gated_fraction']:.1%})."
+            )
         print("--- Script finished ---")
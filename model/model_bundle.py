@@ -0,0 +1,282 @@
+# model_bundle.py
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import urllib.request
+
+# --- Constants ---
+CACHE_DIR = os.environ.get(
+    "SENTINEL_MODEL_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "sentinelai", "models"),
+)
+MANIFEST = "manifest.json"
+
+# Known bundles. "url" bundles can be fetched once while online, and the
+# download must match the SHA-256 pinned in "sha256" (or given with
+# `model_bundle.py fetch --sha256`); "local" bundles are imported from a
+# directory in the repo. Either kind can be imported by hand on an
+# air-gapped node with `model_bundle.py import`.
+BUNDLES = {
+    "yamnet": {
+        "version": "1",
+        "url": "https://tfhub.dev/google/yamnet/1?tf-hub-format=compressed",
+        # SHA-256 of the archive at "url". Not pinned yet: the first fetch
+        # fails and reports the digest it got, to be checked against a
+        # trusted copy and set here.
+        "sha256": None,
+    },
+    "human_scream_detector": {
+        "version": "1",
+        "local": "human_scream_detector",
+    },
+}
+
+
+class BundleError(Exception):
+    pass
+
+
+class StartupTimer:
+    """Collects wall-clock time per startup phase and prints a breakdown."""
+
+    def __init__(self):
+        self.phases = []
+        self._start = time.perf_counter()
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def report(self):
+        total = time.perf_counter() - self._start
+        print("Startup timing:")
+        for name, seconds in self.phases:
+            print(f"  {name:<28} {seconds * 1000:8.1f} ms")
+        print(f"  {'total':<28} {total * 1000:8.1f} ms")
+
+
+class _Phase:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.phases.append((self.name, time.perf_counter() - self._start))
+        return False
+
+
+def bundle_dir(name, version=None, cache_dir=CACHE_DIR):
+    version = version or BUNDLES[name]["version"]
+    return os.path.join(cache_dir, name, version)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _model_files(root):
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            relpath = os.path.relpath(path, root)
+            if relpath != MANIFEST:
+                yield relpath.replace(os.sep, "/"), path
+
+
+def _write_manifest(root, name, version, source):
+    files = {
+        relpath: {
+            "sha256": _sha256(path),
+            "size": os.path.getsize(path),
+            "mtime_ns": os.stat(path).st_mtime_ns,
+        }
+        for relpath, path in _model_files(root)
+    }
+    manifest = {
+        "name": name,
+        "version": version,
+        "source": source,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": files,
+    }
+    with open(os.path.join(root, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify_bundle(path, full=False):
+    """
+    Checks a cached bundle against its manifest.
+
+    By default only presence and sizes are checked, which keeps restarts
+    fast; `full=True` recomputes every SHA-256.
+    """
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise BundleError(f"No manifest in {path}")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    for relpath, expected in manifest["files"].items():
+        file_path = os.path.join(path, *relpath.split("/"))
+        if not os.path.exists(file_path):
+            raise BundleError(f"{relpath} is missing from {path}")
+        if os.path.getsize(file_path) != expected["size"]:
+            raise BundleError(f"{relpath} in {path} has the wrong size")
+        if full and _sha256(file_path) != expected["sha256"]:
+            raise BundleError(f"{relpath} in {path} failed its checksum")
+    return manifest
+
+
+def _same_files(source_dir, manifest):
+    """
+    Checks that a source directory still matches a bundle's manifest.
+
+    Imports keep the source's modification times, so a file with the same
+    size and mtime is taken as unchanged; any other file is checksummed,
+    since a retrained model of the same architecture has the same sizes.
+    """
+    files = dict(_model_files(source_dir))
+    if set(files) != set(manifest["files"]):
+        return False
+    for relpath, path in files.items():
+        entry = manifest["files"][relpath]
+        stat = os.stat(path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry.get("mtime_ns"):
+            continue
+        if _sha256(path) != entry["sha256"]:
+            return False
+    return True
+
+
+def _install(name, version, staging, source, cache_dir):
+    """Checksums a staged model directory and moves it into the cache atomically."""
+    _write_manifest(staging, name, version, source)
+    target = bundle_dir(name, version, cache_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(staging, target)
+    return target
+
+
+def import_bundle(name, source_dir, version=None, cache_dir=CACHE_DIR):
+    """Copies a SavedModel directory into the cache as a checksummed bundle."""
+    version = version or BUNDLES[name]["version"]
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{name}-", dir=cache_dir)
+    shutil.rmtree(staging)
+    shutil.copytree(source_dir, staging)
+    return _install(name, version, staging, os.path.abspath(source_dir), cache_dir)
+
+
+def fetch_bundle(name, version=None, cache_dir=CACHE_DIR, sha256=None):
+    """
+    Downloads a "url" bundle (a compressed TF Hub model) into the cache.
+
+    The archive must match `sha256`, or else the spec's pinned "sha256";
+    a download with no expected digest is rejected too.
+    """
+    spec = BUNDLES[name]
+    version = version or spec["version"]
+    if "url" not in spec:
+        raise BundleError(f"{name} has no download URL; import it instead")
+    expected = sha256 or spec.get("sha256")
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{name}-", dir=cache_dir)
+    try:
+        archive = os.path.join(staging, "model.tar.gz")
+        print(f"Downloading {name} from {spec['url']}...")
+        urllib.request.urlretrieve(spec["url"], archive)
+        digest = _sha256(archive)
+        if expected is None:
+            raise BundleError(
+                f"No SHA-256 is pinned for {name}; the download has {digest}. "
+                "Check it against a trusted copy, then pin it or pass --sha256."
+            )
+        if digest != expected.lower():
+            raise BundleError(
+                f"Download of {name} has SHA-256 {digest}, expected {expected}"
+            )
+        model_dir = os.path.join(staging, "model")
+        with tarfile.open(archive) as tar:
+            tar.extractall(model_dir, filter="data")
+        return _install(name, version, model_dir, spec["url"], cache_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def ensure_bundle(name, offline=False, source_dir=None, cache_dir=CACHE_DIR):
+    """
+    Returns the path of a verified local bundle, creating it if needed.
+
+    A bundle is created from `source_dir` (or the spec's "local" directory)
+    when that exists, otherwise downloaded unless `offline` is set.
+    """
+    path = bundle_dir(name, cache_dir=cache_dir)
+    source_dir = source_dir or BUNDLES[name].get("local")
+    try:
+        manifest = verify_bundle(path)
+        if not source_dir or not os.path.isdir(source_dir):
+            return path
+        if _same_files(source_dir, manifest):
+            return path
+        print(f"{source_dir} changed since it was bundled, re-importing it.")
+    except BundleError as e:
+        if os.path.exists(path):
+            print(f"Cached bundle is unusable ({e}), rebuilding it.")
+
+    if source_dir and os.path.isdir(source_dir):
+        return import_bundle(name, source_dir, cache_dir=cache_dir)
+    if offline or "url" not in BUNDLES[name]:
+        raise BundleError(
+            f"No cached bundle for {name} at {path} and it cannot be fetched. "
+            f"Run `python model_bundle.py import {name} <dir>` on this node."
+        )
+    return fetch_bundle(name, cache_dir=cache_dir)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Manage local model bundles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fetch = sub.add_parser("fetch", help="Download a bundle while online")
+    fetch.add_argument("name", choices=sorted(BUNDLES))
+    fetch.add_argument("--sha256", help="Expected SHA-256 of the download")
+    imp = sub.add_parser("import", help="Import a SavedModel directory")
+    imp.add_argument("name", choices=sorted(BUNDLES))
+    imp.add_argument("source_dir")
+    verify = sub.add_parser("verify", help="Check every cached bundle's checksums")
+    verify.add_argument("name", nargs="*", default=sorted(BUNDLES))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "fetch":
+        print(f"Cached at {fetch_bundle(args.name, sha256=args.sha256)}")
+    elif args.command == "import":
+        print(f"Cached at {import_bundle(args.name, args.source_dir)}")
+    else:
+        for name in args.name:
+            path = bundle_dir(name)
+            try:
+                manifest = verify_bundle(path, full=True)
+                print(
+                    f"{name} {manifest['version']}: OK ({len(manifest['files'])} files)"
+                )
+            except BundleError as e:
+                print(f"{name}: FAILED - {e}")
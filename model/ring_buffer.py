@@ -0,0 +1,90 @@
+# ring_buffer.py
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Single-producer / single-consumer ring buffer for mono float32 audio.
+
+    The sounddevice callback thread is the only writer and the inference loop
+    is the only reader, so no lock is needed: the writer copies samples into
+    the buffer first and only then publishes the new absolute write position
+    (a plain int assignment, which is atomic under the GIL). The reader never
+    touches the write position, it only snapshots it.
+
+    Positions are absolute sample indices since the stream started, which
+    lets the reader ask for "samples [start, start + n)" without caring about
+    wrap-around.
+    """
+
+    def __init__(self, capacity, guard=0):
+        """
+        Args:
+            capacity (int): Number of samples held.
+            guard (int): Largest block the writer may be copying in at once.
+                Samples this close to being overwritten are treated as lost,
+                since an unpublished write may already be clobbering them.
+        """
+        if capacity <= 0 or not 0 <= guard < capacity:
+            raise ValueError("capacity must be positive and larger than guard")
+        self.capacity = int(capacity)
+        self.guard = int(guard)
+        self._buffer = np.zeros(self.capacity, dtype=np.float32)
+        self.write_pos = 0  # Total samples written since start (published last)
+        self.overruns = 0  # Reads that found their samples already overwritten
+
+    def write(self, samples):
+        """Appends samples. Called from the audio callback thread only."""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        n = samples.size
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the most recent `capacity` samples can be kept anyway
+            samples = samples[-self.capacity :]
+            skipped = n - self.capacity
+        else:
+            skipped = 0
+
+        pos = self.write_pos + skipped
+        start = pos % self.capacity
+        first = min(samples.size, self.capacity - start)
+        self._buffer[start : start + first] = samples[:first]
+        if first < samples.size:
+            self._buffer[: samples.size - first] = samples[first:]
+
+        # Publish only after the data is in place
+        self.write_pos = pos + samples.size
+
+    def oldest_available(self):
+        """Absolute index of the oldest sample still held in the buffer."""
+        return max(0, self.write_pos - self.capacity + self.guard)
+
+    def read(self, start, n):
+        """
+        Copies samples [start, start + n) out of the buffer.
+
+        Returns:
+            np.ndarray or None: The samples, or None if they have not been
+            written yet or were overwritten before the copy finished.
+        """
+        end = start + n
+        if n > self.capacity - self.guard or end > self.write_pos:
+            return None
+        if start < self.oldest_available():
+            self.overruns += 1
+            return None
+
+        begin = start % self.capacity
+        first = min(n, self.capacity - begin)
+        out = np.empty(n, dtype=np.float32)
+        out[:first] = self._buffer[begin : begin + first]
+        if first < n:
+            out[first:] = self._buffer[: n - first]
+
+        # The writer may have lapped us while we were copying
+        if start < self.oldest_available():
+            self.overruns += 1
+            return None
+        return out
@@ -30,13 +30,62 @@ def calculate_adjacency_list(doors):
     return adjacency_list
 
 
-# The function calculate_adjacency_list should convert the doors dictionary
-# to an undirected graph where if A connects to B, then B connects to A.
-# Let's check the output:
-adjacency_list = calculate_adjacency_list(doors)
-print("Node 8 connections:", adjacency_list[8])
-print("Full adjacency list:", dict(adjacency_list))
-
-# The reason 8 should have connections to 0,1,2,3 is because in the doors dictionary,
-# nodes 0,1,2,3 all have 8 in their connections list, and the calculate_adjacency_list
-# function adds bidirectional connections.
+# Doors of each zone; every inner door appears in exactly the two zones it joins
+zone_door_mapping = {
+    0: [0],
+    1: [1],
+    2: [2],
+    3: [3],
+    4: [8],
+    5: [7, 6, 9],
+    6: [4, 5, 6],
+    7: [5, 8, 7],
+    8: [0, 4, 1, 2, 3, 9],
+}
+
+zone_names = {
+    0: "Banana Store",
+    1: "LuLuLime",
+    2: "Victoria",
+    3: "Pay More",
+    4: "Study Start",
+    5: "Hand Locker",
+    6: "Orange Republic",
+    7: "south corridor",
+    8: "north corridor",
+}
+
+# Exit doors and the zone each one leads out of, to the outside (zone 10)
+OUTSIDE = 10
+exit_doors = {
+    11: 8,
+    12: 7,
+    13: 7,
+    14: 8,
+    15: 8,
+    16: 8,
+}
+
+
+def door_zones(zone_door_mapping):
+    """
+    Inverts zone_door_mapping into door id -> (zone, zone)
+    """
+    zones_by_door = defaultdict(list)
+    for zone, door_ids in zone_door_mapping.items():
+        for door_id in door_ids:
+            zones_by_door[door_id].append(zone)
+    return {door_id: tuple(zones) for door_id, zones in zones_by_door.items()}
+
+
+if __name__ == "__main__":
+    # The function calculate_adjacency_list should convert the doors dictionary
+    # to an undirected graph where if A connects to B, then B connects to A.
+    # Let's check the output:
+    adjacency_list = calculate_adjacency_list(doors)
+    print("Node 8 connections:", adjacency_list[8])
+    print("Full adjacency list:", dict(adjacency_list))
+
+    # The reason 8 should have connections to 0,1,2,3 is because in the doors dictionary,
+    # nodes 0,1,2,3 all have 8 in their connections list, and the calculate_adjacency_list
+    # function adds bidirectional connections.
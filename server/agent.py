@@ -2,8 +2,11 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from cerebras.cloud.sdk import AsyncCerebras
-from typing import List, Dict, Any
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
 import os
 from custom_types import (
     ResponseRequiredRequest,
@@ -13,50 +16,66 @@ from custom_types import (
     ToolCallResultResponse,
     AgentInterruptResponse,
 )
-from prompts import (
-    system_prompt,
-    persistent_user_prompt,
-    user_prompt,
-)
-import json
 import os
-from supabase import create_async_client, AsyncClient
+from supabase import AsyncClient
 from retell import Retell
+from clients import ClientPool
+from buildings import Building
+from tool_scheduler import ToolScheduler
+from tool_call_accumulator import ToolCallAccumulator
+from prompt_builder import PromptBuilder, to_message
+from intent_matcher import (
+    FAST_PATH_HITS,
+    FAST_PATH_MISSES,
+    FAST_PATH_SAVED_SECONDS,
+    MATCH_SECONDS,
+    IntentMatcher,
+    spoken_name,
+)
+from metrics import COMPLETE_SECONDS, TOOL_SECONDS
+from response_cache import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    answer_chunks,
+    question_intent,
+)
+from tracing import TurnTrace
+
+logger = logging.getLogger(__name__)
 
 retell = Retell(api_key=os.environ["RETELL_API_KEY"])
-zone_door_mapping = {
-    0: [0],
-    1: [1],
-    2: [2],
-    3: [3],
-    4: [8],
-    5: [7, 6, 9],
-    6: [4, 5, 6],
-    7: [5, 8, 7],
-    8: [0, 4, 1, 2, 3, 9],
-}
 
 
 class LlmClient:
-    def __init__(self):
+    def __init__(
+        self,
+        clients: ClientPool,
+        building: Building,
+        caller_zone: Optional[int] = None,
+    ):
         """
-        Initialize LLM client
+        Initialize LLM client with the application's shared client pool, the
+        building the call is in (its state, router and prompt prefix) and,
+        if the call metadata gives it, the zone the caller is in
 
         """
-        self.client = AsyncCerebras(
-            api_key=os.environ["CEREBRAS_API_KEY"],
-        )
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        self.supabase: AsyncClient = None
+        self.clients = clients
+        self.building = building
+        self.caller_zone = caller_zone
+        self.state = building.state
+        self.router = building.router
+        # Same for every turn of the call (and every call in the building),
+        # so it forms a stable prefix
+        self.prompt_builder = PromptBuilder(building.prompt_prefix)
 
-    async def setup_supabase(self):
-        """
-        Initialize Supabase client asynchronously
-        """
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        self.supabase = await create_async_client(url, key)
+    @property
+    def client(self):
+        # Looked up per use so a reconnected client is picked up mid-call
+        return self.clients.cerebras
+
+    @property
+    def supabase(self) -> AsyncClient:
+        return self.clients.supabase
 
     def draft_begin_message(self):
         response = ResponseResponse(
@@ -69,46 +88,36 @@ class LlmClient:
         return response
 
     def convert_transcript_to_openai_messages(self, transcript: List[Utterance]):
-        messages = []
-        for utterance in transcript:
-            if utterance.role == "agent":
-                messages.append({"role": "assistant", "content": utterance.content})
-            else:
-                messages.append({"role": "user", "content": utterance.content})
-        return messages
+        return [to_message(utterance) for utterance in transcript]
 
     def prepare_prompt(self, request: ResponseRequiredRequest):
-        prompt = [
-            {
-                "role": "system",
-                "content": system_prompt,
-            },
-        ]
-        transcript_messages = self.convert_transcript_to_openai_messages(
-            request.transcript
-        )
-        for message in transcript_messages:
-            prompt.append(message)
-
-        prompt.append(
-            {
-                "role": "user",
-                "content": persistent_user_prompt,
-            }
-        )
-
-        if request.interaction_type == "reminder_required":
-            prompt.append(
-                {
-                    "role": "user",
-                    "content": "(Now the user has not responded in a while, you would say:)",
-                }
+        # Static prefix, a window of the transcript converted incrementally,
+        # the live status around the caller (see prompt_context.py) and the
+        # reminder cue when needed (see prompt_builder.py)
+        zone_id = self.known_zone()
+        if zone_id is not None:
+            context = self.building.context.message(zone_id, known=True)
+        else:
+            matcher = IntentMatcher.for_graph(self.router.graph)
+            context = self.building.context.message(
+                matcher.last_mentioned_zone(request.transcript), known=False
             )
-        return prompt
+        return self.prompt_builder.build(request, context)
 
-    def prepare_functions(self) -> List[Dict[str, Any]]:
+    def known_zone(self) -> Optional[int]:
+        """
+        Where the caller is, if the call metadata says so and the zone is in
+        this building (not after a fallback to another building)
         """
-        Define the available function calls for the assistant.
+        if self.caller_zone in self.router.graph.zone_index:
+            return self.caller_zone
+        return None
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def prepare_functions() -> List[Dict[str, Any]]:
+        """
+        Define the available function calls for the assistant (built once).
         """
         return [
             {
@@ -206,10 +215,238 @@ class LlmClient:
             # },
         ]
 
-    async def draft_response(self, request: ResponseRequiredRequest):
+    # --- Tools ---
+    def tool_handlers(self):
+        return {
+            "open_door": self.open_door,
+            "close_door": self.close_door,
+            "mark_zone": self.mark_zone,
+            "notify_emergency_responders": self.notify_emergency_responders,
+        }
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def action_fields() -> Dict[str, List[str]]:
+        """
+        Arguments each tool's action needs before it can run; the spoken
+        "output" is streamed to the caller separately
+        """
+        return {
+            tool["function"]["name"]: [
+                field
+                for field in tool["function"]["parameters"]["required"]
+                if field != "output"
+            ]
+            for tool in LlmClient.prepare_functions()
+        }
+
+    def tool_entities(self, name: str, arguments: Dict[str, Any]):
+        """
+        Entities a tool call changes; calls sharing one run in order
+        """
+        if name in ("open_door", "close_door"):
+            return [("door", arguments["door_id"])]
+        if name == "mark_zone":
+            zone_id = arguments["zone_id"]
+            graph = self.router.graph
+            doors = []
+            if zone_id in graph.zone_index:
+                doors = graph.doors_of_zone(zone_id, include_exits=False)
+            return [("zone", zone_id)] + [("door", d) for d in doors]
+        return [(name,)]
+
+    # State changes are applied in memory and written to Supabase in the
+    # background (see building_state.py). Ids are checked against the call's
+    # building first, so a call never changes another building's rows.
+    def _check(self, arguments: Dict[str, Any]):
+        graph = self.router.graph
+        if "door_id" in arguments and arguments["door_id"] not in graph.door_index:
+            raise ValueError(f"No door {arguments['door_id']} in this building")
+        if "zone_id" in arguments and arguments["zone_id"] not in graph.zone_index:
+            raise ValueError(f"No zone {arguments['zone_id']} in this building")
+
+    async def open_door(self, arguments: Dict[str, Any]):
+        self._check(arguments)
+        logger.info("Opening door %s", arguments["door_id"])
+        self.state.set_door(arguments["door_id"], True)
+
+    async def close_door(self, arguments: Dict[str, Any]):
+        self._check(arguments)
+        logger.info("Closing door %s", arguments["door_id"])
+        self.state.set_door(arguments["door_id"], False)
+
+    async def mark_zone(self, arguments: Dict[str, Any]):
+        self._check(arguments)
+        logger.info(
+            "Marking zone %s with status %s", arguments["zone_id"], arguments["status"]
+        )
+        self.state.set_zone(arguments["zone_id"], arguments["status"])
+
+        # Inner doors of the zone, from the current building graph
+        zone_doors = self.router.graph.doors_of_zone(
+            arguments["zone_id"], include_exits=False
+        )
+        if arguments["status"] == "danger":
+            self.state.set_doors(zone_doors, False)
+        else:
+            logger.info("Opening doors %s", zone_doors)
+            self.state.set_doors(zone_doors, True)
+
+    async def notify_emergency_responders(self, arguments: Dict[str, Any]):
+        logger.info("Notifying emergency responders of %s", arguments["situation"])
+        # await asyncio.to_thread(
+        #     retell.call.create_phone_call,
+        #     from_number="+13192504307",
+        #     to_number="+14152445168",
+        #     retell_llm_dynamic_variables={"situation": arguments["situation"]},
+        # )
+
+    def tool_failure_text(self, name: str, arguments: Dict[str, Any]):
+        """
+        What to tell the caller when a door or zone action failed, or None
+        """
+        if name in ("open_door", "close_door"):
+            action = "open" if name == "open_door" else "close"
+            return f"Sorry, I couldn't {action} door {arguments.get('door_id')}."
+        if name == "mark_zone":
+            graph = self.router.graph
+            zone_id = arguments.get("zone_id")
+            place = "that area"
+            if zone_id in graph.zone_index:
+                place = spoken_name(graph.zone_name(zone_id))
+            if arguments.get("status") == "danger":
+                return f"Sorry, I couldn't lock down {place}."
+            return f"Sorry, I couldn't reopen {place}."
+        return None
+
+    def run_tool_events(self, events, scheduler, response_id, spoke):
+        """
+        Dispatches tool actions that became ready and yields the tool output
+        text to speak
+        """
+        for event in events:
+            if event.dispatch:
+                logger.info("Function call: %s(%s)", event.name, event.arguments)
+                scheduler.submit(event.name, event.arguments)
+            if event.text:
+                # Separate a new message from whatever was said before it
+                separator = " " if event.first_text and spoke else ""
+                yield ResponseResponse(
+                    response_id=response_id,
+                    content=separator + event.text,
+                    content_complete=False,
+                    end_call=False,
+                )
+                spoke = True
+
+    async def draft_fast_response(
+        self, request: ResponseRequiredRequest, trace: Optional[TurnTrace] = None
+    ) -> Optional[ResponseResponse]:
+        """
+        Carries out a short, unambiguous door or zone command without the
+        LLM (see intent_matcher.py).
+
+        Returns:
+            The templated reply once the action is applied, or None when the
+            utterance is not such a command and the LLM should answer.
+        """
+        start = time.perf_counter()
+        intent = IntentMatcher.for_graph(self.router.graph).match_request(request)
+        MATCH_SECONDS.observe(time.perf_counter() - start)
+        if intent is None:
+            FAST_PATH_MISSES.inc()
+            return None
+
+        logger.info("Fast path: %s(%s)", intent.name, intent.arguments)
+        tool_start = time.perf_counter()
+        try:
+            # Like scheduled tool calls, the action completes even if this
+            # response is cancelled
+            await asyncio.shield(self.tool_handlers()[intent.name](intent.arguments))
+        except ValueError as e:
+            logger.warning("Fast path %s failed: %s", intent.name, e)
+            FAST_PATH_MISSES.inc()
+            return None
+        seconds = time.perf_counter() - tool_start
+        TOOL_SECONDS.observe(seconds, intent.name)
+        if trace is not None:
+            trace.path = "fast"
+            trace.tool(intent.name, seconds, True)
+
+        FAST_PATH_HITS.inc()
+        llm = COMPLETE_SECONDS.summary("llm")
+        if llm["count"]:
+            saved = llm["mean"] - (time.perf_counter() - start)
+            FAST_PATH_SAVED_SECONDS.inc(max(saved, 0.0))
+        return ResponseResponse(
+            response_id=request.response_id,
+            content=intent.reply,
+            content_complete=True,
+            end_call=False,
+        )
+
+    def cache_key(self, request: ResponseRequiredRequest):
+        """
+        Response cache key of the caller's latest utterance, if it is a
+        common question (see response_cache.py)
+        """
+        if request.interaction_type != "response_required" or not request.transcript:
+            return None
+        utterance = request.transcript[-1]
+        if utterance.role != "user":
+            return None
+        # Every cached question is answered from where the caller is, so only
+        # a location from the call metadata can be shared between callers; a
+        # zone named in the transcript may be the danger, not the caller
+        zone_id = self.known_zone()
+        if zone_id is None:
+            return None
+        intent = question_intent(utterance.content)
+        if intent is None:
+            return None
+        return self.building.responses.key(intent, zone_id)
+
+    async def draft_response(
+        self, request: ResponseRequiredRequest, trace: Optional[TurnTrace] = None
+    ):
+        response_id = request.response_id
+        response = await self.draft_fast_response(request, trace)
+        if response is not None:
+            yield response
+            return
+
+        # Callers in the same place asking the same question while nothing
+        # changes get the same answer, without another generation
+        cache_key = self.cache_key(request)
+        if cache_key is not None:
+            answer = self.building.responses.get(cache_key)
+            if answer is not None:
+                CACHE_HITS.inc()
+                if trace is not None:
+                    trace.path = "cache"
+                for chunk in answer_chunks(answer):
+                    yield ResponseResponse(
+                        response_id=response_id,
+                        content=chunk,
+                        content_complete=False,
+                        end_call=False,
+                    )
+                yield ResponseResponse(
+                    response_id=response_id,
+                    content="",
+                    content_complete=True,
+                    end_call=False,
+                )
+                return
+            CACHE_MISSES.inc()
+
         # Initialize conversation with the user prompt.
         conversation = self.prepare_prompt(request)
-        response_id = request.response_id
+        if trace is not None:
+            trace.mark("prompt")
+        logger.info(
+            "Prompt for response %s: %s", response_id, self.prompt_builder.last_stats
+        )
 
         stream = await self.client.chat.completions.create(
             model="llama-3.3-70b",
@@ -219,74 +456,65 @@ class LlmClient:
             stream=True,
         )
 
-        async for chunk in stream:
-            if chunk.choices[0].delta.tool_calls:
-                # Handle function call
-                function_calls = chunk.choices[0].delta.tool_calls
-                print(f"Function calls: {function_calls}")
-                for function_call in function_calls:
-                    arguments = json.loads(function_call.function.arguments)
-
-                    if function_call.function.name == "open_door":
-                        print(f"Opening door {arguments['door_id']}")
-                        await self.supabase.table("doors").update({"open": True}).eq(
-                            "id", arguments["door_id"]
-                        ).execute()
-                    elif function_call.function.name == "close_door":
-                        print(f"Closing door {arguments['door_id']}")
-                        await self.supabase.table("doors").update({"open": False}).eq(
-                            "id", arguments["door_id"]
-                        ).execute()
-                    elif function_call.function.name == "mark_zone":
-                        print(
-                            f"Marking zone {arguments['zone_id']} with status {arguments['status']}"
-                        )
-                        await self.supabase.table("zones").update(
-                            {"status": arguments["status"]}
-                        ).eq("id", arguments["zone_id"]).execute()
-
-                        if arguments["status"] == "danger":
-                            doors_to_close = zone_door_mapping[arguments["zone_id"]]
-                            # Update all doors in a single call with an "in" filter
-                            await self.supabase.table("doors").update(
-                                {"open": False}
-                            ).in_("id", doors_to_close).execute()
-                        else:
-                            doors_to_open = zone_door_mapping[arguments["zone_id"]]
-                            print(f"Opening doors {doors_to_open}")
-                            await self.supabase.table("doors").update(
-                                {"open": True}
-                            ).in_("id", doors_to_open).execute()
-
-                    elif function_call.function.name == "notify_emergency_responders":
-                        print(
-                            f"Notifying emergency responders of {arguments['situation']}"
-                        )
-                        # retell.call.create_phone_call(
-                        #     from_number="+13192504307",
-                        #     to_number="+14152445168",
-                        #     retell_llm_dynamic_variables={
-                        #         "situation": arguments["situation"]
-                        #     },
-                        # )
-
+        # Tool call arguments arrive in fragments. Each call's "output" is
+        # spoken while it streams and its action is dispatched as soon as its
+        # required arguments are complete. Tool calls keep running if this
+        # response is abandoned, so their side effects always complete. If
+        # the response is cancelled or closed early, the upstream stream is
+        # closed right away instead of being read to the end.
+        accumulator = ToolCallAccumulator(self.action_fields())
+        scheduler = ToolScheduler(self.tool_handlers(), self.tool_entities)
+        spoke = False
+        answer = []  # Plain answers (no tool calls) are cached
+        used_tools = False
+        try:
+            async for chunk in stream:
+                if trace is not None:
+                    trace.mark("first_token")
+                events = []
+                if chunk.choices[0].delta.tool_calls:
+                    # Handle function call
+                    used_tools = True
+                    events = accumulator.feed(chunk.choices[0].delta.tool_calls)
+                elif chunk.choices[0].delta.content:
+                    # Handle regular content
+                    spoke = True
+                    answer.append(chunk.choices[0].delta.content)
                     yield ResponseResponse(
                         response_id=response_id,
-                        content=arguments["output"],
-                        content_complete=True,
+                        content=chunk.choices[0].delta.content,
+                        content_complete=False,
                         end_call=False,
                     )
-
-                # Execute the function and handle the result
-                # You'll need to implement this part based on your specific function
-            elif chunk.choices[0].delta.content:
-                # Handle regular content
-                yield ResponseResponse(
-                    response_id=response_id,
-                    content=chunk.choices[0].delta.content,
-                    content_complete=False,
-                    end_call=False,
-                )
+                for response in self.run_tool_events(
+                    events, scheduler, response_id, spoke
+                ):
+                    spoke = True
+                    yield response
+            for response in self.run_tool_events(
+                accumulator.finish(), scheduler, response_id, spoke
+            ):
+                spoke = True
+                yield response
+            async for result in scheduler.drain():
+                if trace is not None:
+                    trace.tool(result.name, result.seconds, result.ok)
+                if not result.ok:
+                    logger.warning("Tool call %s failed: %s", result.name, result.error)
+                    # Its output was already spoken; take it back
+                    correction = self.tool_failure_text(result.name, result.arguments)
+                    if correction:
+                        yield ResponseResponse(
+                            response_id=response_id,
+                            content=(" " if spoke else "") + correction,
+                            content_complete=False,
+                            end_call=False,
+                        )
+                        spoke = True
+        finally:
+            await stream.close()
+        if cache_key is not None and not used_tools and answer:
+            self.building.responses.put(cache_key, "".join(answer))
         # After all rounds, yield a final complete response.
         yield ResponseResponse(
             response_id=response_id,
@@ -0,0 +1,264 @@
+import logging
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from adjacencyList import exit_doors, door_zones, zone_door_mapping, zone_names
+
+logger = logging.getLogger(__name__)
+
+NO_ZONE = -1  # Other side of an exit door (the outside)
+DEFAULT_BUILDING_ID = 1  # EastField Mall, the building the default layout describes
+
+
+def _csr(count: int, pairs: List[Tuple[int, ...]], width: int):
+    """
+    Compressed sparse rows for (row, value, ...) tuples with `width` values.
+
+    Returns:
+        (offsets, columns): offsets has count + 1 entries; row r's values are
+        columns[k][offsets[r]:offsets[r + 1]] for each value position k.
+    """
+    offsets = array("l", [0]) * (count + 1)
+    for pair in pairs:
+        offsets[pair[0] + 1] += 1
+    for row in range(count):
+        offsets[row + 1] += offsets[row]
+    columns = [array("l", [0]) * len(pairs) for _ in range(width)]
+    fill = array("l", offsets[:-1])
+    for pair in pairs:
+        slot = fill[pair[0]]
+        for k in range(width):
+            columns[k][slot] = pair[k + 1]
+        fill[pair[0]] += 1
+    return offsets, columns
+
+
+class BuildingGraph:
+    """
+    Compact, array-backed building topology.
+
+    Zones and doors get dense indexes; every per-element value lives in an
+    `array` and the zone-to-neighbour, zone-to-door and zone-to-exit indexes
+    are CSR offsets into flat arrays, so a building with tens of thousands
+    of zones costs a few bytes per zone and door rather than a dict and list
+    per node. Instances are immutable; a reload builds a new one.
+    """
+
+    def __init__(
+        self,
+        zones: Iterable[Tuple[int, str]],
+        doors: Iterable[Tuple[int, int, Optional[int]]],
+        devices: Iterable[Tuple[int, Optional[int]]] = (),
+    ):
+        """
+        Args:
+            zones: (zone id, name) pairs.
+            doors: (door id, zone id, other zone id or None for an exit).
+            devices: (device id, zone id) pairs.
+        """
+        self.zone_ids = array("l")
+        self.zone_names: List[str] = []
+        self.zone_index: Dict[int, int] = {}
+        for zone_id, name in zones:
+            self._add_zone(zone_id, name)
+
+        self.door_ids = array("l")
+        self.door_index: Dict[int, int] = {}
+        self.door_a = array("l")  # Inside zone of an exit
+        self.door_b = array("l")  # NO_ZONE for exits
+        for door_id, zone_id, other_zone_id in doors:
+            if door_id in self.door_index:
+                continue
+            self.door_index[door_id] = len(self.door_ids)
+            self.door_ids.append(door_id)
+            self.door_a.append(self._add_zone(zone_id))
+            self.door_b.append(
+                NO_ZONE if other_zone_id is None else self._add_zone(other_zone_id)
+            )
+
+        zone_count, door_count = len(self.zone_ids), len(self.door_ids)
+        neighbours, zone_doors, zone_exits = [], [], []
+        for door in range(door_count):
+            a, b = self.door_a[door], self.door_b[door]
+            zone_doors.append((a, door))
+            if b == NO_ZONE:
+                zone_exits.append((a, door))
+            else:
+                zone_doors.append((b, door))
+                neighbours.append((a, b, door))
+                neighbours.append((b, a, door))
+        # zone -> (neighbour zone, door joining them)
+        self.adj_offsets, (self.adj_zones, self.adj_doors) = _csr(
+            zone_count, neighbours, 2
+        )
+        self.door_offsets, (self.zone_doors,) = _csr(zone_count, zone_doors, 1)
+        self.exit_offsets, (self.zone_exits,) = _csr(zone_count, zone_exits, 1)
+        self.exits = array("l", (door for _, door in zone_exits))
+
+        self.device_zone: Dict[int, int] = {
+            device_id: zone_id for device_id, zone_id in devices if zone_id is not None
+        }
+
+    def _add_zone(self, zone_id: int, name: Optional[str] = None) -> int:
+        index = self.zone_index.get(zone_id)
+        if index is None:
+            index = self.zone_index[zone_id] = len(self.zone_ids)
+            self.zone_ids.append(zone_id)
+            self.zone_names.append(name or f"Zone {zone_id}")
+        elif name:
+            self.zone_names[index] = name
+        return index
+
+    @classmethod
+    def from_mapping(cls, zone_door_mapping, exit_doors, zone_names=None):
+        """
+        Graph from a zone -> doors mapping and an exit door -> zone mapping
+        """
+        zone_names = zone_names or {}
+        zones = [(zone_id, zone_names.get(zone_id)) for zone_id in zone_door_mapping]
+        doors = [
+            (door_id, zones_[0], zones_[1] if len(zones_) > 1 else None)
+            for door_id, zones_ in sorted(door_zones(zone_door_mapping).items())
+        ]
+        doors += [(door_id, zone, None) for door_id, zone in sorted(exit_doors.items())]
+        return cls(zones, doors)
+
+    # --- Sizes ---
+    @property
+    def zone_count(self) -> int:
+        return len(self.zone_ids)
+
+    @property
+    def door_count(self) -> int:
+        return len(self.door_ids)
+
+    def nbytes(self) -> int:
+        """
+        Bytes held by the arrays (the id -> index dicts are not counted)
+        """
+        arrays = (
+            self.zone_ids,
+            self.door_ids,
+            self.door_a,
+            self.door_b,
+            self.adj_offsets,
+            self.adj_zones,
+            self.adj_doors,
+            self.door_offsets,
+            self.zone_doors,
+            self.exit_offsets,
+            self.zone_exits,
+            self.exits,
+        )
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def stats(self):
+        return {
+            "zones": self.zone_count,
+            "doors": self.door_count,
+            "exits": len(self.exits),
+            "devices": len(self.device_zone),
+            "array_bytes": self.nbytes(),
+        }
+
+    # --- Lookups by id ---
+    def zone_name(self, zone_id: int) -> str:
+        return self.zone_names[self.zone_index[zone_id]]
+
+    def doors_of_zone(self, zone_id: int, include_exits: bool = True) -> List[int]:
+        zone = self.zone_index[zone_id]
+        doors = self.zone_doors[self.door_offsets[zone] : self.door_offsets[zone + 1]]
+        return [
+            self.door_ids[door]
+            for door in doors
+            if include_exits or self.door_b[door] != NO_ZONE
+        ]
+
+    def zones_of_door(self, door_id: int) -> Tuple[int, Optional[int]]:
+        door = self.door_index[door_id]
+        b = self.door_b[door]
+        return self.zone_ids[self.door_a[door]], (
+            None if b == NO_ZONE else self.zone_ids[b]
+        )
+
+    def exits_of_zone(self, zone_id: int) -> List[int]:
+        zone = self.zone_index[zone_id]
+        return [
+            self.door_ids[door]
+            for door in self.zone_exits[
+                self.exit_offsets[zone] : self.exit_offsets[zone + 1]
+            ]
+        ]
+
+    def neighbours(self, zone_id: int) -> List[Tuple[int, int]]:
+        """
+        (neighbour zone id, door id) pairs of a zone
+        """
+        zone = self.zone_index[zone_id]
+        start, stop = self.adj_offsets[zone], self.adj_offsets[zone + 1]
+        return [
+            (self.zone_ids[self.adj_zones[k]], self.door_ids[self.adj_doors[k]])
+            for k in range(start, stop)
+        ]
+
+    def zone_of_device(self, device_id: int) -> Optional[int]:
+        return self.device_zone.get(device_id)
+
+
+def default_graph() -> BuildingGraph:
+    """
+    The EastField Mall layout, used when the database has no topology
+    """
+    return BuildingGraph.from_mapping(zone_door_mapping, exit_doors, zone_names)
+
+
+async def load_building_graph(
+    supabase, building_id: int = DEFAULT_BUILDING_ID
+) -> BuildingGraph:
+    """
+    Reads the building's zones, door_connections and devices (see db/schema.sql).
+
+    The default building falls back to the default layout if the tables are
+    missing or empty; other buildings get whatever the database holds.
+    """
+    try:
+        zones = (
+            await supabase.table("zones")
+            .select("id, name")
+            .eq("building_id", building_id)
+            .execute()
+        )
+        doors = (
+            await supabase.table("door_connections")
+            .select("door_id, zone_id, to_zone_id")
+            .eq("building_id", building_id)
+            .execute()
+        )
+        devices = (
+            await supabase.table("devices")
+            .select("id, zone_id")
+            .eq("building_id", building_id)
+            .execute()
+        )
+    except Exception as e:
+        if building_id != DEFAULT_BUILDING_ID:
+            raise
+        logger.warning(
+            "Could not load the building graph (%s), using the default layout", e
+        )
+        return default_graph()
+    if not doors.data:
+        if building_id == DEFAULT_BUILDING_ID:
+            logger.warning(
+                "No door connections in the database, using the default layout"
+            )
+            return default_graph()
+        logger.warning("No door connections for building %s", building_id)
+
+    graph = BuildingGraph(
+        ((row["id"], row.get("name")) for row in zones.data),
+        ((row["door_id"], row["zone_id"], row["to_zone_id"]) for row in doors.data),
+        ((row["id"], row["zone_id"]) for row in devices.data),
+    )
+    logger.info("Loaded building graph of building %s: %s", building_id, graph.stats())
+    return graph
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import random
+import secrets
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from building_graph import DEFAULT_BUILDING_ID
+from clients import ClientPool
+from metrics import DB_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.2  # Seconds between write-behind flushes to Supabase
+SUBSCRIBER_QUEUE_SIZE = 256
+HISTORY_SIZE = 1024  # Recent changes kept for subscribers that resume
+BACKOFF_INITIAL = 0.5  # Seconds before the first retry of a failed flush
+BACKOFF_MAX = 30.0  # Longest wait between retries
+
+
+class BuildingState:
+    """
+    Authoritative in-process door and zone state of one building.
+
+    Tool calls change it synchronously and return at once. A write-behind
+    task pushes the changes to Supabase every FLUSH_INTERVAL seconds. Pending
+    changes are coalesced per row, so repeated toggles of one door only
+    write its last value, and rows that end up with the same value share one
+    `.in_("id", ids)` update. Agents and the dashboard read the state or
+    subscribe to changes without querying the database. Every read and
+    write is scoped to `building_id`.
+    """
+
+    def __init__(
+        self,
+        clients: ClientPool,
+        building_id: int = DEFAULT_BUILDING_ID,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.clients = clients
+        self.building_id = building_id
+        self.flush_interval = flush_interval
+        self.doors: Dict[int, bool] = {}  # door id -> open
+        self.zones: Dict[int, str] = {}  # zone id -> "ok" / "danger"
+        self.version = 0
+        # Versions restart when the state is rebuilt (process restart or
+        # eviction), so they are only comparable within one epoch
+        self.epoch = secrets.token_hex(4)
+        self._pending_doors: Dict[int, bool] = {}
+        self._pending_zones: Dict[int, str] = {}
+        self._subscribers: List[asyncio.Queue] = []
+        self._listeners: List[Callable[[dict], None]] = []
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._wake = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._backoff = 0.0  # Wait before the next flush after failures
+
+        # Counters
+        self.changes = 0
+        self.writes = 0
+        self.failed_flushes = 0
+
+    async def load(self):
+        """
+        Reads the current doors and zones tables into memory
+        """
+        supabase = self.clients.supabase
+        doors = (
+            await supabase.table("doors")
+            .select("id, open")
+            .eq("building_id", self.building_id)
+            .execute()
+        )
+        zones = (
+            await supabase.table("zones")
+            .select("id, status")
+            .eq("building_id", self.building_id)
+            .execute()
+        )
+        self.doors = {row["id"]: row["open"] for row in doors.data}
+        self.zones = {row["id"]: row["status"] for row in zones.data}
+        self.version += 1
+        logger.info(
+            "Loaded %s doors and %s zones of building %s",
+            len(self.doors),
+            len(self.zones),
+            self.building_id,
+        )
+        return self
+
+    def reset(self):
+        """
+        Opens every door and clears every zone of this building; like any
+        other change, it is published and written behind to the database
+        """
+        self.set_doors(list(self.doors), True)
+        for zone_id in list(self.zones):
+            self.set_zone(zone_id, "ok")
+        logger.info(
+            "Reset all doors and zones of building %s to open", self.building_id
+        )
+
+    def start(self):
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        return self
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    # --- Changes ---
+    def set_door(self, door_id: int, open: bool):
+        self.set_doors([door_id], open)
+
+    def set_doors(self, door_ids: Iterable[int], open: bool):
+        changed = {}
+        for door_id in door_ids:
+            if self.doors.get(door_id) != open:
+                self.doors[door_id] = open
+                self._pending_doors[door_id] = open
+                changed[door_id] = open
+        if changed:
+            self._publish({"doors": changed})
+
+    def set_zone(self, zone_id: int, status: str):
+        if self.zones.get(zone_id) == status:
+            return
+        self.zones[zone_id] = status
+        self._pending_zones[zone_id] = status
+        self._publish({"zones": {zone_id: status}})
+
+    def _publish(self, change):
+        self.version += 1
+        self.changes += 1
+        change["version"] = self.version
+        self._history.append(change)
+        for listener in self._listeners:
+            listener(change)
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                # A subscriber that stopped reading loses changes, not the
+                # server; it is told to start over from a snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"version": self.version, "resync": True})
+        self._wake.set()
+
+    # --- Reads ---
+    def snapshot(self):
+        return {
+            "epoch": self.epoch,
+            "version": self.version,
+            "doors": dict(self.doors),
+            "zones": dict(self.zones),
+        }
+
+    def changes_since(self, version: int) -> Optional[List[dict]]:
+        """
+        Changes after `version`, oldest first, or None if some of them are
+        no longer in the history (the caller needs a snapshot instead)
+        """
+        if version == self.version:
+            return []
+        if version > self.version or not self._history:
+            return None
+        if self._history[0]["version"] > version + 1:
+            return None
+        return [change for change in self._history if change["version"] > version]
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Returns a queue that receives every change as {"version", "doors"/"zones"}.
+        If it fills up, its changes are replaced by {"version", "resync": True}
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.append(queue)
+        return queue
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """
+        Calls `listener(change)` synchronously on every change, before it returns
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    # --- Write-behind ---
+    async def _flush_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await self.flush()
+            # Failed flushes are retried with capped exponential backoff
+            await asyncio.sleep(
+                max(self.flush_interval, self._backoff * random.uniform(0.8, 1.2))
+            )
+
+    async def flush(self):
+        """
+        Writes all pending changes, one update per distinct value per table
+        """
+        doors, self._pending_doors = self._pending_doors, {}
+        zones, self._pending_zones = self._pending_zones, {}
+        if not doors and not zones:
+            return
+        start = time.perf_counter()
+        try:
+            for open in (True, False):
+                ids = [door_id for door_id, value in doors.items() if value == open]
+                if ids:
+                    await self.clients.supabase.table("doors").update(
+                        {"open": open}
+                    ).eq("building_id", self.building_id).in_("id", ids).execute()
+                    self.writes += 1
+            for status in set(zones.values()):
+                ids = [zone_id for zone_id, value in zones.items() if value == status]
+                await self.clients.supabase.table("zones").update(
+                    {"status": status}
+                ).eq("building_id", self.building_id).in_("id", ids).execute()
+                self.writes += 1
+            DB_FLUSH_SECONDS.observe(time.perf_counter() - start)
+            self._backoff = 0.0
+        except Exception as e:
+            self.failed_flushes += 1
+            self._backoff = min(BACKOFF_MAX, max(BACKOFF_INITIAL, self._backoff * 2))
+            logger.warning(
+                "Error flushing building state to Supabase: %s; retrying in %.1f s",
+                e,
+                self._backoff,
+            )
+            # Retry with the current value on the next flush (updates are idempotent)
+            for door_id in doors:
+                self._pending_doors[door_id] = self.doors[door_id]
+            for zone_id in zones:
+                self._pending_zones[zone_id] = self.zones[zone_id]
+            self._wake.set()
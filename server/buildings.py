@@ -0,0 +1,303 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from building_graph import (
+    DEFAULT_BUILDING_ID,
+    BuildingGraph,
+    default_graph,
+    load_building_graph,
+)
+from building_state import BuildingState
+from clients import ClientPool
+from metrics import REGISTRY
+from prompt_context import PromptContext
+from prompts import building_instructions, default_building_description, system_prompt
+from response_cache import ResponseCache
+from routing import EvacuationRouter
+
+logger = logging.getLogger(__name__)
+
+MAX_BUILDINGS = 32  # Loaded buildings kept in memory; idle ones beyond are evicted
+
+BUILDING_LOADS = REGISTRY.counter("building_loads_total", "Buildings loaded")
+BUILDING_EVICTIONS = REGISTRY.counter(
+    "building_evictions_total", "Idle buildings evicted from memory"
+)
+BUILDING_FALLBACKS = REGISTRY.counter(
+    "building_fallbacks_total",
+    "Calls served by another building because theirs could not be loaded",
+)
+
+
+def building_id_for_call(call: Optional[Dict[str, Any]]) -> int:
+    """
+    Building a Retell call belongs to, from its metadata or dynamic variables
+    ("building_id"); calls without one go to the default building
+    """
+    call = call or {}
+    for source in ("metadata", "retell_llm_dynamic_variables"):
+        value = (call.get(source) or {}).get("building_id")
+        if value is not None:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                logger.warning(
+                    "Ignoring invalid building_id %r in call %s", value, source
+                )
+    return DEFAULT_BUILDING_ID
+
+
+def zone_id_for_call(call: Optional[Dict[str, Any]]) -> Optional[int]:
+    """
+    Zone the caller is in, when the call says so in its metadata or dynamic
+    variables ("zone_id"), e.g. for calls from a help point or a phone
+    located by the venue; None otherwise
+    """
+    call = call or {}
+    for source in ("metadata", "retell_llm_dynamic_variables"):
+        value = (call.get(source) or {}).get("zone_id")
+        if value is not None:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                logger.warning("Ignoring invalid zone_id %r in call %s", value, source)
+    return None
+
+
+def describe_building(name: str, description: Optional[str], graph: BuildingGraph):
+    """
+    Prompt text listing a building's zones and their door ids, one line
+    per zone. Which door leads where and the door and zone status are
+    given around the caller by PromptContext instead.
+    """
+    lines = ["", "Description of the building:", f"Name: {name}"]
+    if description:
+        lines.append(description)
+    lines += [
+        "",
+        "Stores and corridors are considered zones. Doors are considered doors.",
+        "Zones and their doors (see the current status for where doors lead):",
+    ]
+    for zone_id in graph.zone_ids:
+        line = f"- {graph.zone_name(zone_id)} (Zone Id: {zone_id})"
+        doors = graph.doors_of_zone(zone_id, include_exits=False)
+        if doors:
+            line += ", Door Ids: " + ", ".join(str(door_id) for door_id in doors)
+        exits = graph.exits_of_zone(zone_id)
+        if exits:
+            line += ", Exit Door Ids: " + ", ".join(str(door_id) for door_id in exits)
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def building_prompt(
+    building_id: int, name: str, description: Optional[str], graph: BuildingGraph
+) -> List[Dict[str, str]]:
+    """
+    Static prompt prefix of a building's calls
+    """
+    if building_id == DEFAULT_BUILDING_ID and not description:
+        description = default_building_description
+    description = describe_building(name, description, graph)
+    return [
+        {
+            "role": "system",
+            "content": system_prompt + description + building_instructions,
+        }
+    ]
+
+
+class Building:
+    """
+    Everything one building needs to serve calls: its live state, graph,
+    evacuation router, prompt prefix and live prompt context, and cached
+    answers
+    """
+
+    def __init__(
+        self,
+        building_id: int,
+        name: str,
+        state: BuildingState,
+        router: EvacuationRouter,
+        prompt_prefix: List[Dict[str, str]],
+    ):
+        self.building_id = building_id
+        self.name = name
+        self.state = state
+        self.router = router
+        self.prompt_prefix = prompt_prefix
+        self.context = PromptContext(state, router)
+        self.responses = ResponseCache(state)
+        self.users = 0  # Calls and state streams holding the building
+        self.last_used = time.monotonic()
+
+    @property
+    def graph(self) -> BuildingGraph:
+        return self.router.graph
+
+    def stats(self):
+        return {
+            "building_id": self.building_id,
+            "name": self.name,
+            "users": self.users,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            "version": self.state.version,
+            "cached_responses": len(self.responses),
+            "graph": self.graph.stats(),
+        }
+
+
+class BuildingRegistry:
+    """
+    Buildings served by this process, loaded on first use.
+
+    A building is loaded (state, graph, prompt) the first time a call or
+    request names it. At most `max_buildings` stay in memory: when a load
+    goes over, the least recently used buildings nobody is holding are
+    flushed and dropped, and load again on their next use. Loading never
+    changes a building's doors and zones: a load can be a call's first use
+    or follow a restart in the middle of an incident, so the closed doors
+    and danger zones already stored are kept. They are cleared only by
+    reset(), at startup for the buildings configured for it or on an admin
+    request.
+    """
+
+    def __init__(self, clients: ClientPool, max_buildings: int = MAX_BUILDINGS):
+        self.clients = clients
+        self.max_buildings = max_buildings
+        self._buildings: "OrderedDict[int, Building]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Task] = {}
+
+    async def get(self, building_id: int) -> Building:
+        """
+        The loaded building, loading it if needed (without holding it)
+        """
+        building = await self._get(building_id)
+        await self._evict(keep=building)
+        return building
+
+    async def acquire(self, building_id: int) -> Building:
+        """
+        Loads and holds a building; it is not evicted until release()
+        """
+        building = await self._get(building_id)
+        building.users += 1
+        await self._evict()
+        return building
+
+    async def reset(self, building_id: int) -> Building:
+        """
+        Opens every door and clears every zone of a building, loading it
+        if needed
+        """
+        building = await self.get(building_id)
+        building.state.reset()
+        return building
+
+    async def acquire_for_call(self, building_id: int) -> Building:
+        """
+        acquire() for an emergency call, which must not fail: if the call's
+        building cannot be loaded (unknown id in the call metadata, database
+        outage), the call is served by the default building, and if that
+        cannot be loaded either, by an offline copy of the default layout
+        whose changes are kept in memory only
+        """
+        try:
+            return await self.acquire(building_id)
+        except Exception as e:
+            logger.error("Could not load building %s for a call: %r", building_id, e)
+        BUILDING_FALLBACKS.inc()
+        if building_id != DEFAULT_BUILDING_ID:
+            try:
+                return await self.acquire(DEFAULT_BUILDING_ID)
+            except Exception as e:
+                logger.error("Could not load the default building: %r", e)
+        logger.error("Serving the call from the offline default layout")
+        building = self._offline_building()
+        building.users += 1
+        return building
+
+    def _offline_building(self) -> Building:
+        # Not registered, and its state is never loaded or flushed
+        graph = default_graph()
+        state = BuildingState(self.clients, DEFAULT_BUILDING_ID)
+        router = EvacuationRouter.from_state(state, graph)
+        name = "EastField Mall"
+        prefix = building_prompt(DEFAULT_BUILDING_ID, name, None, graph)
+        return Building(DEFAULT_BUILDING_ID, name, state, router, prefix)
+
+    async def _get(self, building_id: int) -> Building:
+        building = self._buildings.get(building_id)
+        if building is None:
+            # Concurrent first uses share one load
+            task = self._loading.get(building_id)
+            if task is None:
+                task = asyncio.create_task(self._load(building_id))
+                task.add_done_callback(lambda _: self._loading.pop(building_id, None))
+                self._loading[building_id] = task
+            building = await asyncio.shield(task)
+        self._buildings.move_to_end(building_id)
+        building.last_used = time.monotonic()
+        return building
+
+    async def release(self, building: Building):
+        building.users -= 1
+        building.last_used = time.monotonic()
+        if self._buildings.get(building.building_id) is not building:
+            return  # An offline building, or one already evicted
+        await self._evict()
+
+    async def _load(self, building_id: int) -> Building:
+        supabase = self.clients.supabase
+        try:
+            rows = (
+                await supabase.table("buildings")
+                .select("id, name, description")
+                .eq("id", building_id)
+                .execute()
+            ).data
+        except Exception as e:
+            if building_id != DEFAULT_BUILDING_ID:
+                raise
+            logger.warning("Could not read the buildings table (%s)", e)
+            rows = []
+        if not rows and building_id != DEFAULT_BUILDING_ID:
+            raise KeyError(f"Unknown building {building_id}")
+        row = rows[0] if rows else {"name": "EastField Mall", "description": None}
+
+        state = BuildingState(self.clients, building_id)
+        await state.load()
+        graph = await load_building_graph(supabase, building_id)
+        router = EvacuationRouter.from_state(state, graph)
+        state.start()
+
+        prefix = building_prompt(building_id, row["name"], row["description"], graph)
+
+        building = Building(building_id, row["name"], state, router, prefix)
+        self._buildings[building_id] = building
+        BUILDING_LOADS.inc()
+        logger.info("Loaded building %s (%s)", building_id, row["name"])
+        return building
+
+    async def _evict(self, keep: Optional[Building] = None):
+        idle = [b for b in self._buildings.values() if b.users == 0 and b is not keep]
+        while len(self._buildings) > self.max_buildings and idle:
+            building = idle.pop(0)  # Least recently used first
+            if building.users or building.building_id not in self._buildings:
+                continue  # Taken again while an earlier eviction was flushing
+            del self._buildings[building.building_id]
+            await building.state.close()
+            BUILDING_EVICTIONS.inc()
+            logger.info("Evicted idle building %s", building.building_id)
+
+    async def close(self):
+        for building in list(self._buildings.values()):
+            await building.state.close()
+        self._buildings.clear()
+
+    def stats(self):
+        return [building.stats() for building in self._buildings.values()]
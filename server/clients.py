@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+from cerebras.cloud.sdk import AsyncCerebras
+from supabase import AsyncClient, create_async_client
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = 30.0  # Seconds between health checks
+HEALTH_CHECK_TIMEOUT = 5.0  # A check slower than this counts as a failure
+FAILED_CHECKS_BEFORE_RECONNECT = 2  # Consecutive failed checks that rebuild a client
+# A replaced client is closed only after this many seconds, longer than the
+# request timeouts (60 s Cerebras, 120 s Supabase), so that the responses
+# and writes still running on it can finish
+RETIRED_CLIENT_GRACE = 180.0
+MAX_CONNECTIONS = 50  # Upper bound on sockets to Cerebras
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+
+async def close_supabase(client: AsyncClient):
+    """
+    Closes the HTTP sessions of a Supabase client, which has no close() of
+    its own; its sub-clients are created on first use, so only those that
+    exist are closed
+    """
+    for attr in ("_postgrest", "_storage", "_functions"):
+        sub_client = getattr(client, attr, None)
+        close = getattr(sub_client, "aclose", None)
+        if close is None:
+            continue
+        try:
+            await close()
+        except Exception as e:
+            logger.warning("Closing Supabase %s client failed: %s", attr[1:], e)
+
+
+class ClientPool:
+    """
+    Application-lifetime Supabase and Cerebras clients shared by every call.
+
+    Both clients keep their HTTP connections alive, so a new call can use
+    them without paying for TLS and connection setup. A background task
+    checks both every HEALTH_CHECK_INTERVAL seconds and rebuilds a client
+    that fails FAILED_CHECKS_BEFORE_RECONNECT checks in a row, so calls
+    always pick up a working one from the pool. The client it replaces is
+    still in use by running calls, so it is closed `retired_grace` seconds
+    later.
+    """
+
+    def __init__(
+        self,
+        health_check_interval: float = HEALTH_CHECK_INTERVAL,
+        retired_grace: float = RETIRED_CLIENT_GRACE,
+    ):
+        self.health_check_interval = health_check_interval
+        self.retired_grace = retired_grace
+        self.supabase: Optional[AsyncClient] = None
+        self.cerebras: Optional[AsyncCerebras] = None
+        self._lock = asyncio.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+        self._retired = set()  # Tasks closing replaced clients after the grace
+        self._failing = {"supabase": 0, "cerebras": 0}  # Consecutive failed checks
+
+        # Counters
+        self.reconnects = {"supabase": 0, "cerebras": 0}
+        self.failed_checks = {"supabase": 0, "cerebras": 0}
+
+    async def start(self):
+        """
+        Creates both clients and starts the health checks
+        """
+        await asyncio.gather(self._connect_supabase(), self._connect_cerebras())
+        self._health_task = asyncio.create_task(self._health_loop())
+        logger.info("Client pool ready")
+        return self
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        # Replaced clients are closed now rather than after their grace
+        for task in list(self._retired):
+            task.cancel()
+        await asyncio.gather(*self._retired, return_exceptions=True)
+        if self.cerebras is not None:
+            await self.cerebras.close()
+        if self.supabase is not None:
+            await close_supabase(self.supabase)
+
+    async def _connect_supabase(self):
+        old = self.supabase
+        self.supabase = await create_async_client(
+            os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"]
+        )
+        if old is not None:
+            self._retire("supabase", lambda: close_supabase(old))
+
+    async def _connect_cerebras(self):
+        old = self.cerebras
+        self.cerebras = AsyncCerebras(
+            api_key=os.environ["CEREBRAS_API_KEY"],
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            ),
+        )
+        if old is not None:
+            self._retire("cerebras", old.close)
+
+    def _retire(self, name: str, close: Callable[[], Awaitable[Any]]):
+        task = asyncio.create_task(self._close_later(name, close))
+        self._retired.add(task)
+        task.add_done_callback(self._retired.discard)
+
+    async def _close_later(self, name: str, close: Callable[[], Awaitable[Any]]):
+        try:
+            await asyncio.sleep(self.retired_grace)
+        finally:
+            try:
+                await close()
+            except Exception as e:
+                logger.warning("Closing the replaced %s client failed: %s", name, e)
+
+    async def reconnect(self, name: str):
+        """
+        Rebuilds one client ("supabase" or "cerebras"), e.g. after a connection error
+        """
+        async with self._lock:
+            logger.warning("Reconnecting %s client", name)
+            if name == "supabase":
+                await self._connect_supabase()
+            else:
+                await self._connect_cerebras()
+            self.reconnects[name] += 1
+
+    async def _check(self, name: str) -> bool:
+        try:
+            if name == "supabase":
+                check = self.supabase.table("zones").select("id").limit(1).execute()
+            else:
+                check = self.cerebras.models.list()
+            await asyncio.wait_for(check, HEALTH_CHECK_TIMEOUT)
+            self._failing[name] = 0
+            return True
+        except Exception as e:
+            logger.warning("Health check failed for %s: %s", name, e)
+            self.failed_checks[name] += 1
+            self._failing[name] += 1
+            return False
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for name in ("supabase", "cerebras"):
+                # One slow check under load is not worth dropping the client
+                if await self._check(name):
+                    continue
+                if self._failing[name] < FAILED_CHECKS_BEFORE_RECONNECT:
+                    continue
+                try:
+                    await self.reconnect(name)
+                    self._failing[name] = 0
+                except Exception as e:
+                    logger.error("Reconnecting %s failed: %s", name, e)
+
+    def health(self):
+        return {
+            "supabase": self.supabase is not None,
+            "cerebras": self.cerebras is not None,
+            "reconnects": dict(self.reconnects),
+            "failed_checks": dict(self.failed_checks),
+        }
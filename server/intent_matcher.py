@@ -0,0 +1,221 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from building_graph import BuildingGraph
+from custom_types import ResponseRequiredRequest, Utterance
+from metrics import REGISTRY
+
+MAX_COMMAND_WORDS = 12  # Longer utterances carry context the LLM should see
+MATCH_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+FAST_PATH_HITS = REGISTRY.counter(
+    "fast_path_hits_total", "Turns answered by the intent fast path"
+)
+FAST_PATH_MISSES = REGISTRY.counter(
+    "fast_path_misses_total", "Turns that went to the LLM after matching"
+)
+FAST_PATH_SAVED_SECONDS = REGISTRY.counter(
+    "fast_path_saved_seconds_total",
+    "Estimated time saved by the fast path (mean LLM turn time minus fast turn time)",
+)
+MATCH_SECONDS = REGISTRY.histogram(
+    "intent_match_seconds", "Time to match one utterance", buckets=MATCH_BUCKETS
+)
+
+NUMBER_WORDS = {
+    word: number
+    for number, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve"
+        " thirteen fourteen fifteen sixteen seventeen eighteen nineteen twenty".split()
+    )
+}
+# Openers and closers that do not change a command
+_POLITE = r"(?:(?:please|okay|ok|hey|now|quickly|sentinel|sentinelai)\s+)*"
+_PLEASE = r"(?:\s+(?:please|now|right now|quickly|immediately))*"
+_NUMBER = r"(?:number\s+|no\s+|#)?(?P<number>\d+|" + "|".join(NUMBER_WORDS) + r")"
+_ZONE = r"(?:the\s+)?(?P<zone>[a-z0-9 ]+?)"
+# Statements and questions are left to the LLM
+_NOT_A_COMMAND = re.compile(
+    r"\b(?:not|don't|dont|never|no longer|can't|cannot|should|why|what|where|which"
+    r"|how|is it|are|was|were|if|because|but|trapped|stuck|help)\b"
+)
+
+DOOR_COMMANDS = [
+    (
+        re.compile(
+            rf"^{_POLITE}(?:open|unlock)(?:\s+up)?\s+(?:the\s+)?door\s+{_NUMBER}{_PLEASE}$"
+        ),
+        "open_door",
+    ),
+    (
+        re.compile(
+            rf"^{_POLITE}(?:close|shut|lock)\s+(?:the\s+)?door\s+{_NUMBER}{_PLEASE}$"
+        ),
+        "close_door",
+    ),
+]
+ZONE_COMMANDS = [
+    (
+        re.compile(
+            rf"^{_POLITE}(?:lock\s+down|lockdown|seal\s+off|close\s+off)\s+{_ZONE}{_PLEASE}$"
+        ),
+        "danger",
+    ),
+    (
+        re.compile(
+            rf"^{_POLITE}mark\s+{_ZONE}\s+(?:as\s+)?(?:a\s+)?(?:danger|dangerous|unsafe)(?:\s+zone)?{_PLEASE}$"
+        ),
+        "danger",
+    ),
+    (re.compile(rf"^{_POLITE}(?:reopen|open\s+up)\s+{_ZONE}{_PLEASE}$"), "ok"),
+    (
+        re.compile(
+            rf"^{_POLITE}mark\s+{_ZONE}\s+(?:as\s+)?(?:a\s+)?(?:safe|ok|okay|clear)(?:\s+zone)?{_PLEASE}$"
+        ),
+        "ok",
+    ),
+]
+
+REPLIES = {
+    "open_door": "Okay, door {door_id} is open now.",
+    "close_door": "Okay, door {door_id} is closed now.",
+    "danger": "Understood. I've locked down {name} and closed its doors. Please keep away from it.",
+    "ok": "Understood. I've marked {name} safe again and opened its doors.",
+}
+
+
+def normalize(text: str) -> str:
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^a-z0-9#'? ]+", " ", text)
+    return " ".join(text.split())
+
+
+def spoken_name(name: str) -> str:
+    # "the north corridor", but "Banana Store"
+    return name if name[:1].isupper() else f"the {name}"
+
+
+def _key(name: str) -> str:
+    # ASR splits and joins words freely ("lulu lime", "lululime")
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+class Intent:
+    """
+    A command recognised without the LLM: the tool to run and what to say
+    """
+
+    def __init__(self, name: str, arguments: Dict[str, Any], reply: str):
+        self.name = name
+        self.arguments = arguments
+        self.reply = reply
+
+
+class IntentMatcher:
+    """
+    Recognises short, unambiguous door and zone commands ("open door 4",
+    "lock down the north corridor") in a building, so they can be carried
+    out without a round trip to the LLM.
+
+    Only a whole utterance that is a single imperative command matches;
+    anything with a negation, a question, a second door or an unknown name
+    is left to the LLM.
+    """
+
+    def __init__(self, graph: BuildingGraph):
+        self.graph = graph
+        self.zones: Dict[str, int] = {}
+        for zone_id in graph.zone_ids:
+            name = graph.zone_name(zone_id)
+            self.zones[_key(name)] = zone_id
+            if "corridor" in name.lower():
+                for alias in ("hallway", "hall"):
+                    self.zones.setdefault(
+                        _key(name.lower().replace("corridor", alias)), zone_id
+                    )
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def for_graph(graph: BuildingGraph) -> "IntentMatcher":
+        # Graphs are immutable, so a matcher is built once per graph
+        return IntentMatcher(graph)
+
+    def mentioned_zone(self, text: str) -> Optional[int]:
+        """
+        The zone named last in `text`, if any
+        """
+        text = _key(text)
+        # Latest position first, then the longer name ("north hallway" over
+        # "north hall")
+        at, _, zone_id = max(
+            (
+                (text.rfind(key), len(key), zone_id)
+                for key, zone_id in self.zones.items()
+            ),
+            default=(-1, 0, None),
+        )
+        return zone_id if at >= 0 else None
+
+    def last_mentioned_zone(self, transcript: List[Utterance]) -> Optional[int]:
+        """
+        The last zone the caller named. This is not necessarily where they
+        are ("there's a fire in the north corridor").
+        """
+        for utterance in reversed(transcript):
+            if utterance.role == "user":
+                zone_id = self.mentioned_zone(utterance.content)
+                if zone_id is not None:
+                    return zone_id
+        return None
+
+    def match_request(self, request: ResponseRequiredRequest) -> Optional[Intent]:
+        """
+        Intent of the caller's latest utterance, if it is a fast-path command
+        """
+        if request.interaction_type != "response_required" or not request.transcript:
+            return None
+        utterance = request.transcript[-1]
+        if utterance.role != "user":
+            return None
+        return self.match(utterance.content)
+
+    def match(self, text: str) -> Optional[Intent]:
+        text = normalize(text)
+        if (
+            not text
+            or "?" in text
+            or len(text.split()) > MAX_COMMAND_WORDS
+            or _NOT_A_COMMAND.search(text)
+        ):
+            return None
+
+        for pattern, name in DOOR_COMMANDS:
+            found = pattern.match(text)
+            if found:
+                number = found.group("number")
+                door_id = NUMBER_WORDS.get(number)
+                if door_id is None:
+                    door_id = int(number)
+                if door_id not in self.graph.door_index:
+                    return None
+                return Intent(
+                    name,
+                    {"door_id": door_id},
+                    REPLIES[name].format(door_id=door_id),
+                )
+
+        for pattern, status in ZONE_COMMANDS:
+            found = pattern.match(text)
+            if found:
+                zone_id = self.zones.get(_key(found.group("zone")))
+                if zone_id is None:
+                    return None
+                return Intent(
+                    "mark_zone",
+                    {"zone_id": zone_id, "status": status},
+                    REPLIES[status].format(
+                        name=spoken_name(self.graph.zone_name(zone_id))
+                    ),
+                )
+        return None
@@ -0,0 +1,352 @@
+"""
+Load test for the LLM WebSocket, without Retell, Cerebras or Supabase.
+
+Simulated Retell calls open /llm-websocket/{call_id} concurrently and replay
+a conversation: call_details, update_only while the caller talks,
+response_required (sometimes reminder_required), ping_pong every
+--ping-interval seconds and, with --barge-in-rate, a new response_required
+before the previous response is done. With --unknown-building-rate, some
+calls name a building that does not exist; they must still be answered
+(from the default building). With --spawn the server is started
+with MOCK_BACKENDS=1 (see mock_backends.py) and the mock settings below.
+
+Usage:
+    python load_test.py --spawn --calls 200 --turns 5
+    python load_test.py --url ws://localhost:8080 --calls 500 --ramp 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+import websockets
+
+UNKNOWN_BUILDING_ID = 999999
+
+CALLER_LINES = [
+    "There is smoke coming from the food court!",
+    "I'm in the Banana Store, which way do I go?",
+    "Someone said there's a fire near the north corridor.",
+    "The door next to me is locked, what do I do?",
+    "I can hear an alarm, is it safe to stay here?",
+]
+RESPONSE_TIMEOUT = 30.0  # A response slower than this counts as failed
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {
+            "first_content": [],
+            "complete": [],
+            "ping_rtt": [],
+            "connect": [],
+        }
+        self.calls_ok = 0
+        self.calls_failed = 0
+        self.turns = 0
+        self.superseded = 0
+        self.timeouts = 0
+
+    def report(self, duration: float):
+        print(
+            f"Calls: {self.calls_ok} ok, {self.calls_failed} failed in {duration:.1f} s"
+        )
+        print(
+            f"Turns: {self.turns} completed ({self.turns / duration:.1f}/s), "
+            f"{self.superseded} superseded, {self.timeouts} timed out"
+        )
+        print(f"{'latency (ms)':<14}{'n':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+        for name, values in self.latencies.items():
+            row = [percentile(values, q) * 1000 for q in (0.5, 0.9, 0.99)]
+            row.append(max(values) * 1000 if values else float("nan"))
+            print(f"{name:<14}{len(values):>7}" + "".join(f"{v:>9.1f}" for v in row))
+
+
+class SimulatedCall:
+    """
+    One Retell call: sends the interactions Retell would and times the
+    server's responses
+    """
+
+    def __init__(
+        self,
+        url: str,
+        call_id: str,
+        args,
+        stats: LoadStats,
+        seed: int,
+        building_id: int = 1,
+    ):
+        self.url = f"{url}/llm-websocket/{call_id}"
+        self.call_id = call_id
+        self.building_id = building_id
+        self.args = args
+        self.stats = stats
+        self.random = random.Random(seed)
+        self.transcript = []
+        self.sent_at: Dict[int, float] = {}
+        self.first_seen = set()
+        self.text: Dict[int, str] = {}
+        self.done: Dict[int, asyncio.Event] = {}
+
+    async def run(self):
+        start = time.perf_counter()
+        try:
+            async with websockets.connect(self.url, open_timeout=30) as ws:
+                self.stats.latencies["connect"].append(time.perf_counter() - start)
+                receiver = asyncio.create_task(self._receive(ws))
+                pinger = asyncio.create_task(self._ping(ws))
+                try:
+                    await self._converse(ws)
+                finally:
+                    pinger.cancel()
+                    receiver.cancel()
+            self.stats.calls_ok += 1
+        except Exception as e:
+            print(f"Call {self.call_id} failed: {e!r}")
+            self.stats.calls_failed += 1
+
+    async def _send(self, ws, message):
+        await ws.send(json.dumps(message))
+
+    async def _converse(self, ws):
+        await self._send(
+            ws,
+            {
+                "interaction_type": "call_details",
+                "call": {
+                    "call_id": self.call_id,
+                    "metadata": {"building_id": self.building_id},
+                },
+            },
+        )
+        response_id = 0
+        for _ in range(self.args.turns):
+            line = self.random.choice(CALLER_LINES)
+            reminder = (
+                self.transcript and self.random.random() < self.args.reminder_rate
+            )
+            if not reminder:
+                # The caller talks for a while before the turn is handed over
+                self.transcript.append({"role": "user", "content": line})
+                await self._send(
+                    ws,
+                    {"interaction_type": "update_only", "transcript": self.transcript},
+                )
+                await asyncio.sleep(self.args.speech_time)
+
+            response_id += 1
+            await self._request(ws, response_id, reminder)
+            if self.random.random() < self.args.barge_in_rate:
+                # The caller interrupts; Retell asks for a new response
+                await asyncio.sleep(self.random.uniform(0.01, 0.2))
+                self.stats.superseded += 1
+                self.transcript.append({"role": "user", "content": "Wait, what?"})
+                response_id += 1
+                await self._request(ws, response_id, False)
+
+            try:
+                await asyncio.wait_for(self.done[response_id].wait(), RESPONSE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.stats.timeouts += 1
+                continue
+            self.stats.turns += 1
+            self.transcript.append(
+                {"role": "agent", "content": self.text.get(response_id, "")}
+            )
+            await asyncio.sleep(self.args.think_time)
+
+    async def _request(self, ws, response_id: int, reminder: bool):
+        self.done[response_id] = asyncio.Event()
+        self.sent_at[response_id] = time.perf_counter()
+        await self._send(
+            ws,
+            {
+                "interaction_type": (
+                    "reminder_required" if reminder else "response_required"
+                ),
+                "response_id": response_id,
+                "transcript": self.transcript,
+            },
+        )
+
+    async def _receive(self, ws):
+        async for raw in ws:
+            now = time.perf_counter()
+            message = json.loads(raw)
+            if message.get("response_type") == "ping_pong":
+                self.stats.latencies["ping_rtt"].append(
+                    time.time() - message["timestamp"] / 1000
+                )
+                continue
+            response_id = message.get("response_id")
+            if message.get("response_type") == "config" or not response_id:
+                continue  # Config and the begin message
+            if response_id not in self.sent_at:
+                continue
+            if message.get("content"):
+                self.text[response_id] = (
+                    self.text.get(response_id, "") + message["content"]
+                )
+                if response_id not in self.first_seen:
+                    self.first_seen.add(response_id)
+                    self.stats.latencies["first_content"].append(
+                        now - self.sent_at[response_id]
+                    )
+            if message.get("content_complete"):
+                self.stats.latencies["complete"].append(now - self.sent_at[response_id])
+                self.done[response_id].set()
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(self.args.ping_interval)
+            await self._send(
+                ws,
+                {"interaction_type": "ping_pong", "timestamp": int(time.time() * 1000)},
+            )
+
+
+def spawn_server(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        {
+            "MOCK_BACKENDS": "1",
+            "MOCK_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+            "MOCK_LLM_FIRST_TOKEN_DELAY": str(args.first_token_delay),
+            "MOCK_LLM_TOOL_CALL_RATE": str(args.tool_call_rate),
+            "MOCK_DB_LATENCY": str(args.db_latency),
+            "MOCK_BUILDINGS": str(args.buildings),
+        }
+    )
+    # Clients are never created with these, but the modules read them at import
+    for key in ("RETELL_API_KEY", "SUPABASE_URL", "SUPABASE_KEY", "CEREBRAS_API_KEY"):
+        env.setdefault(key, "mock")
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(args.port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+
+
+async def wait_until_up(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while True:
+            try:
+                await http.get(f"{base_url}/health")
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+async def run_load(args):
+    stats = LoadStats()
+    rng = random.Random(args.seed)
+    calls = [
+        SimulatedCall(
+            args.url,
+            f"load-{i}",
+            args,
+            stats,
+            seed=args.seed + i,
+            building_id=(
+                UNKNOWN_BUILDING_ID
+                if rng.random() < args.unknown_building_rate
+                else 1 + i % args.buildings
+            ),
+        )
+        for i in range(args.calls)
+    ]
+
+    async def start(i, call):
+        # Spread connection setup over the ramp
+        await asyncio.sleep(args.ramp * i / max(1, len(calls)))
+        await call.run()
+
+    began = time.perf_counter()
+    await asyncio.gather(*(start(i, call) for i, call in enumerate(calls)))
+    stats.report(time.perf_counter() - began)
+
+    http_url = args.url.replace("ws", "http", 1)
+    async with httpx.AsyncClient() as http:
+        metrics = (await http.get(f"{http_url}/metrics")).text
+    print("Server metrics:")
+    for line in metrics.splitlines():
+        if line.startswith(("responses_", "building_fallbacks")) or (
+            not line.startswith("#") and ("_sum" in line or "_count" in line)
+        ):
+            print(f"  {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default=None, help="ws:// base URL of the server")
+    parser.add_argument("--spawn", action="store_true", help="Start a mock server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument(
+        "--ramp", type=float, default=5.0, help="Seconds to open all calls"
+    )
+    parser.add_argument("--speech-time", type=float, default=0.5)
+    parser.add_argument("--think-time", type=float, default=0.5)
+    parser.add_argument("--ping-interval", type=float, default=2.0)
+    parser.add_argument("--reminder-rate", type=float, default=0.1)
+    parser.add_argument("--barge-in-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--buildings", type=int, default=1, help="Spread calls over buildings 1..N"
+    )
+    parser.add_argument(
+        "--unknown-building-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of calls whose metadata names a building that does not exist",
+    )
+    # Mock backend settings, used with --spawn
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--first-token-delay", type=float, default=0.15)
+    parser.add_argument("--tool-call-rate", type=float, default=0.3)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    if args.url is None:
+        args.url = f"ws://127.0.0.1:{args.port}"
+
+    server = spawn_server(args) if args.spawn else None
+    try:
+        if server is not None:
+            asyncio.run(wait_until_up(args.url.replace("ws", "http", 1)))
+        asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
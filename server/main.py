@@ -1,18 +1,60 @@
 import os
 import asyncio
+import logging
+from typing import Optional
+from contextlib import aclosing, asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from concurrent.futures import TimeoutError as ConnectionTimeoutError
 from retell import Retell
 from custom_types import ConfigResponse, ResponseRequiredRequest, ResponseResponse
 from agent import LlmClient
-from supabase import create_client, Client
+from clients import ClientPool
+from mock_backends import MockClientPool
+from buildings import BuildingRegistry, building_id_for_call, zone_id_for_call
+from building_graph import DEFAULT_BUILDING_ID, load_building_graph
+from metrics import (
+    REGISTRY,
+    RESPONSES_CANCELLED,
+    RESPONSES_COMPLETED,
+    RESPONSES_STARTED,
+)
+from tracing import TurnTrace, setup_logging
+from state_stream import sse_events, state_messages
 
 agent_id = "agent-d5bbe3d9-6f4a-496c-a455-9b6ef4b82b5d"
 
 load_dotenv(override=True)
-app = FastAPI()
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listeners = setup_logging()
+    # Supabase and Cerebras clients shared by every call, and the buildings
+    # served by this process (state, graph and prompt, loaded on first use).
+    # MOCK_BACKENDS=1 swaps in the in-memory database and mock LLM (load tests)
+    pool = MockClientPool() if os.getenv("MOCK_BACKENDS") else ClientPool()
+    app.state.clients = await pool.start()
+    app.state.buildings = BuildingRegistry(app.state.clients)
+    await app.state.buildings.get(DEFAULT_BUILDING_ID)
+    # Buildings whose doors and zones are opened and cleared at startup
+    # (RESET_BUILDINGS=1,2). No building is reset by default: a restart can
+    # happen in the middle of an incident
+    for building_id in os.getenv("RESET_BUILDINGS", "").split(","):
+        if building_id.strip():
+            await app.state.buildings.reset(int(building_id))
+    yield
+    await app.state.buildings.close()
+    await app.state.clients.close()
+    for listener in log_listeners:
+        listener.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 origins = ["http://localhost:3000", "*"]
 
 app.add_middleware(
@@ -24,12 +66,129 @@ app.add_middleware(
 )
 
 retell = Retell(api_key=os.environ["RETELL_API_KEY"])
-client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
 
-# Reset all doors to open
-client.table("doors").update({"open": True}).neq("id", -1).execute()
-client.table("zones").update({"status": "ok"}).neq("id", -1).execute()
-print("Reset all doors and zones to open")
+
+async def get_building(request: Request, building_id: int):
+    try:
+        return await request.app.state.buildings.get(building_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown building {building_id}")
+
+
+@app.get("/health")
+async def health(request: Request):
+    return request.app.state.clients.health()
+
+
+@app.get("/buildings")
+async def loaded_buildings(request: Request):
+    return request.app.state.buildings.stats()
+
+
+# Building endpoints take ?building_id=<id> and default to the default building
+@app.get("/state")
+async def building_state(request: Request, building_id: int = DEFAULT_BUILDING_ID):
+    return (await get_building(request, building_id)).state.snapshot()
+
+
+@app.get("/state/events")
+async def building_state_events(
+    request: Request,
+    since: Optional[str] = None,
+    building_id: int = DEFAULT_BUILDING_ID,
+):
+    # Server-Sent Events: a snapshot, then a delta per change. EventSource
+    # resumes through Last-Event-ID; other clients can pass
+    # ?since=<epoch>:<seq> of the last message they saw
+    if since is None:
+        since = request.headers.get("last-event-id")
+    buildings = request.app.state.buildings
+    try:
+        building = await buildings.acquire(building_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown building {building_id}")
+
+    async def events():
+        # The building stays loaded while someone is watching it
+        try:
+            async for event in sse_events(building.state, since):
+                yield event
+        finally:
+            await buildings.release(building)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/state/ws")
+async def building_state_websocket(
+    websocket: WebSocket,
+    since: Optional[str] = None,
+    building_id: int = DEFAULT_BUILDING_ID,
+):
+    # Same messages as /state/events, as JSON; keepalives are {"type": "keepalive"}
+    buildings = websocket.app.state.buildings
+    try:
+        building = await buildings.acquire(building_id)
+    except KeyError:
+        await websocket.close(1008, f"Unknown building {building_id}")
+        return
+    await websocket.accept()
+    try:
+        async for message in state_messages(building.state, since):
+            await websocket.send_json(message or {"type": "keepalive"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await buildings.release(building)
+
+
+@app.post("/state/reset")
+async def reset_building_state(
+    request: Request, building_id: int = DEFAULT_BUILDING_ID
+):
+    # Opens every door and clears every zone, e.g. once an incident is over
+    building = await get_building(request, building_id)
+    building.state.reset()
+    return building.state.snapshot()
+
+
+@app.get("/graph")
+async def building_graph(request: Request, building_id: int = DEFAULT_BUILDING_ID):
+    return (await get_building(request, building_id)).graph.stats()
+
+
+@app.post("/graph/reload")
+async def reload_building_graph(
+    request: Request, building_id: int = DEFAULT_BUILDING_ID
+):
+    # Swaps in the topology from the database without restarting
+    building = await get_building(request, building_id)
+    graph = await load_building_graph(request.app.state.clients.supabase, building_id)
+    building.router.reload(graph)
+    return graph.stats()
+
+
+@app.get("/routes")
+async def evacuation_routes(request: Request, building_id: int = DEFAULT_BUILDING_ID):
+    return (await get_building(request, building_id)).router.all_routes()
+
+
+@app.get("/routes/{zone_id}")
+async def evacuation_route(
+    request: Request, zone_id: int, building_id: int = DEFAULT_BUILDING_ID
+):
+    return (await get_building(request, building_id)).router.route(zone_id)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 # WebSocket server for exchanging messages with the Retell server.
@@ -37,8 +196,10 @@ print("Reset all doors and zones to open")
 async def websocket_handler(websocket: WebSocket, call_id: str):
     try:
         await websocket.accept()
-        client = LlmClient()
-        await client.setup_supabase()
+        buildings = websocket.app.state.buildings
+        # Created once the call's building is known (from call_details)
+        building = None
+        client = None
         # Send configuration to the Retell server
         config = ConfigResponse(
             response_type="config",
@@ -50,9 +211,12 @@ async def websocket_handler(websocket: WebSocket, call_id: str):
         )
         await websocket.send_json(config.__dict__)
         response_id = 0
+        # The response being drafted; a newer response_id cancels it
+        response_task = None
+        # Short replies (call details, ping pong) that may still be sending
+        other_tasks = set()
 
         async def handle_message(request_json):
-            nonlocal response_id
             if request_json["interaction_type"] == "call_details":
                 event = client.draft_begin_message()
                 await websocket.send_json(event.__dict__)
@@ -62,46 +226,106 @@ async def websocket_handler(websocket: WebSocket, call_id: str):
                     "response_type": "ping_pong",
                     "timestamp": request_json["timestamp"],
                 }
-                print("Sending ping pong response:", pong_response)
+                logger.debug("Sending ping pong response: %s", pong_response)
                 await websocket.send_json(pong_response)
                 return
             if request_json.get("interaction_type") == "update_only":
-                print("Update only interaction received, ignoring.")
-                return
-            if request_json.get("interaction_type") == "update_only":
+                logger.debug("Update only interaction received, ignoring.")
                 return
-            if (
-                request_json["interaction_type"] == "response_required"
-                or request_json["interaction_type"] == "reminder_required"
-            ):
-                response_id = request_json["response_id"]
-                request = ResponseRequiredRequest(
-                    interaction_type=request_json["interaction_type"],
-                    response_id=response_id,
-                    transcript=request_json["transcript"],
-                )
-                print(
-                    f"""Received interaction_type={request_json['interaction_type']}, response_id={response_id}, last_transcript={request_json['transcript'][-1]['content']}"""
+
+        async def handle_response(request: ResponseRequiredRequest, trace: TurnTrace):
+            RESPONSES_STARTED.inc()
+            outcome = "error"
+            try:
+                # aclosing() closes the draft (and its upstream stream) as soon
+                # as this task is cancelled, not when the generator is collected
+                async with aclosing(client.draft_response(request, trace)) as events:
+                    async for event in events:
+                        try:
+                            await websocket.send_json(event.__dict__)
+                        except Exception as e:
+                            logger.error(
+                                "Error in LLM WebSocket: %s for %s", e, call_id
+                            )
+                        if event.content:
+                            trace.mark("first_send")
+                        if event.content_complete:
+                            trace.mark("complete")
+                outcome = "complete"
+                RESPONSES_COMPLETED.inc()
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            except Exception as e:
+                logger.error(
+                    "Error drafting response %s: %s for %s",
+                    request.response_id,
+                    e,
+                    call_id,
                 )
+            finally:
+                trace.finish(outcome)
 
-                async for event in client.draft_response(request):
-                    try:
-                        await websocket.send_json(event.__dict__)
-                    except Exception as e:
-                        print(f"Error in LLM WebSocket: {e} for {call_id}")
-                    if request.response_id < response_id:
-                        print("Breaking")
-                        break  # new response needed, abandon this one
+        def cancel_response():
+            if response_task is not None and not response_task.done():
+                response_task.cancel()
+                RESPONSES_CANCELLED.inc()
 
-        async for data in websocket.iter_json():
-            asyncio.create_task(handle_message(data))
+        try:
+            async for data in websocket.iter_json():
+                if client is None and data["interaction_type"] in (
+                    "call_details",
+                    "response_required",
+                    "reminder_required",
+                ):
+                    # Retell sends the call details (with the building in its
+                    # metadata) first; a call without them, or whose building
+                    # cannot be loaded, uses the default rather than dropping
+                    building = await buildings.acquire_for_call(
+                        building_id_for_call(data.get("call"))
+                    )
+                    client = LlmClient(
+                        websocket.app.state.clients,
+                        building,
+                        zone_id_for_call(data.get("call")),
+                    )
+                if (
+                    data["interaction_type"] == "response_required"
+                    or data["interaction_type"] == "reminder_required"
+                ):
+                    response_id = data["response_id"]
+                    trace = TurnTrace(call_id, response_id, data["interaction_type"])
+                    request = ResponseRequiredRequest(
+                        interaction_type=data["interaction_type"],
+                        response_id=response_id,
+                        transcript=data["transcript"],
+                    )
+                    logger.info(
+                        "Received interaction_type=%s, response_id=%s, last_transcript=%s",
+                        data["interaction_type"],
+                        response_id,
+                        data["transcript"][-1]["content"],
+                    )
+                    # New response needed, abandon the previous one
+                    cancel_response()
+                    response_task = asyncio.create_task(handle_response(request, trace))
+                else:
+                    task = asyncio.create_task(handle_message(data))
+                    other_tasks.add(task)
+                    task.add_done_callback(other_tasks.discard)
+        finally:
+            cancel_response()
+            for task in other_tasks:
+                task.cancel()
+            if building is not None:
+                await buildings.release(building)
 
     except WebSocketDisconnect:
-        print(f"LLM WebSocket disconnected for {call_id}")
+        logger.info("LLM WebSocket disconnected for %s", call_id)
     except ConnectionTimeoutError as e:
-        print(f"Connection timeout error for {call_id}: {e}")
+        logger.error("Connection timeout error for %s: %s", call_id, e)
     except Exception as e:
-        print(f"Error in LLM WebSocket: {e} for call_id: {call_id}")
+        logger.error("Error in LLM WebSocket: %s for call_id: %s", e, call_id)
         await websocket.close(1011, "Server error")
     finally:
-        print(f"LLM WebSocket connection closed for {call_id}")
+        logger.info("LLM WebSocket connection closed for %s", call_id)
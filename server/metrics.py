@@ -0,0 +1,180 @@
+import bisect
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+# Upper bounds in seconds; the README promises a response in under 1 second
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2.5, 5, 10)
+
+
+class Counter:
+    """
+    Monotonic counter, safe to increment from any thread
+    """
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [f"{self.name} {self.value}"]
+
+
+class Histogram:
+    """
+    Distribution of observed values in fixed buckets, optionally split by
+    one label (e.g. the tool name)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str = "",
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        label: Optional[str] = None,
+    ):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series: Dict[Optional[str], Tuple[list, list]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label_value: Optional[str] = None):
+        with self._lock:
+            if label_value not in self._series:
+                # Per-bucket counts (the last one is +Inf), then [sum, count]
+                self._series[label_value] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            counts, totals = self._series[label_value]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def summary(self, label_value: Optional[str] = None):
+        """
+        Count, mean and approximate quantiles (bucket upper bounds)
+        """
+        with self._lock:
+            if label_value not in self._series:
+                return {"count": 0}
+            counts, (total, count) = self._series[label_value]
+            counts = list(counts)
+
+        def quantile(q):
+            seen = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                seen += bucket_count
+                if seen >= q * count:
+                    return bound
+
+        return {
+            "count": count,
+            "mean": total / count,
+            "p50": quantile(0.5),
+            "p95": quantile(0.95),
+            "p99": quantile(0.99),
+        }
+
+    def render(self):
+        lines = []
+        with self._lock:
+            series = [
+                (label_value, list(counts), list(totals))
+                for label_value, (counts, totals) in self._series.items()
+            ]
+        for label_value, counts, (total, count) in series:
+            labels = "" if label_value is None else f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                bucket_labels = f"{labels},{le}" if labels else le
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Named metrics of the server process
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, Counter] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        if name not in self.counters:
+            self.counters[name] = Counter(name, help)
+        return self.counters[name]
+
+    def histogram(self, name: str, help: str = "", **kwargs) -> Histogram:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, help, **kwargs)
+        return self.histograms[name]
+
+    def snapshot(self):
+        return {name: counter.value for name, counter in self.counters.items()}
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for kind, metrics in (
+            ("counter", self.counters),
+            ("histogram", self.histograms),
+        ):
+            for name, metric in metrics.items():
+                lines.append(f"# HELP {name} {metric.help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+RESPONSES_STARTED = REGISTRY.counter(
+    "responses_started_total", "Responses drafted for Retell"
+)
+RESPONSES_COMPLETED = REGISTRY.counter(
+    "responses_completed_total", "Responses streamed to the end"
+)
+RESPONSES_CANCELLED = REGISTRY.counter(
+    "responses_cancelled_total",
+    "Responses cancelled because a newer response_id arrived or the call ended",
+)
+
+# Turn stages, all measured from receipt of response_required and split by
+# the path that answered the turn ("llm", "fast" or "cache")
+PROMPT_SECONDS = REGISTRY.histogram(
+    "response_prompt_seconds", "Time until the prompt is built", label="path"
+)
+FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "response_first_token_seconds",
+    "Time until the first LLM token arrives",
+    label="path",
+)
+FIRST_SEND_SECONDS = REGISTRY.histogram(
+    "response_first_send_seconds",
+    "Time until the first content is sent to Retell",
+    label="path",
+)
+COMPLETE_SECONDS = REGISTRY.histogram(
+    "response_complete_seconds",
+    "Time until content_complete is sent to Retell",
+    label="path",
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "tool_call_seconds", "Time to run one tool call", label="tool"
+)
+DB_FLUSH_SECONDS = REGISTRY.histogram(
+    "db_flush_seconds", "Time to write pending building state to Supabase"
+)
@@ -0,0 +1,305 @@
+import asyncio
+import copy
+import json
+import os
+import random
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from building_graph import NO_ZONE, default_graph
+from clients import ClientPool
+
+# Mock LLM behaviour, read from the environment so a spawned server can be
+# configured by the load test
+TOKENS_PER_SECOND = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "200"))
+FIRST_TOKEN_DELAY = float(os.getenv("MOCK_LLM_FIRST_TOKEN_DELAY", "0.15"))
+TOOL_CALL_RATE = float(os.getenv("MOCK_LLM_TOOL_CALL_RATE", "0.3"))
+DB_LATENCY = float(os.getenv("MOCK_DB_LATENCY", "0.02"))
+MOCK_BUILDINGS = int(os.getenv("MOCK_BUILDINGS", "1"))
+BUILDING_ID_OFFSET = 1000  # Zone and door ids are global (see db/schema.sql)
+ARGUMENT_FRAGMENT_CHARS = 12  # Tool arguments stream in pieces this long
+
+REPLIES = [
+    "Stay calm and move away from the danger.",
+    "Please head to the nearest exit and avoid the elevators.",
+    "Help is on the way. Keep low and cover your mouth if there is smoke.",
+    "I have secured the area around you. Walk, do not run, to the exit.",
+]
+
+
+def seed_tables(buildings: int = MOCK_BUILDINGS) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Rows of every table (see db/schema.sql) for `buildings` copies of the
+    default building; building b's ids are offset by (b - 1) * 1000
+    """
+    graph = default_graph()
+    tables = {
+        "buildings": [],
+        "zones": [],
+        "doors": [],
+        "door_connections": [],
+        "devices": [],
+        "incidents": [],
+        "actions": [],
+    }
+    for building_id in range(1, buildings + 1):
+        offset = (building_id - 1) * BUILDING_ID_OFFSET
+        name = "EastField Mall" if building_id == 1 else f"Mock Mall {building_id}"
+        tables["buildings"].append(
+            {"id": building_id, "name": name, "description": None}
+        )
+        tables["zones"] += [
+            {
+                "id": zone_id + offset,
+                "building_id": building_id,
+                "name": graph.zone_names[zone],
+                "status": "ok",
+            }
+            for zone, zone_id in enumerate(graph.zone_ids)
+        ]
+        tables["door_connections"] += [
+            {
+                "door_id": door_id + offset,
+                "building_id": building_id,
+                "zone_id": graph.zone_ids[graph.door_a[door]] + offset,
+                "to_zone_id": (
+                    None
+                    if graph.door_b[door] == NO_ZONE
+                    else graph.zone_ids[graph.door_b[door]] + offset
+                ),
+            }
+            for door, door_id in enumerate(graph.door_ids)
+        ]
+        tables["doors"] += [
+            {"id": door_id + offset, "building_id": building_id, "open": True}
+            for door_id in graph.door_ids
+        ]
+    return tables
+
+
+class InMemoryQuery:
+    """
+    The subset of the supabase-py query builder the server uses:
+    select/update/insert with eq, neq, in_ and limit filters
+    """
+
+    def __init__(self, database: "InMemorySupabase", table: str):
+        self.database = database
+        self.table_name = table
+        self.columns: Optional[List[str]] = None
+        self.values: Optional[Dict[str, Any]] = None
+        self.rows: Optional[List[Dict[str, Any]]] = None
+        self.filters = []
+        self.count: Optional[int] = None
+
+    def select(self, columns: str = "*"):
+        if columns.strip() != "*":
+            self.columns = [column.strip() for column in columns.split(",")]
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self.values = values
+        return self
+
+    def insert(self, rows):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column: str, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def limit(self, count: int):
+        self.count = count
+        return self
+
+    async def execute(self):
+        await asyncio.sleep(self.database.latency)
+        self.database.queries += 1
+        if self.table_name not in self.database.tables:
+            raise KeyError(f"Table {self.table_name} does not exist")
+        table = self.database.tables[self.table_name]
+        if self.rows is not None:
+            table.extend(copy.deepcopy(self.rows))
+            return SimpleNamespace(data=copy.deepcopy(self.rows))
+        matched = [row for row in table if all(match(row) for match in self.filters)]
+        if self.values is not None:
+            for row in matched:
+                row.update(self.values)
+        if self.count is not None:
+            matched = matched[: self.count]
+        if self.columns is not None:
+            matched = [
+                {column: row.get(column) for column in self.columns} for row in matched
+            ]
+        return SimpleNamespace(data=copy.deepcopy(matched))
+
+
+class InMemorySupabase:
+    """
+    Stand-in for the async Supabase client, backed by Python lists
+    """
+
+    def __init__(self, tables=None, latency: float = DB_LATENCY):
+        self.tables = tables if tables is not None else seed_tables()
+        self.latency = latency  # Seconds added to every query
+        self.queries = 0
+
+    def table(self, name: str) -> InMemoryQuery:
+        return InMemoryQuery(self, name)
+
+
+class MockCompletionStream:
+    """
+    Async iterator of Cerebras-style chunks, paced like a real stream
+    """
+
+    def __init__(self, chunks, first_token_delay: float, tokens_per_second: float):
+        self.chunks = chunks
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await asyncio.sleep(self.first_token_delay)
+        for chunk in self.chunks:
+            if self.closed:
+                return
+            yield chunk
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+    async def close(self):
+        self.closed = True
+
+
+def _chunk(content=None, tool_calls=None):
+    return SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                delta=SimpleNamespace(content=content, tool_calls=tool_calls)
+            )
+        ]
+    )
+
+
+def _tool_call_delta(index, arguments, name=None, call_id=None):
+    return SimpleNamespace(
+        index=index,
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=arguments),
+    )
+
+
+class MockCompletions:
+    def __init__(self, llm: "MockLlm"):
+        self.llm = llm
+
+    async def create(self, messages, stream=False, **kwargs):
+        self.llm.requests += 1
+        return MockCompletionStream(
+            self.llm.script(messages),
+            self.llm.first_token_delay,
+            self.llm.tokens_per_second,
+        )
+
+
+class MockModels:
+    async def list(self):
+        return SimpleNamespace(data=[SimpleNamespace(id="llama-3.3-70b")])
+
+
+class MockLlm:
+    """
+    Stand-in for AsyncCerebras that streams a canned reply word by word,
+    or a tool call with its arguments in fragments, at a set token rate
+    """
+
+    def __init__(
+        self,
+        tokens_per_second: float = TOKENS_PER_SECOND,
+        first_token_delay: float = FIRST_TOKEN_DELAY,
+        tool_call_rate: float = TOOL_CALL_RATE,
+        seed: Optional[int] = None,
+    ):
+        self.tokens_per_second = tokens_per_second
+        self.first_token_delay = first_token_delay
+        self.tool_call_rate = tool_call_rate
+        self.random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=MockCompletions(self))
+        self.models = MockModels()
+        self.requests = 0
+
+    def script(self, messages) -> List[SimpleNamespace]:
+        reply = self.random.choice(REPLIES)
+        if self.random.random() >= self.tool_call_rate:
+            return [_chunk(content=word + " ") for word in reply.split()]
+
+        # Act on doors and zones the prompt describes, like the real model
+        prompt = messages[0]["content"] if messages else ""
+        door_ids = [
+            int(i)
+            for ids in re.findall(r"Door Ids?: (\d+(?:, \d+)*)", prompt)
+            for i in ids.split(", ")
+        ] or [1]
+        zone_ids = [int(i) for i in re.findall(r"Zone Id: (\d+)", prompt)] or [0]
+        name, arguments = self.random.choice(
+            [
+                ("close_door", {"door_id": self.random.choice(door_ids)}),
+                ("open_door", {"door_id": self.random.choice(door_ids)}),
+                (
+                    "mark_zone",
+                    {
+                        "zone_id": self.random.choice(zone_ids),
+                        "status": self.random.choice(["danger", "ok"]),
+                    },
+                ),
+            ]
+        )
+        text = json.dumps({**arguments, "output": reply})
+        fragments = [
+            text[i : i + ARGUMENT_FRAGMENT_CHARS]
+            for i in range(0, len(text), ARGUMENT_FRAGMENT_CHARS)
+        ]
+        return [
+            _chunk(
+                tool_calls=[
+                    _tool_call_delta(
+                        0,
+                        fragment,
+                        name=name if i == 0 else None,
+                        call_id="call_0" if i == 0 else None,
+                    )
+                ]
+            )
+            for i, fragment in enumerate(fragments)
+        ]
+
+    async def close(self):
+        pass
+
+
+class MockClientPool(ClientPool):
+    """
+    ClientPool backed by the in-memory Supabase and the mock LLM, for load
+    tests and local runs without accounts (MOCK_BACKENDS=1)
+    """
+
+    async def _connect_supabase(self):
+        if self.supabase is None:
+            self.supabase = InMemorySupabase()
+
+    async def _connect_cerebras(self):
+        self.cerebras = MockLlm()
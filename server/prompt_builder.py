@@ -0,0 +1,143 @@
+from typing import Dict, List, Optional
+
+from custom_types import ResponseRequiredRequest, Utterance
+
+CHARS_PER_TOKEN = 4  # Rough average for English text with the Llama tokenizer
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators around each message
+TRANSCRIPT_TOKEN_BUDGET = 3000  # Older turns are condensed beyond this
+WINDOW_TARGET = 0.75  # Fraction of the budget kept after condensing
+SUMMARY_TOKEN_BUDGET = 300
+SUMMARY_SNIPPET_CHARS = 160  # Longest caller utterance kept in the summary
+REMINDER_PROMPT = "(Now the user has not responded in a while, you would say:)"
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def to_message(utterance: Utterance) -> Dict[str, str]:
+    role = "assistant" if utterance.role == "agent" else "user"
+    return {"role": role, "content": utterance.content}
+
+
+class PromptBuilder:
+    """
+    Builds the chat prompt for each turn of one call.
+
+    The static prefix (system prompt and mall description) is built once;
+    the live building status is added after the transcript.
+    Transcript utterances are converted once and reused on later turns;
+    only the tail, which Retell may still be revising, is compared and
+    re-converted. When the transcript passes TRANSCRIPT_TOKEN_BUDGET, the
+    oldest turns are replaced by a short summary of what the caller said,
+    in steps, so the start of the prompt stays the same for many turns.
+    """
+
+    def __init__(self, prefix: List[Dict[str, str]]):
+        self.prefix = prefix
+        self.prefix_tokens = sum(self._tokens(m) for m in prefix)
+        self._utterances: List[tuple] = []  # (role, content) already converted
+        self._messages: List[Dict[str, str]] = []
+        self._tokens_per_message: List[int] = []
+        self._window_start = 0  # First message still sent verbatim
+        self._summary_lines: List[str] = []
+        self._summary: Optional[Dict[str, str]] = None
+        self.last_stats: Dict[str, int] = {}
+
+    @staticmethod
+    def _tokens(message: Dict[str, str]) -> int:
+        return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+    def _sync(self, transcript: List[Utterance]):
+        # Everything but the last converted utterance is assumed final
+        keep = min(len(transcript), max(0, len(self._utterances) - 1))
+        while keep > 0:
+            utterance = transcript[keep - 1]
+            if self._utterances[keep - 1] == (utterance.role, utterance.content):
+                break
+            keep -= 1
+        if keep < self._window_start:
+            # The transcript was rewritten before the window; start over
+            self._window_start = 0
+            self._summary_lines = []
+            self._summary = None
+            keep = 0
+        del self._utterances[keep:]
+        del self._messages[keep:]
+        del self._tokens_per_message[keep:]
+        for utterance in transcript[keep:]:
+            message = to_message(utterance)
+            self._utterances.append((utterance.role, utterance.content))
+            self._messages.append(message)
+            self._tokens_per_message.append(self._tokens(message))
+
+    def _condense(self):
+        window_tokens = sum(self._tokens_per_message[self._window_start :])
+        if window_tokens <= TRANSCRIPT_TOKEN_BUDGET:
+            return
+        # Drop whole turns until the window is back under the target, and
+        # never the latest message
+        target = TRANSCRIPT_TOKEN_BUDGET * WINDOW_TARGET
+        while window_tokens > target and self._window_start < len(self._messages) - 1:
+            message = self._messages[self._window_start]
+            if message["role"] == "user":
+                self._summary_lines.append(
+                    "- " + message["content"][:SUMMARY_SNIPPET_CHARS].strip()
+                )
+            window_tokens -= self._tokens_per_message[self._window_start]
+            self._window_start += 1
+
+        # Keep the caller's first statement (usually what the emergency is)
+        # and the most recent ones that fit the summary budget
+        first, rest = self._summary_lines[:1], self._summary_lines[1:]
+        lines, tokens = [], sum(estimate_tokens(line) for line in first)
+        for line in reversed(rest):
+            tokens += estimate_tokens(line)
+            if tokens > SUMMARY_TOKEN_BUDGET:
+                break
+            lines.append(line)
+        self._summary_lines = first + lines[::-1]
+        self._summary = {
+            "role": "system",
+            "content": f"Earlier in this call ({self._window_start} messages condensed), the caller said:\n"
+            + "\n".join(self._summary_lines),
+        }
+
+    def build(
+        self,
+        request: ResponseRequiredRequest,
+        context: Optional[Dict[str, str]] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Prompt for a turn; `context` (the live building status) goes after
+        the transcript, so the prefix and transcript stay the same when the
+        state changes
+        """
+        self._sync(request.transcript)
+        self._condense()
+
+        prompt = list(self.prefix)
+        if self._summary is not None:
+            prompt.append(self._summary)
+        prompt.extend(self._messages[self._window_start :])
+        if context is not None:
+            prompt.append(context)
+        if request.interaction_type == "reminder_required":
+            prompt.append({"role": "user", "content": REMINDER_PROMPT})
+
+        transcript_tokens = sum(self._tokens_per_message[self._window_start :])
+        summary_tokens = self._tokens(self._summary) if self._summary else 0
+        context_tokens = self._tokens(context) if context is not None else 0
+        self.last_stats = {
+            "prefix_tokens": self.prefix_tokens,
+            "summary_tokens": summary_tokens,
+            "transcript_tokens": transcript_tokens,
+            "context_tokens": context_tokens,
+            "total_tokens": self.prefix_tokens
+            + summary_tokens
+            + transcript_tokens
+            + context_tokens,
+            "messages": len(prompt),
+            "condensed_messages": self._window_start,
+        }
+        return prompt
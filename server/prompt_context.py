@@ -0,0 +1,135 @@
+from typing import Dict, List, Optional, Tuple
+
+from building_state import BuildingState
+from prompt_builder import estimate_tokens
+from routing import EvacuationRouter
+
+CONTEXT_TOKEN_BUDGET = 200  # Lower-priority lines are dropped beyond this
+MAX_EXITS = 2  # Open exits listed for the caller, nearest first
+MAX_LISTED = 8  # Danger zones or closed doors named before "and N more"
+
+# Line priorities, most important first
+CALLER, ROUTE, DANGER, NEIGHBOUR, CLOSED = range(5)
+
+
+class PromptContext:
+    """
+    Live state of a building, as the system message closing each prompt.
+
+    Only the part that matters to the caller is described: a zone, the
+    zones and doors around it, its nearest open exits (from the router, so
+    never through a closed door or a danger zone), and the danger zones
+    and closed doors of the whole building. The zone is stated as the
+    caller's location only when it is `known` (from the call metadata);
+    otherwise it is the last place the caller mentioned, which may be the
+    danger they are reporting rather than where they are. Lines are kept
+    in priority order until CONTEXT_TOKEN_BUDGET is reached. Messages are
+    built once per zone and reused until the state changes.
+    """
+
+    def __init__(self, state: BuildingState, router: EvacuationRouter):
+        self.state = state
+        self.router = router
+        self._key = None  # (state version, graph) the messages describe
+        self._messages: Dict[Tuple[Optional[int], bool], Dict[str, str]] = {}
+
+    def message(self, zone_id: Optional[int], known: bool = False) -> Dict[str, str]:
+        key = (self.state.version, self.router.graph)
+        if key != self._key:
+            self._key = key
+            self._messages = {}
+        if (zone_id, known) not in self._messages:
+            self._messages[(zone_id, known)] = {
+                "role": "system",
+                "content": self.render(zone_id, known),
+            }
+        return self._messages[(zone_id, known)]
+
+    def render(self, zone_id: Optional[int], known: bool = False) -> str:
+        lines = self._lines(zone_id, known)
+        kept, tokens = set(), 0
+        for index, (_, text) in sorted(enumerate(lines), key=lambda x: x[1][0]):
+            tokens += estimate_tokens(text)
+            if tokens > CONTEXT_TOKEN_BUDGET:
+                break
+            kept.add(index)
+        return "\n".join(text for index, (_, text) in enumerate(lines) if index in kept)
+
+    def _lines(self, zone_id: Optional[int], known: bool) -> List[Tuple[int, str]]:
+        graph = self.router.graph
+        doors, zones = self.state.doors, self.state.zones
+
+        def zone(z, status=True):
+            danger = " (danger)" if status and zones.get(z) == "danger" else ""
+            return f"{graph.zone_name(z)} (Zone Id: {z}){danger}"
+
+        def door(d):
+            return "open" if doors.get(d, True) else "closed"
+
+        lines = [(CALLER, "Current building status:")]
+        if zone_id is None or zone_id not in graph.zone_index:
+            lines.append(
+                (CALLER, "The caller's location is unknown; ask where they are.")
+            )
+        else:
+            if known:
+                lines.append((CALLER, f"The caller is in {zone(zone_id)}."))
+            else:
+                lines.append(
+                    (
+                        CALLER,
+                        f"Last place the caller mentioned: {zone(zone_id)}. Their"
+                        " own location is not confirmed; ask before directing them"
+                        " from there.",
+                    )
+                )
+            for neighbour, door_id in graph.neighbours(zone_id):
+                lines.append(
+                    (
+                        NEIGHBOUR,
+                        f"- Door Id: {door_id} ({door(door_id)}) to {zone(neighbour)}",
+                    )
+                )
+            for door_id in graph.exits_of_zone(zone_id):
+                lines.append(
+                    (
+                        NEIGHBOUR,
+                        f"- Exit Door Id: {door_id} ({door(door_id)}) to outside",
+                    )
+                )
+            lines += self._exit_lines(zone_id, known)
+
+        danger = [z for z in graph.zone_ids if zones.get(z) == "danger"]
+        lines.append(
+            (DANGER, "Danger zones: " + _listing([zone(z, False) for z in danger]))
+        )
+        closed = [d for d in graph.door_ids if not doors.get(d, True)]
+        lines.append((CLOSED, "Closed doors: " + _listing([str(d) for d in closed])))
+        return lines
+
+    def _exit_lines(self, zone_id: int, known: bool) -> List[Tuple[int, str]]:
+        graph = self.router.graph
+        here = "here" if known else "there"
+        routes = self.router.nearest_exits(zone_id, MAX_EXITS)
+        if not routes:
+            return [(ROUTE, f"No safe route to an open exit from {here}.")]
+
+        lines = []
+        for rank, route in enumerate(routes):
+            steps = [
+                f"Door Id: {door_id} to {graph.zone_name(next_zone)}"
+                for door_id, next_zone in zip(route["doors"], route["zones"][1:])
+            ]
+            steps.append(f"Exit Door Id: {route['exit_door']}")
+            label = "Nearest open exit" if rank == 0 else "Next nearest open exit"
+            lines.append((ROUTE, f"{label} from {here}: " + ", then ".join(steps)))
+        return lines
+
+
+def _listing(items: List[str]) -> str:
+    if not items:
+        return "none"
+    if len(items) > MAX_LISTED:
+        more = len(items) - MAX_LISTED
+        return ", ".join(items[:MAX_LISTED]) + f" and {more} more"
+    return ", ".join(items)
@@ -20,56 +20,14 @@ Your job:
 Always consider their location, danger proximity, and past instructions before responding. You are their trusted voice in the chaos.
 """
 
-persistent_user_prompt = """
-Description of the mall:
-Name: EastField Mall
-
-Store and corridors are considered zones:
-Outside is considered zone (Zone Id: 10) (But this zone should never be modified.)
-Doors are considered doors:
-
-Layout:
-Seven stores, two corridors, six exits.
-One corridor (Zone Id: 8) is a cross shape in the top right. One corridor (Zone Id: 7) is a L shape in the bottom left, connecting the left side of the mall to the bottom of the mall.
-
-Store Layout:
-North West: Banana Store (Zone Id: 0)]
-    - Door (Door Id: 0) south to corridor (Zone Id: 8)
-North Middle: LuLuLime (Zone Id: 1)
-    - Door (Door Id: 1) south to corridor (Zone Id: 8)
-North East: Victoria (Zone Id: 2)
-    - Door (Door Id: 2) south to corridor (Zone Id: 8)
-South West: Orange Republic (Zone Id: 6)
-    - Door (Door Id: 4) north to corridor (Zone Id: 8)
-    - Door (Door Id: 5) south to corridor (Zone Id: 7)
-    - Door (Door Id: 6) south to Hand Locker (Zone Id: 5)
-South West: Study Start (Zone Id: 4)
-    - Door (Door Id: 7) north to corridor (Zone Id: 7)
-South Middle: Hand Locker (Zone Id: 5)
-    - Door (Door Id: 6) north to Orange Republic (Zone Id: 6)
-    - Door (Door Id: 8) west to corridor (Zone Id: 7)
-    - Door (Door Id: 9) east to corridor (Zone Id: 8)
-South East: Pay More (Zone Id: 3)
-    - Door (Door Id: 3) north to corridor (Zone Id: 8)
-
-Exit Layout:
-- West Exit North (Door Id: 11) leads to corridor (Zone Id: 8)
-- West Exit South (Door Id: 12) leads to corridor (Zone Id: 7)
-- East Exit (Door Id: 15) leads to corridor (Zone Id: 8)
-- South Exit West (Door Id: 13) leads to corridor (Zone Id: 7)
-- South Exit East (Door Id: 14) leads to corridor (Zone Id: 8)
-- North Exit (Door Id: 16) leads to corridor (Zone Id: 8)
-
-Zone Mapping:
-- Zone Id: 0 is the Banana Store
-- Zone Id: 1 is the LuLuLime
-- Zone Id: 2 is the Victoria
-- Zone Id: 3 is the Pay More
-- Zone Id: 4 is the Study Start
-- Zone Id: 5 is the Hand Locker
-- Zone Id: 6 is the Orange Republic
-- Zone Id: 7 is the corridor connecting the bottom left and bottom middle of the mall (south corridor)
-- Zone Id: 8 is the corridor connecting the top left, top right, and bottom right of the mall (north corridor)
+# Overview of the default building; its zones and doors are listed from the
+# building graph (see buildings.describe_building)
+default_building_description = """Seven stores, two corridors, six exits.
+The north corridor (Zone Id: 8) is a cross shape in the top right. The south corridor (Zone Id: 7) is an L shape in the bottom left, connecting the left side of the mall to the bottom of the mall.
+Exits: West Exit North (Door Id: 11), East Exit (Door Id: 15), South Exit East (Door Id: 14) and North Exit (Door Id: 16) lead to the north corridor; West Exit South (Door Id: 12) and South Exit West (Door Id: 13) lead to the south corridor."""
+
+building_instructions = """
+The current status of the building (danger areas, closed doors, and the nearest open exits from the caller's location or from the last place they mentioned) is given at the end of the conversation.
 
 Instructions:
 If the user claims an area is dangerous, mark is as a danger zone. (For example, a fire is in the Banana Store, mark the Banana Store as a danger zone.)
@@ -0,0 +1,120 @@
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from building_state import BuildingState
+from intent_matcher import MAX_COMMAND_WORDS, normalize
+from metrics import REGISTRY
+
+CACHE_TTL = 30.0  # Seconds an answer is reused, even if nothing changes
+MAX_ENTRIES = 256
+
+CACHE_HITS = REGISTRY.counter(
+    "response_cache_hits_total", "Turns answered from the response cache"
+)
+CACHE_MISSES = REGISTRY.counter(
+    "response_cache_misses_total", "Cacheable questions that went to the LLM"
+)
+CACHE_INVALIDATIONS = REGISTRY.counter(
+    "response_cache_invalidations_total",
+    "Times cached answers were dropped because the building state changed",
+)
+
+# Questions many callers ask in the same words, whose answer depends only on
+# where the caller is and on the state of the building. All of them depend
+# on the caller's location, so they are cached only for calls that give it
+QUESTIONS = [
+    (
+        re.compile(
+            r"\b(?:how (?:do|can|should) (?:i|we) (?:get|go) out|way out|get me out"
+            r"|(?:where|which way) is (?:the )?(?:nearest |closest )?exit"
+            r"|where(?:'s| is) (?:the )?(?:nearest |closest )?(?:exit|way out)"
+            r"|(?:nearest|closest) exit|how (?:do|can) (?:i|we) (?:leave|escape))\b"
+        ),
+        "exit",
+    ),
+    (
+        re.compile(r"\b(?:am i safe|are we safe|is it safe|is (?:it|this) over)\b"),
+        "safety",
+    ),
+    (
+        re.compile(r"\b(?:what (?:do|should) (?:i|we) do|what now)\b"),
+        "next_step",
+    ),
+]
+
+Key = Tuple[str, int, int]
+
+
+def question_intent(text: str) -> Optional[str]:
+    """
+    Normalized intent of a common question, or None for anything else
+    """
+    text = normalize(text)
+    if not text or len(text.split()) > MAX_COMMAND_WORDS:
+        return None
+    for pattern, intent in QUESTIONS:
+        if pattern.search(text):
+            return intent
+    return None
+
+
+def answer_chunks(text: str) -> List[str]:
+    """
+    A cached answer split into sentences, to be streamed like LLM output
+    """
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    return [sentences[0]] + [" " + sentence for sentence in sentences[1:]]
+
+
+class ResponseCache:
+    """
+    LLM answers to common questions in one building, reused across calls.
+
+    Keys are (question intent, caller zone, state version), where the zone
+    is the caller's location from the call metadata. Any door or zone
+    change bumps the version and clears the cache, so an answer is only
+    reused while the building is exactly as it was when the answer was
+    generated. Entries also expire after `ttl` seconds, and beyond
+    `max_entries` the least recently used are dropped.
+    """
+
+    def __init__(
+        self, state: BuildingState, ttl: float = CACHE_TTL, max_entries=MAX_ENTRIES
+    ):
+        self.state = state
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Key, Tuple[float, str]]" = OrderedDict()
+        state.add_listener(self.invalidate)
+
+    def key(self, intent: str, zone_id: int) -> Key:
+        return (intent, zone_id, self.state.version)
+
+    def get(self, key: Key) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, text = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return text
+
+    def put(self, key: Key, text: str):
+        if key[2] != self.state.version:
+            return  # The state changed while the answer was generated
+        self._entries[key] = (time.monotonic(), text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, change=None):
+        if self._entries:
+            self._entries.clear()
+            CACHE_INVALIDATIONS.inc()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,303 @@
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+from building_graph import NO_ZONE, BuildingGraph, default_graph
+
+UNREACHED = -1
+
+
+class RouteTree:
+    """
+    Breadth-first tree over a BuildingGraph, rooted at one or more exit doors.
+
+    Per zone it keeps, in arrays, the hop count to the exit, the next zone
+    and the door to take (parent pointers). Closed doors are never used.
+    Danger zones get a route of their own (someone standing in one must
+    still be able to leave) but are never passed through.
+    """
+
+    def __init__(self, graph: BuildingGraph, roots: List[int]):
+        self.graph = graph
+        self.roots = array("l", roots)  # Exit door indexes
+        self.dist = array("l")
+        self.next_zone = array("l")
+        self.via_door = array("l")
+        self.interior = bytearray()  # Zones some other zone is routed through
+        self.used_doors = bytearray()
+
+    def build(self, blocked_doors: bytearray, danger_zones: bytearray):
+        g = self.graph
+        self.dist = array("l", [UNREACHED]) * g.zone_count
+        self.next_zone = array("l", [UNREACHED]) * g.zone_count
+        self.via_door = array("l", [UNREACHED]) * g.zone_count
+        self.interior = bytearray(g.zone_count)
+        self.used_doors = bytearray(g.door_count)
+        dist, next_zone, via_door = self.dist, self.next_zone, self.via_door
+
+        queue = deque()
+        for door in self.roots:
+            zone = g.door_a[door]
+            if not blocked_doors[door] and dist[zone] == UNREACHED:
+                dist[zone] = 0
+                via_door[zone] = door
+                self.used_doors[door] = 1
+                queue.append(zone)
+        while queue:
+            zone = queue.popleft()
+            if danger_zones[zone]:
+                continue
+            for k in range(g.adj_offsets[zone], g.adj_offsets[zone + 1]):
+                neighbour, door = g.adj_zones[k], g.adj_doors[k]
+                if dist[neighbour] != UNREACHED or blocked_doors[door]:
+                    continue
+                dist[neighbour] = dist[zone] + 1
+                next_zone[neighbour] = zone
+                via_door[neighbour] = door
+                self.interior[zone] = 1
+                self.used_doors[door] = 1
+                queue.append(neighbour)
+
+    # --- Invalidation ---
+    def affected_by_door(self, door: int, open: bool, danger_zones) -> bool:
+        """
+        True if opening or closing `door` changes any route in this tree
+        """
+        if not open:
+            return bool(self.used_doors[door])
+        g, dist = self.graph, self.dist
+        a, b = g.door_a[door], g.door_b[door]
+        if b == NO_ZONE:
+            return door in self.roots and dist[a] != 0
+
+        def improves(src, dst):
+            return (
+                dist[src] != UNREACHED
+                and not danger_zones[src]
+                and (dist[dst] == UNREACHED or dist[dst] > dist[src] + 1)
+            )
+
+        return improves(a, b) or improves(b, a)
+
+    def affected_by_zone(self, zone: int, danger: bool, blocked_doors) -> bool:
+        """
+        True if marking `zone` danger (or clearing it) changes any route
+        """
+        if danger:
+            return bool(self.interior[zone])
+        g, dist = self.graph, self.dist
+        if dist[zone] == UNREACHED:
+            return False
+        for k in range(g.adj_offsets[zone], g.adj_offsets[zone + 1]):
+            neighbour = g.adj_zones[k]
+            if not blocked_doors[g.adj_doors[k]] and (
+                dist[neighbour] == UNREACHED or dist[neighbour] > dist[zone] + 1
+            ):
+                return True
+        return False
+
+
+class EvacuationRouter:
+    """
+    Evacuation routes over a BuildingGraph, kept current with live state.
+
+    One multi-source tree rooted at every exit gives each zone its nearest
+    open exit; trees for a single exit are built on first use. When a door
+    closes or a zone is marked danger, only trees that route through it are
+    rebuilt; when a door opens or a zone is cleared, only trees it can
+    improve are. The graph can be swapped at runtime with reload().
+    """
+
+    def __init__(self, graph: Optional[BuildingGraph] = None):
+        # Counters
+        self.tree_builds = 0
+        self.changes = 0
+        self.reloads = 0
+
+        self._install(graph or default_graph(), set(), set())
+
+    def _install(self, graph: BuildingGraph, closed_doors, danger_zones):
+        self.graph = graph
+        self.blocked_doors = bytearray(graph.door_count)
+        self.danger_zones = bytearray(graph.zone_count)
+        for door_id in closed_doors:
+            if door_id in graph.door_index:
+                self.blocked_doors[graph.door_index[door_id]] = 1
+        for zone_id in danger_zones:
+            if zone_id in graph.zone_index:
+                self.danger_zones[graph.zone_index[zone_id]] = 1
+        self.nearest = RouteTree(graph, list(graph.exits))
+        self.exit_trees: Dict[int, RouteTree] = {}  # exit door index -> tree
+        self._routes = {}  # (tree id, zone index) -> route
+        self.nearest.build(self.blocked_doors, self.danger_zones)
+        self.tree_builds += 1
+
+    @classmethod
+    def from_state(cls, state, graph: Optional[BuildingGraph] = None):
+        """
+        Router that starts from a BuildingState and follows its changes
+        """
+        router = cls(graph)
+        router.apply(state.snapshot())
+        state.add_listener(router.apply)
+        return router
+
+    def reload(self, graph: BuildingGraph):
+        """
+        Switches to a new graph, keeping the current door and zone state
+        """
+        g = self.graph
+        closed = {g.door_ids[d] for d in range(g.door_count) if self.blocked_doors[d]}
+        danger = {g.zone_ids[z] for z in range(g.zone_count) if self.danger_zones[z]}
+        self._install(graph, closed, danger)
+        self.reloads += 1
+
+    # --- Lookups ---
+    def route(self, zone_id: int, exit_door: Optional[int] = None):
+        """
+        Safe route from a zone to its nearest open exit (or to `exit_door`).
+
+        Returns:
+            dict with "zones" and "doors" from the caller to the exit, or None
+            if the zone is unknown or cut off.
+        """
+        g = self.graph
+        zone = g.zone_index.get(zone_id)
+        if zone is None:
+            return None
+        if exit_door is None:
+            tree = self.nearest
+        else:
+            door = g.door_index.get(exit_door)
+            if door is None or g.door_b[door] != NO_ZONE:
+                return None
+            tree = self.exit_trees.get(door)
+            if tree is None:
+                tree = self.exit_trees[door] = RouteTree(g, [door])
+                tree.build(self.blocked_doors, self.danger_zones)
+                self.tree_builds += 1
+
+        # Routes are walked once and cached until their tree is rebuilt
+        key = (id(tree), zone)
+        if key not in self._routes:
+            self._routes[key] = self._walk(tree, zone)
+        return self._routes[key]
+
+    def _walk(self, tree: RouteTree, zone: int):
+        if tree.dist[zone] == UNREACHED:
+            return None
+        g = self.graph
+        zones, doors = [], []
+        while zone != UNREACHED:
+            zones.append(g.zone_ids[zone])
+            doors.append(g.door_ids[tree.via_door[zone]])
+            zone = tree.next_zone[zone]
+        return {
+            "zone": zones[0],
+            "exit_door": doors[-1],
+            "zones": tuple(zones),
+            "doors": tuple(doors),
+        }
+
+    def next_hop(self, zone_id: int):
+        """
+        (door id, next zone id) to take first; next zone is None at the exit
+        """
+        g = self.graph
+        zone = g.zone_index.get(zone_id)
+        if zone is None or self.nearest.dist[zone] == UNREACHED:
+            return None
+        next_zone = self.nearest.next_zone[zone]
+        return g.door_ids[self.nearest.via_door[zone]], (
+            None if next_zone == UNREACHED else g.zone_ids[next_zone]
+        )
+
+    def nearest_exits(self, zone_id: int, count: int = 2):
+        """
+        Safe routes from a zone to its `count` nearest open exits, nearest
+        first, in the format of route(). One breadth-first search from the
+        zone; not cached.
+        """
+        g = self.graph
+        start = g.zone_index.get(zone_id)
+        if start is None:
+            return []
+        # zone -> (previous zone, door from it)
+        came_from = {start: (UNREACHED, UNREACHED)}
+        routes = []
+        queue = deque([start])
+        while queue and len(routes) < count:
+            zone = queue.popleft()
+            for k in range(g.exit_offsets[zone], g.exit_offsets[zone + 1]):
+                door = g.zone_exits[k]
+                if not self.blocked_doors[door] and len(routes) < count:
+                    routes.append(self._path(came_from, zone, door))
+            for k in range(g.adj_offsets[zone], g.adj_offsets[zone + 1]):
+                neighbour, door = g.adj_zones[k], g.adj_doors[k]
+                if (
+                    neighbour in came_from
+                    or self.blocked_doors[door]
+                    or self.danger_zones[neighbour]
+                ):
+                    continue
+                came_from[neighbour] = (zone, door)
+                queue.append(neighbour)
+        return routes
+
+    def _path(self, came_from, zone: int, exit_door: int):
+        g = self.graph
+        zones, doors = [], [g.door_ids[exit_door]]
+        while zone != UNREACHED:
+            zones.append(g.zone_ids[zone])
+            zone, door = came_from[zone]
+            if door != UNREACHED:
+                doors.append(g.door_ids[door])
+        zones.reverse()
+        doors.reverse()
+        return {
+            "zone": zones[0],
+            "exit_door": doors[-1],
+            "zones": tuple(zones),
+            "doors": tuple(doors),
+        }
+
+    def all_routes(self):
+        return {zone_id: self.route(zone_id) for zone_id in self.graph.zone_ids}
+
+    # --- Live state ---
+    def apply(self, change):
+        """
+        Applies a state change {"doors": {id: open}, "zones": {id: status}}
+        """
+        g = self.graph
+        doors, zones = [], []
+        for door_id, open in change.get("doors", {}).items():
+            door = g.door_index.get(door_id)
+            if door is not None and self.blocked_doors[door] == open:
+                self.blocked_doors[door] = not open
+                doors.append((door, open))
+        for zone_id, status in change.get("zones", {}).items():
+            zone = g.zone_index.get(zone_id)
+            danger = status == "danger"
+            if zone is not None and self.danger_zones[zone] != danger:
+                self.danger_zones[zone] = danger
+                zones.append((zone, danger))
+        if not doors and not zones:
+            return
+
+        self.changes += 1
+        for tree in [self.nearest, *self.exit_trees.values()]:
+            if any(
+                tree.affected_by_door(door, open, self.danger_zones)
+                for door, open in doors
+            ) or any(
+                tree.affected_by_zone(zone, danger, self.blocked_doors)
+                for zone, danger in zones
+            ):
+                tree.build(self.blocked_doors, self.danger_zones)
+                self.tree_builds += 1
+                self._routes = {
+                    key: route
+                    for key, route in self._routes.items()
+                    if key[0] != id(tree)
+                }
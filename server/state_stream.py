@@ -0,0 +1,118 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+from building_state import BuildingState
+from metrics import REGISTRY
+
+KEEPALIVE_SECONDS = 15.0  # Idle streams send a keepalive this often
+
+STREAM_CONNECTIONS = REGISTRY.counter(
+    "state_stream_connections_total", "Dashboards that opened a state stream"
+)
+STREAM_RESYNCS = REGISTRY.counter(
+    "state_stream_resyncs_total",
+    "Snapshots sent because a stream could not be resumed or fell behind",
+)
+
+
+def snapshot_message(state: BuildingState) -> Dict[str, Any]:
+    snapshot = state.snapshot()
+    return {
+        "type": "snapshot",
+        "epoch": snapshot["epoch"],
+        "seq": snapshot["version"],
+        "doors": snapshot["doors"],
+        "zones": snapshot["zones"],
+    }
+
+
+def delta_message(change: Dict[str, Any], epoch: str) -> Dict[str, Any]:
+    message = {"type": "delta", "epoch": epoch, "seq": change["version"]}
+    for key in ("doors", "zones"):
+        if key in change:
+            message[key] = change[key]
+    return message
+
+
+def event_id(message: Dict[str, Any]) -> str:
+    return f"{message['epoch']}:{message['seq']}"
+
+
+def resume_seq(state: BuildingState, since: Optional[str]) -> Optional[int]:
+    """
+    The seq to resume from for an "<epoch>:<seq>" event id, or None if it is
+    malformed or from another epoch (the state was rebuilt since, so its
+    seqs mean nothing now)
+    """
+    epoch, _, seq = (since or "").partition(":")
+    if epoch != state.epoch or not seq.isdigit():
+        return None
+    return int(seq)
+
+
+async def state_messages(
+    state: BuildingState, since: Optional[str] = None
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Building state for one watcher: a snapshot, then one delta per change.
+
+    Each message carries `epoch` and `seq`, the state version it brings the
+    watcher to; deltas follow each other without gaps. A watcher that
+    reconnects with `since` (the "<epoch>:<seq>" of the last message it
+    saw) gets only the changes it missed, or a new snapshot if they are no
+    longer in the state's history or the epoch changed (the building was
+    reloaded, e.g. after a restart or eviction, which also resets it). A
+    watcher that falls so far behind that its queue overflows also gets a
+    new snapshot. Yields None when idle for KEEPALIVE_SECONDS.
+    """
+    STREAM_CONNECTIONS.inc()
+    # Subscribe first, so no change between the snapshot and the queue is lost
+    queue = state.subscribe()
+    try:
+        seq = resume_seq(state, since)
+        backlog = None if seq is None else state.changes_since(seq)
+        if backlog is None:
+            if since is not None:
+                STREAM_RESYNCS.inc()
+            message = snapshot_message(state)
+            seq = message["seq"]
+            yield message
+        else:
+            for change in backlog:
+                seq = change["version"]
+                yield delta_message(change, state.epoch)
+
+        while True:
+            try:
+                change = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if change.get("resync"):
+                # The queue overflowed and dropped changes
+                STREAM_RESYNCS.inc()
+                message = snapshot_message(state)
+                seq = message["seq"]
+                yield message
+                continue
+            if change["version"] <= seq:
+                continue  # Already covered by the snapshot or backlog
+            seq = change["version"]
+            yield delta_message(change, state.epoch)
+    finally:
+        state.unsubscribe(queue)
+
+
+async def sse_events(state: BuildingState, since: Optional[int] = None):
+    """
+    state_messages() as Server-Sent Events; the event id is
+    "<epoch>:<seq>", so a browser EventSource resumes through Last-Event-ID
+    on its own
+    """
+    async for message in state_messages(state, since):
+        if message is None:
+            yield ": keepalive\n\n"
+        else:
+            data = json.dumps(message, separators=(",", ":"))
+            yield f"id: {event_id(message)}\nevent: {message['type']}\ndata: {data}\n\n"
@@ -0,0 +1,302 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_WHITESPACE = " \t\r\n"
+
+
+class StreamingJsonObject:
+    """
+    Incremental parser for one JSON object whose text arrives in pieces.
+
+    Top-level fields land in `fields` as soon as their value is complete.
+    String values are also decoded while they stream, into `strings`, so a
+    long field can be used before its closing quote arrives. Nested values
+    are collected raw and parsed once they close.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.strings: Dict[str, str] = {}
+        self.complete = False
+        self.error: Optional[str] = None
+        self._state = "start"
+        self._key = None
+        self._buffer = []  # Key text, or the raw text of a literal/nested value
+        self._escape = False
+        self._unicode = None  # Hex digits of a \\u escape in progress
+        self._high_surrogate = None
+        self._depth = 0
+        self._nested_in_string = False
+
+    def feed(self, text: str):
+        for char in text:
+            if self.complete or self.error:
+                return
+            self._step(char)
+
+    def _fail(self, char):
+        self.error = f"Unexpected {char!r} in state {self._state}"
+
+    def _step(self, char):
+        state = self._state
+        if state == "start":
+            if char == "{":
+                self._state = "key_or_end"
+            elif char not in _WHITESPACE:
+                self._fail(char)
+        elif state in ("key_or_end", "key"):
+            if char == '"':
+                self._state = "key_string"
+                self._buffer = []
+            elif char == "}" and state == "key_or_end":
+                self.complete = True
+            elif char not in _WHITESPACE:
+                self._fail(char)
+        elif state == "key_string":
+            if self._escape:
+                self._buffer.append("\\" + char)
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._key = json.loads('"' + "".join(self._buffer) + '"')
+                self._state = "colon"
+            else:
+                self._buffer.append(char)
+        elif state == "colon":
+            if char == ":":
+                self._state = "value"
+            elif char not in _WHITESPACE:
+                self._fail(char)
+        elif state == "value":
+            if char == '"':
+                self._state = "string"
+                self.strings[self._key] = ""
+            elif char in "{[":
+                self._state = "nested"
+                self._buffer = [char]
+                self._depth = 1
+            elif char not in _WHITESPACE:
+                self._state = "literal"
+                self._buffer = [char]
+        elif state == "string":
+            self._string_char(char)
+        elif state == "literal":
+            if char in ",}" or char in _WHITESPACE:
+                if self._set_raw_field(char):
+                    self._after_value(char)
+            else:
+                self._buffer.append(char)
+        elif state == "nested":
+            self._nested_char(char)
+        elif state == "after_value":
+            self._after_value(char)
+
+    def _string_char(self, char):
+        key = self._key
+        if self._unicode is not None:
+            self._unicode += char
+            if len(self._unicode) == 4:
+                code = int(self._unicode, 16)
+                self._unicode = None
+                if 0xD800 <= code < 0xDC00:
+                    self._high_surrogate = code
+                    return
+                if self._high_surrogate is not None and 0xDC00 <= code < 0xE000:
+                    code = (
+                        0x10000
+                        + ((self._high_surrogate - 0xD800) << 10)
+                        + (code - 0xDC00)
+                    )
+                    self._high_surrogate = None
+                self.strings[key] += chr(code)
+        elif self._escape:
+            self._escape = False
+            if char == "u":
+                self._unicode = ""
+            else:
+                self.strings[key] += _ESCAPES.get(char, char)
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._set_field(self.strings[key])
+            self._state = "after_value"
+        else:
+            self.strings[key] += char
+
+    def _nested_char(self, char):
+        self._buffer.append(char)
+        if self._nested_in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._nested_in_string = False
+        elif char == '"':
+            self._nested_in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0 and self._set_raw_field(char):
+                self._state = "after_value"
+
+    def _set_field(self, value):
+        self.fields[self._key] = value
+
+    def _set_raw_field(self, char) -> bool:
+        try:
+            self._set_field(json.loads("".join(self._buffer)))
+        except ValueError:
+            self._fail(char)
+            return False
+        return True
+
+    def _after_value(self, char):
+        if char == ",":
+            self._state = "key"
+        elif char == "}":
+            self.complete = True
+        elif char in _WHITESPACE:
+            self._state = "after_value"
+        else:
+            self._fail(char)
+
+
+class ToolCallEvent:
+    """
+    Something a streamed tool call is ready for: new `text` of its spoken
+    field to say, and/or `dispatch` of its action with `arguments`.
+    """
+
+    def __init__(self, index, name, text="", arguments=None, first_text=False):
+        self.index = index
+        self.name = name
+        self.text = text
+        self.first_text = first_text
+        self.arguments = arguments
+
+    @property
+    def dispatch(self) -> bool:
+        return self.arguments is not None
+
+
+class _PendingCall:
+    def __init__(self):
+        self.id = None
+        self.name = ""
+        self.arguments = ""
+        self.parser = StreamingJsonObject()
+        self.spoken = 0  # Characters of the spoken field already emitted
+        self.dispatched = False
+
+
+class ToolCallAccumulator:
+    """
+    Assembles streamed tool calls from argument fragments, keyed by index.
+
+    `required` maps each tool name to the argument names its action needs.
+    As fragments arrive, the `speak_field` string (the message for the
+    caller) is emitted piece by piece, and the action is dispatched as soon
+    as its required arguments are complete, before the rest of the object
+    has arrived.
+    """
+
+    def __init__(self, required: Dict[str, List[str]], speak_field: str = "output"):
+        self.required = required
+        self.speak_field = speak_field
+        self.calls: Dict[int, _PendingCall] = {}
+
+    def feed(self, tool_call_deltas) -> List[ToolCallEvent]:
+        for delta in tool_call_deltas:
+            index = getattr(delta, "index", None)
+            if index is None:
+                index = len(self.calls)
+            call = self.calls.setdefault(index, _PendingCall())
+            if getattr(delta, "id", None):
+                call.id = delta.id
+            function = delta.function
+            if function is not None:
+                name = function.name
+                if name and not call.name.startswith(name):
+                    # Names usually stream in fragments, but some providers
+                    # repeat the whole name (or the name so far) in each delta
+                    call.name = name if name.startswith(call.name) else call.name + name
+                if function.arguments:
+                    call.arguments += function.arguments
+                    call.parser.feed(function.arguments)
+        return self._events()
+
+    def finish(self) -> List[ToolCallEvent]:
+        """
+        Flushes calls whose arguments only parse as a whole, at end of stream
+        """
+        for index, call in self.calls.items():
+            if call.parser.error or not call.parser.complete:
+                try:
+                    arguments = json.loads(call.arguments)
+                except json.JSONDecodeError as e:
+                    logger.warning(
+                        "Could not parse arguments of tool call %s: %s", call.name, e
+                    )
+                    continue
+                call.parser = StreamingJsonObject()
+                call.parser.fields = arguments
+                call.parser.strings = {
+                    k: v for k, v in arguments.items() if isinstance(v, str)
+                }
+                call.parser.complete = True
+        return self._events(final=True)
+
+    def _events(self, final=False) -> List[ToolCallEvent]:
+        events = []
+        # Spoken text goes out one call at a time, in index order, so the
+        # messages of parallel calls are never interleaved
+        speaking = True
+        for index in sorted(self.calls):
+            call = self.calls[index]
+            parser = call.parser
+            text, first_text = "", False
+            if speaking:
+                spoken = parser.strings.get(self.speak_field, "")
+                text = spoken[call.spoken :]
+                first_text = call.spoken == 0 and bool(text)
+                call.spoken = len(spoken)
+                if not (final or parser.complete or self.speak_field in parser.fields):
+                    speaking = False
+
+            arguments = None
+            if not call.dispatched and call.name:
+                needed = self.required.get(call.name, ())
+                if (final and parser.complete) or (
+                    (needed or parser.complete)
+                    and all(field in parser.fields for field in needed)
+                ):
+                    arguments = dict(parser.fields)
+                    call.dispatched = True
+
+            if text or arguments is not None:
+                events.append(
+                    ToolCallEvent(
+                        index,
+                        call.name,
+                        text=text,
+                        arguments=arguments,
+                        first_text=first_text,
+                    )
+                )
+        return events
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable
+
+from metrics import TOOL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ToolHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+EntityKeys = Callable[[str, Dict[str, Any]], Iterable[Hashable]]
+
+# Tool tasks outlive the response that submitted them (a superseded response
+# is cancelled, its tools are not), so they are referenced here until done
+_running = set()
+
+
+class ToolResult:
+    def __init__(
+        self,
+        name: str,
+        arguments: Dict[str, Any],
+        error: Exception = None,
+        seconds: float = 0.0,
+    ):
+        self.name = name
+        self.arguments = arguments
+        self.error = error
+        self.seconds = seconds  # Running time of the handler alone
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ToolScheduler:
+    """
+    Runs the tool calls of one response concurrently.
+
+    Calls that touch the same entity (as named by `entity_keys`, e.g.
+    ("door", 3)) run in the order they were submitted; all others run at
+    the same time. Results come back in completion order, so each tool's
+    output can be spoken as soon as that tool is done.
+
+    A submitted call always runs to the end: cancelling the response (or
+    the task waiting on drain()) does not cancel its tools, and the
+    handler itself is shielded so a side effect is applied whole or not
+    at all.
+    """
+
+    def __init__(self, handlers: Dict[str, ToolHandler], entity_keys: EntityKeys):
+        self.handlers = handlers
+        self.entity_keys = entity_keys
+        self._last: Dict[Hashable, asyncio.Task] = {}  # entity -> latest task on it
+        self._done: asyncio.Queue = asyncio.Queue()
+        self._outstanding = 0
+
+    def submit(self, name: str, arguments: Dict[str, Any]) -> asyncio.Task:
+        keys = list(self.entity_keys(name, arguments))
+        before = {self._last[key] for key in keys if key in self._last}
+        task = asyncio.create_task(self._run(name, arguments, before))
+        _running.add(task)
+        task.add_done_callback(_running.discard)
+        for key in keys:
+            self._last[key] = task
+        self._outstanding += 1
+        return task
+
+    async def _run(self, name, arguments, before):
+        if before:
+            await asyncio.gather(*before, return_exceptions=True)
+        handler = self.handlers.get(name)
+        error = None
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown tool {name}")
+            await asyncio.shield(handler(arguments))
+        except Exception as e:
+            logger.warning("Error running tool %s(%s): %s", name, arguments, e)
+            error = e
+        seconds = time.perf_counter() - start
+        TOOL_SECONDS.observe(seconds, name)
+        self._done.put_nowait(ToolResult(name, arguments, error, seconds))
+
+    async def drain(self):
+        """
+        Yields the remaining results as their calls finish
+        """
+        while self._outstanding > 0:
+            result = await self._done.get()
+            self._outstanding -= 1
+            yield result
@@ -0,0 +1,116 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from typing import Dict, List
+
+from metrics import (
+    COMPLETE_SECONDS,
+    FIRST_SEND_SECONDS,
+    FIRST_TOKEN_SECONDS,
+    PROMPT_SECONDS,
+)
+
+# JSON lines with one trace per turn are written here when set
+TRACE_FILE = os.getenv("TRACE_FILE")
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_STAGE_HISTOGRAMS = {
+    "prompt": PROMPT_SECONDS,
+    "first_token": FIRST_TOKEN_SECONDS,
+    "first_send": FIRST_SEND_SECONDS,
+    "complete": COMPLETE_SECONDS,
+}
+
+trace_logger = logging.getLogger("traces")
+trace_logger.propagate = False
+
+
+def setup_logging(level=logging.INFO) -> List[logging.handlers.QueueListener]:
+    """
+    Routes log records through a queue so that logging on the response path
+    never waits on stdout or the trace file; a listener thread writes them.
+
+    Returns:
+        The started listeners, to be stopped at shutdown.
+    """
+    listeners = []
+
+    records = queue.SimpleQueue()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+    listeners.append(logging.handlers.QueueListener(records, console))
+
+    if TRACE_FILE:
+        traces = queue.SimpleQueue()
+        trace_file = logging.FileHandler(TRACE_FILE)
+        trace_file.setFormatter(logging.Formatter("%(message)s"))
+        trace_logger.addHandler(logging.handlers.QueueHandler(traces))
+        trace_logger.setLevel(logging.INFO)
+        listeners.append(logging.handlers.QueueListener(traces, trace_file))
+
+    for listener in listeners:
+        listener.start()
+    return listeners
+
+
+class TurnTrace:
+    """
+    Timeline of one response, from receipt of response_required.
+
+    Stages are marked once, at their first occurrence: "prompt" (prompt
+    built), "first_token" (first LLM delta), "first_send" (first content
+    sent to Retell) and "complete" (content_complete sent). `path` says
+    what answered the turn: "llm", "fast" (intent fast path) or "cache"
+    (response cache).
+    finish() feeds the stage histograms and, if TRACE_FILE is set, writes
+    the trace.
+    """
+
+    def __init__(self, call_id: str, response_id: int, interaction_type: str):
+        self.call_id = call_id
+        self.response_id = response_id
+        self.interaction_type = interaction_type
+        self.path = "llm"
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.tools: List[Dict] = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def mark(self, stage: str):
+        if stage not in self.stages:
+            self.stages[stage] = self.elapsed()
+
+    def tool(self, name: str, seconds: float, ok: bool):
+        self.tools.append({"tool": name, "seconds": round(seconds, 6), "ok": ok})
+
+    def finish(self, outcome: str):
+        """
+        Records the trace; `outcome` is "complete", "cancelled" or "error"
+        """
+        for stage, seconds in self.stages.items():
+            _STAGE_HISTOGRAMS[stage].observe(seconds, self.path)
+        if TRACE_FILE:
+            trace_logger.info(
+                json.dumps(
+                    {
+                        "call_id": self.call_id,
+                        "response_id": self.response_id,
+                        "interaction_type": self.interaction_type,
+                        "started_at": self.started_at,
+                        "outcome": outcome,
+                        "path": self.path,
+                        "total_seconds": round(self.elapsed(), 6),
+                        "stages": {k: round(v, 6) for k, v in self.stages.items()},
+                        "tools": self.tools,
+                    }
+                )
+            )
@@ -13,22 +13,27 @@ def bfs(adjacency, start, goal=9):
     Returns:
         A list representing the path from start to goal, or None if no path exists
     """
-    queue = deque()
-    queue.append((start, [start]))
-    visited = set()
+    queue = deque([start])
+    # Parent pointers; a node is marked visited when it is enqueued, so it
+    # is only ever enqueued once
+    parent = {start: None}
 
     while queue:
-        current, path = queue.popleft()
-        visited.add(current)
+        current = queue.popleft()
 
-        # If goal is reached
+        # If goal is reached, walk the parent pointers back to the start
         if current == goal:
-            return path
+            path = []
+            while current is not None:
+                path.append(current)
+                current = parent[current]
+            return path[::-1]
 
         # Add all unvisited neighbors to the queue
         for neighbor in adjacency[current]:
-            if neighbor not in visited:
-                queue.append((neighbor, path + [neighbor]))
+            if neighbor not in parent:
+                parent[neighbor] = current
+                queue.append(neighbor)
 
     # If no path is found
     return None